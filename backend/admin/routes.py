@@ -0,0 +1,81 @@
+"""
+Admin Routes - Operational endpoints for maintainers
+
+Not used by the frontend. Every route requires the X-Admin-Token header to
+match the ADMIN_TOKEN environment variable; when ADMIN_TOKEN is not set the
+admin API is disabled and every route answers 404.
+
+- GET  /admin/slow-queries        most expensive query shapes (?limit=20&sort=total|max|count|slow)
+- POST /admin/slow-queries/reset  clear the aggregated query stats
+- GET  /admin/jobs                scheduler run history and per-job summary (?job=<id>&limit=50)
+- GET  /admin/metrics             job metrics in Prometheus text format
+"""
+
+import hmac
+import os
+from functools import wraps
+
+from flask import Blueprint, Response, request, jsonify
+
+import job_telemetry
+import query_profiler
+
+admin_bp = Blueprint("admin", __name__)
+
+
+def require_admin(view):
+    """Allow the request only with a valid X-Admin-Token header."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = os.environ.get("ADMIN_TOKEN")
+        if not expected:
+            return jsonify({"message": "Not found"}), 404
+        provided = request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(provided, expected):
+            return jsonify({"message": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+# --------------------------------------------------------
+#                 SLOW QUERY STATS
+# --------------------------------------------------------
+@admin_bp.get("/slow-queries")
+@require_admin
+def get_slow_queries():
+    """Top-N query shapes with their timings and the routes/jobs issuing them"""
+    limit = request.args.get('limit', type=int, default=20)
+    sort = request.args.get('sort', default='total')
+    return jsonify({
+        "threshold_ms": query_profiler.SLOW_QUERY_MS,
+        "sample_rate": query_profiler.SLOW_QUERY_SAMPLE_RATE,
+        "sort": sort,
+        "queries": query_profiler.top_shapes(limit, sort)
+    }), 200
+
+@admin_bp.post("/slow-queries/reset")
+@require_admin
+def reset_slow_queries():
+    """Clear the aggregated query stats"""
+    query_profiler.reset()
+    return jsonify({"message": "Query stats reset"}), 200
+
+# --------------------------------------------------------
+#                 SCHEDULER JOBS
+# --------------------------------------------------------
+@admin_bp.get("/jobs")
+@require_admin
+def get_jobs():
+    """Recent job runs (newest first) and per-job aggregates"""
+    limit = request.args.get('limit', type=int, default=50)
+    job = request.args.get('job')
+    return jsonify({
+        "budget_warn_ratio": job_telemetry.JOB_BUDGET_WARN_RATIO,
+        "jobs": job_telemetry.summary(),
+        "runs": job_telemetry.history(job, limit)
+    }), 200
+
+@admin_bp.get("/metrics")
+@require_admin
+def get_metrics():
+    """Job metrics for a Prometheus scraper"""
+    return Response(job_telemetry.prometheus_metrics(), mimetype="text/plain; version=0.0.4")
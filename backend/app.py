@@ -1,37 +1,66 @@
 from flask import Flask
 from flask_cors import CORS
 import logging
-
-# Import Blueprints
-from auth.routes import auth_bp
-from habits.routes import habits_bp
-from scheduler import start_scheduler
+import os
 
 # 1. SETUP LOGGING (Info level shows all requests)
 logging.basicConfig(level=logging.INFO)
 
-app = Flask(__name__)
-app.secret_key = "super_secret_key_for_session"
 
-# 2. SETUP CORS
-# supports_credentials=True is required for session cookies to work
-# Restrict to Vite dev origins to avoid redirects-on-preflight issues
-CORS(
-    app,
-    supports_credentials=True,
-    origins=["http://localhost:5173", "http://localhost:5174"],
-)
+def create_app(start_jobs=None):
+    """
+    Application factory.
+
+    Building the app is cheap: the Supabase client is created on the first
+    request that needs it, and bcrypt/apscheduler are only imported by the
+    code paths that use them. The background scheduler is started here only
+    when `start_jobs` is true (defaults to the START_SCHEDULER env var, on
+    unless set to "0"), so tests and short-lived tools can skip it.
+    """
+    app = Flask(__name__)
+    app.secret_key = "super_secret_key_for_session"
+
+    # 2. SETUP CORS
+    # supports_credentials=True is required for session cookies to work
+    # Restrict to Vite dev origins to avoid redirects-on-preflight issues
+    CORS(
+        app,
+        supports_credentials=True,
+        origins=["http://localhost:5173", "http://localhost:5174"],
+    )
+
+    # 3. JSON SERIALIZATION + RESPONSE COMPRESSION
+    from json_provider import init_json
+    from compression import init_compression
+
+    init_json(app)
+    init_compression(app)
+
+    # 4. REGISTER ROUTES
+    from auth.routes import auth_bp
+    from habits.routes import habits_bp
+    from admin.routes import admin_bp
+
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(habits_bp, url_prefix="/habits")
+    app.register_blueprint(admin_bp, url_prefix="/admin")
+
+    @app.route("/")
+    def home():
+        return {"message": "Habit Garden Backend is Running!"}
 
-# 3. REGISTER ROUTES
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(habits_bp, url_prefix="/habits")
+    # 5. START SCHEDULER (for plant state updates and email reminders)
+    #    and the email dispatcher that delivers the queued emails
+    if start_jobs is None:
+        start_jobs = os.environ.get("START_SCHEDULER", "1") != "0"
+    if start_jobs:
+        from scheduler import start_scheduler
+        from email_dispatch import start_dispatcher
+        start_scheduler()
+        start_dispatcher()
 
-# 4. START SCHEDULER (for plant state updates and email reminders)
-start_scheduler()
+    return app
 
-@app.route("/")
-def home():
-    return {"message": "Habit Garden Backend is Running!"}
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
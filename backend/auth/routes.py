@@ -1,19 +1,21 @@
 from flask import Blueprint, request, jsonify, session
-import bcrypt
-import sys
-import os
 import random
 import string
 from datetime import datetime, timedelta
 import logging
 
-# Path fix to find db.py in parent folder
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from db import get_supabase_client
+from resilience import execute, DatabaseUnavailable, unavailable_response
+from rate_limit import rate_limit, concurrency_limit, client_ip, json_field
+from idempotency import idempotent
 
 auth_bp = Blueprint("auth", __name__)
 logger = logging.getLogger(__name__)
 
+# bcrypt is deliberately slow; cap how many hashes run at once per worker so a
+# burst of logins cannot starve every other request of CPU
+BCRYPT_MAX_INFLIGHT = 4
+
 # In-memory OTP storage (email -> {otp, expires_at})
 # In production, consider using Redis or database table
 otp_storage = {}
@@ -22,6 +24,9 @@ otp_storage = {}
 #                 SIGNUP ROUTE (ENCRYPTED)
 # --------------------------------------------------------
 @auth_bp.post("/signup")
+@idempotent("signup")
+@rate_limit("signup-ip", 10, 3600, key=client_ip)
+@concurrency_limit("bcrypt", BCRYPT_MAX_INFLIGHT)
 def signup():
     data = request.json
     full_name = data.get("name") 
@@ -32,6 +37,7 @@ def signup():
         return jsonify({"message": "Missing required fields"}), 400
 
     # 1. Encrypt Password (Bcrypt)
+    import bcrypt  # imported on first use to keep app startup fast
     hashed_bytes = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
     hashed_password_str = hashed_bytes.decode('utf-8')
 
@@ -41,13 +47,15 @@ def signup():
 
     try:
         # 2. Save to Supabase
-        response = supabase.table('users').insert({
+        response = execute(supabase.table('users').insert({
             'full_name': full_name,
             'email': email,
             'password_hash': hashed_password_str
-        }).execute()
+        }))
         return jsonify({"message": "User registered successfully"}), 201
 
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         error_str = str(e)
         # Check if it's a duplicate email error
@@ -61,6 +69,9 @@ def signup():
 #                  LOGIN ROUTE (ENCRYPTED CHECK)
 # --------------------------------------------------------
 @auth_bp.post("/login")
+@rate_limit("login-ip", 20, 60, key=client_ip)
+@rate_limit("login-account", 5, 60, key=json_field("email"))
+@concurrency_limit("bcrypt", BCRYPT_MAX_INFLIGHT)
 def login():
     data = request.json
     identifier = data.get("email")  # accept email or username in same field
@@ -76,11 +87,11 @@ def login():
     try:
         # 1. Fetch User by Email OR Username (full_name)
         or_filter = f"email.eq.{identifier},full_name.eq.{identifier}"
-        response = (
+        # Plan checked in check_query_plans.py: "user by email or name"
+        response = execute(
             supabase.table('users')
             .select('user_id, full_name, email, password_hash')
             .or_(or_filter)
-            .execute()
         )
         
         if response.data and len(response.data) > 0:
@@ -91,6 +102,7 @@ def login():
             db_hash = user_data['password_hash']  # bcrypt hash
 
             # 2. Verify Password
+            import bcrypt
             if bcrypt.checkpw(password.encode('utf-8'), db_hash.encode('utf-8')):
                 
                 # 3. Create Session
@@ -107,6 +119,8 @@ def login():
         else:
             return jsonify({"message": "User not found"}), 401
 
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -122,6 +136,8 @@ def logout():
 #              FORGET PASSWORD - SEND OTP
 # --------------------------------------------------------
 @auth_bp.post("/forget-password")
+@rate_limit("forget-password-ip", 10, 60, key=client_ip)
+@rate_limit("forget-password-account", 3, 600, key=json_field("email"))
 def forget_password():
     """
     Generates a 6-digit OTP and returns it to display on the website.
@@ -138,7 +154,8 @@ def forget_password():
     
     try:
         # Check if user exists
-        response = supabase.table('users').select('user_id, email, full_name').eq('email', email).execute()
+        # Plan checked in check_query_plans.py: "user by email"
+        response = execute(supabase.table('users').select('user_id, email, full_name').eq('email', email))
         
         if not response.data or len(response.data) == 0:
             # Don't reveal if email exists or not (security best practice)
@@ -188,6 +205,8 @@ def forget_password():
             "otp": otp
         }), 200
         
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": f"Error: {str(e)}"}), 500
 
@@ -195,6 +214,7 @@ def forget_password():
 #              VERIFY OTP
 # --------------------------------------------------------
 @auth_bp.post("/verify-otp")
+@rate_limit("verify-otp-account", 5, 600, key=json_field("email"))
 def verify_otp():
     """
     Verifies the OTP entered by the user.
@@ -241,6 +261,8 @@ def verify_otp():
 #              RESET PASSWORD (UPDATED)
 # --------------------------------------------------------
 @auth_bp.post("/reset-password")
+@rate_limit("reset-password-ip", 10, 60, key=client_ip)
+@concurrency_limit("bcrypt", BCRYPT_MAX_INFLIGHT)
 def reset_password():
     """
     Resets the password after OTP verification.
@@ -272,13 +294,14 @@ def reset_password():
     
     try:
         # Hash new password
+        import bcrypt
         hashed_bytes = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
         hashed_password_str = hashed_bytes.decode('utf-8')
         
         # Update password in database
-        response = supabase.table('users').update({
+        response = execute(supabase.table('users').update({
             'password_hash': hashed_password_str
-        }).eq('email', email).execute()
+        }).eq('email', email))
         
         if not response.data:
             return jsonify({"message": "User not found"}), 404
@@ -290,5 +313,7 @@ def reset_password():
         
         return jsonify({"message": "Password has been reset successfully"}), 200
         
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": f"Error resetting password: {str(e)}"}), 500
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+End-to-end benchmark for the outbound email pipeline.
+
+Starts a local HTTP stand-in for the email provider (optionally slow and
+failing a fraction of requests), queues N reminder emails in a temporary
+outbox and drains it with the email_dispatch Dispatcher, then reports:
+- throughput (emails/s) against the configured rate limit
+- peak number of concurrent sends seen by the stand-in
+- the most requests the stand-in received within any one second; the run
+  fails (exit status 1) if that is over the rate limit, as a provider with
+  a strict per-second quota would reject them
+- messages sent, retried and failed; duplicates received by the stand-in
+
+Retries are made due immediately so a run does not wait out real backoff.
+
+Usage (from the backend directory):
+    python benchmarks/bench_email_dispatch.py
+    python benchmarks/bench_email_dispatch.py --emails 500 --concurrency 8 --rate 50 --latency-ms 40 --fail-rate 0.1
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import email_dispatch
+
+
+class ProviderStandIn(ThreadingHTTPServer):
+    """Accepts POSTed emails like a provider API would."""
+    daemon_threads = True
+
+    def __init__(self, latency_ms, fail_rate):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.received = []
+        self.rejected = 0
+        self.arrivals = []  # perf_counter() of every request, accepted or not
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.arrivals.append(time.perf_counter())
+            server.inflight += 1
+            server.peak_inflight = max(server.peak_inflight, server.inflight)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(server.latency)
+            failed = random.random() < server.fail_rate
+            with server.lock:
+                if failed:
+                    server.rejected += 1
+                else:
+                    server.received.append(body["to"])
+        finally:
+            # Before answering: once the client has its response it may send
+            # the next request, which must not count this one as in flight
+            with server.lock:
+                server.inflight -= 1
+        self.send_response(503 if failed else 202)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def peak_per_second(arrivals, window=1.0):
+    """Most arrivals within any `window` seconds (sliding)."""
+    arrivals = sorted(arrivals)
+    peak, start = 0, 0
+    for end, t in enumerate(arrivals):
+        while t - arrivals[start] >= window:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=email_dispatch.CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=100, help="provider rate limit, emails per second")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    random.seed(args.seed)
+    # Retry immediately instead of waiting out the real backoff
+    email_dispatch.BACKOFF_BASE = 0
+
+    server = ProviderStandIn(args.latency_ms, args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = email_dispatch.Outbox(os.path.join(tmp, "outbox.db"))
+        t0 = time.perf_counter()
+        for i in range(args.emails):
+            outbox.enqueue("wilting_reminder", f"user{i}@example.com", f"User {i}", ["Drink water"], digest_key=f"wilting:{i}")
+        # A second reminder for the same users folds into their pending digests
+        for i in range(args.emails):
+            outbox.enqueue("wilting_reminder", f"user{i}@example.com", f"User {i}", ["Stretch"], digest_key=f"wilting:{i}")
+        enqueue_s = time.perf_counter() - t0
+
+        transport = email_dispatch.HTTPTransport(f"http://127.0.0.1:{server.server_port}/send")
+        dispatcher = email_dispatch.Dispatcher(outbox, transport, concurrency=args.concurrency, rate_limit=args.rate)
+        t0 = time.perf_counter()
+        dispatcher.drain()
+        drain_s = time.perf_counter() - t0
+        dispatcher.stop()
+        counts = outbox.counts()
+
+    server.shutdown()
+    sent = counts.get("sent", 0)
+    print(f"emails queued:      {args.emails} ({2 * args.emails} enqueue calls in {enqueue_s:.2f}s)")
+    print(f"sent / failed:      {sent} / {counts.get('failed', 0)}")
+    print(f"provider rejects:   {server.rejected} (retried)")
+    print(f"duplicates:         {len(server.received) - len(set(server.received))}")
+    print(f"drain time:         {drain_s:.2f}s  ->  {sent / drain_s if drain_s else 0:.1f} emails/s (limit {args.rate:g}/s)")
+    print(f"peak concurrency:   {server.peak_inflight} (limit {args.concurrency})")
+    # A little under a second, so scheduling jitter between evenly spaced sends doesn't count
+    busiest = peak_per_second(server.arrivals, window=0.95)
+    allowed = max(1, math.ceil(args.rate))
+    print(f"busiest second:     {busiest} requests (limit {allowed})")
+    if busiest > allowed:
+        print("FAIL: the provider's per-second rate limit was exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
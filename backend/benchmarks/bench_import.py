@@ -0,0 +1,109 @@
+"""
+Throughput benchmark for POST /habits/import.
+
+Builds a CSV (or NDJSON) upload of N historical completions for one user,
+a share of them duplicates (repeated rows, and rows already stored), posts
+it to the import endpoint against the in-memory database stand-in and
+reports rows/s, the import report and database round trips by table and
+HTTP method.
+
+Usage (from the backend directory):
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --rows 100000 --habits 20 --format ndjson
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("START_SCHEDULER", "0")
+os.environ.setdefault("RATELIMIT_ENABLED", "0")
+
+from local_db import LocalSupabase, stub_reminder_storage
+
+stub_reminder_storage()
+import db as db_module
+from app import create_app
+
+USER_ID = 1
+
+
+def build_upload(n_rows, n_habits, import_format, seed, duplicate_rate=0.05):
+    rng = random.Random(seed)
+    today = date.today()
+    days_back = max(1, n_rows // n_habits)
+    rows = []
+    for i in range(n_rows):
+        habit_id = i % n_habits + 1
+        day = today - timedelta(days=(i // n_habits) % days_back + 1)
+        rows.append((habit_id, day.isoformat()))
+    # Sprinkle repeated rows through the file
+    for _ in range(int(n_rows * duplicate_rate)):
+        rows[rng.randrange(n_rows)] = rows[rng.randrange(n_rows)]
+    if import_format == "csv":
+        return ("habit_id,date\n" + "".join(f"{h},{d}\n" for h, d in rows)).encode()
+    return "".join(json.dumps({"habit_id": h, "date": d}) + "\n" for h, d in rows).encode()
+
+
+def seed_database(n_habits, stored_per_habit):
+    db = LocalSupabase()
+    db.load("users", [{"user_id": USER_ID, "full_name": "Bench", "email": "bench@example.com"}])
+    habits, completions = [], []
+    for habit_id in range(1, n_habits + 1):
+        frequency = "daily" if habit_id % 4 else "weekly"
+        habits.append({"habit_id": habit_id, "user_id": USER_ID, "habit_name": f"Habit {habit_id}", "frequency": frequency,
+                       "plant_state": "wilting", "last_watered": (datetime.utcnow() - timedelta(days=30)).isoformat()})
+        for d in range(stored_per_habit):
+            day = date.today() - timedelta(days=d + 1)
+            key = day.isoformat() if frequency == "daily" else f"{day.isocalendar()[0]}-W{day.isocalendar()[1]:02d}"
+            completions.append({"habit_id": habit_id, "user_id": USER_ID, "completion_date": day.isoformat(),
+                                "completed_at": f"{day.isoformat()}T09:00:00", "period_key": key})
+    db.load("habits", habits)
+    db.load("habit_completions", completions)
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--habits", type=int, default=20)
+    parser.add_argument("--stored-per-habit", type=int, default=30, help="completions already in the database per habit")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    db = seed_database(args.habits, args.stored_per_habit)
+    db_module._client = db
+    body = build_upload(args.rows, args.habits, args.format, args.seed)
+
+    app = create_app(start_jobs=False)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = USER_ID
+
+    db.reset_counters()
+    t0 = time.perf_counter()
+    response = client.post(f"/habits/import?format={args.format}", data=body,
+                           content_type="text/csv" if args.format == "csv" else "application/x-ndjson")
+    elapsed = time.perf_counter() - t0
+    report = response.get_json()
+
+    print(f"upload:        {args.rows:,} rows, {len(body) / 1e6:.1f} MB {args.format}, {args.habits} habits")
+    print(f"status:        {response.status_code}")
+    print(f"imported:      {report.get('imported', 0):,}   duplicates: {report.get('duplicates', 0):,}   invalid: {report.get('invalid', 0):,}")
+    print(f"habits moved:  {report.get('habits_updated', 0)}")
+    print(f"time:          {elapsed:.2f}s  ->  {args.rows / elapsed:,.0f} rows/s")
+    print(f"round trips:   {db.query_count:,}  ({', '.join(f'{t}.{m}={n}' for (t, m), n in sorted(db.queries.items()))})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Scale benchmark for the scheduler jobs.
+
+Runs scheduler.update_plant_states and scheduler.send_reminder_emails
+against the in-memory database stand-in loaded with synthetic data, and
+reports for each scale point:
+- wall time of each job
+- peak Python memory allocated during the job (tracemalloc)
+- database round trips issued, by table and HTTP method
+
+Timing and memory are measured in separate runs on identical data, since
+tracemalloc slows the code it traces down considerably.
+
+The real `reminder_storage` module is not part of this tree, so an
+in-memory one is registered (local_db.stub_reminder_storage) before the
+scheduler is imported.
+
+Usage (from the backend directory):
+    python benchmarks/bench_scheduler.py
+    python benchmarks/bench_scheduler.py --scales 10000,100000,1000000 --seed 7
+
+Results (seed 1, no completion history):
+
+    == 10,000 habits / 2,207 users ==
+       update_plant_states:    18.9 ms  peak  0.4 MB  round trips      4  (habits.PATCH=2, rpc=2)
+      send_reminder_emails:  2178.8 ms  peak  2.2 MB  round trips  1,650  (habits.GET=1, users.GET=1649)
+    == 100,000 habits / 22,331 users ==
+       update_plant_states:   199.8 ms  peak  3.9 MB  round trips     16  (habits.PATCH=2, rpc=14)
+      send_reminder_emails: 25531.9 ms  peak 21.6 MB  round trips 16,644  (habits.GET=1, users.GET=16643)
+
+send_reminder_emails still looks users up one GET per user with a wilting
+plant, so its round trips grow with the number of such users.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_db import LocalSupabase, stub_reminder_storage
+from synthetic import generate, load
+
+stub_reminder_storage()
+import email_dispatch
+import scheduler
+
+OUTBOX_DIR = tempfile.TemporaryDirectory()
+
+JOBS = {
+    "update_plant_states": scheduler.update_plant_states,
+    "send_reminder_emails": scheduler.send_reminder_emails,
+}
+
+
+def fresh_db(dataset):
+    db = LocalSupabase()
+    load(db, dataset)
+    return db
+
+
+def run_job(job, db, trace_memory=False):
+    # The jobs look the client up through this module-level name
+    scheduler.get_supabase_client = lambda: db
+    # Queued reminder emails go to a throwaway outbox, fresh for every run
+    email_dispatch._outbox = email_dispatch.Outbox(tempfile.mktemp(suffix=".db", dir=OUTBOX_DIR.name))
+    db.reset_counters()
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    job()
+    elapsed = time.perf_counter() - t0
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak, dict(db.queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10000,100000", help="comma-separated habit counts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--completions-per-habit", type=int, default=0,
+                        help="completion history per habit (the jobs do not read it)")
+    args = parser.parse_args()
+
+    # Keep the jobs' per-user INFO lines out of the report
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("HabitScheduler").setLevel(logging.WARNING)
+
+    for scale in (int(s) for s in args.scales.split(",")):
+        # Relative to the clock the jobs read, or every plant would look overdue
+        dataset = generate(scale, seed=args.seed, now=datetime.utcnow(), completions_per_habit=args.completions_per_habit)
+        print(f"\n== {scale:,} habits / {len(dataset['users']):,} users ==")
+        for name, job in JOBS.items():
+            # update_plant_states mutates rows, so each run gets its own copy
+            elapsed, _, queries = run_job(job, fresh_db(dataset))
+            _, peak, _ = run_job(job, fresh_db(dataset), trace_memory=True)
+            total = sum(queries.values())
+            by_kind = ", ".join(f"{t}.{m}={n}" for (t, m), n in sorted(queries.items()))
+            print(f"{name:>22}: {elapsed * 1000:10.1f} ms  peak {peak / 1e6:8.1f} MB  round trips {total:>8,}  ({by_kind})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Serialization and compression benchmark for large API payloads.
+
+Builds synthetic payloads shaped like the responses of GET /habits and
+GET /habits/<id>/completions, then measures for each JSON provider:
+- serialization time (median over --runs)
+- response size raw, gzipped and (if installed) brotli-compressed
+
+Usage (from the backend directory):
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --habits 5000 --completions 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from compression import brotli, compress_bytes
+from json_provider import OrjsonProvider, StdlibJSONProvider, orjson
+
+
+def make_habits(n, rng):
+    now = datetime(2025, 1, 1)
+    habits = []
+    for i in range(n):
+        frequency = "daily" if rng.random() < 0.7 else "weekly"
+        last = now - timedelta(hours=rng.randint(0, 400))
+        habits.append({
+            "habit_id": i + 1,
+            "user_id": rng.randint(1, 1000),
+            "habit_name": f"Habit number {i}",
+            "frequency": frequency,
+            "plant_state": "wilting" if rng.random() < 0.3 else "flourishing",
+            "last_watered": last.isoformat(),
+            "created_at": (last - timedelta(days=30)).isoformat(),
+            "is_completed_today": frequency == "daily" and rng.random() < 0.5,
+        })
+    return {"habits": habits}
+
+
+def make_completions(n, rng):
+    start = datetime(2020, 1, 1)
+    completions = []
+    for i in range(n):
+        completed_at = start + timedelta(hours=i * 24)
+        completions.append({
+            "completion_id": i + 1,
+            "habit_id": 1,
+            "user_id": 1,
+            # Strings, as Supabase returns date and timestamp columns
+            "completion_date": completed_at.date().isoformat(),
+            "completed_at": completed_at.isoformat(),
+            "period_key": completed_at.date().isoformat(),
+        })
+    return {"habit_id": "1", "frequency": "daily", "completions": completions, "total_completions": n}
+
+
+def bench_provider(provider, payload, runs):
+    timings = []
+    body = b""
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        body = provider.response(payload).get_data()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=5000)
+    parser.add_argument("--completions", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        f"habits x{args.habits}": make_habits(args.habits, rng),
+        f"completions x{args.completions}": make_completions(args.completions, rng),
+    }
+
+    app = Flask(__name__)
+    providers = [("stdlib", StdlibJSONProvider(app))]
+    if orjson is not None:
+        providers.append(("orjson", OrjsonProvider(app)))
+    else:
+        print("orjson not installed, only benchmarking the stdlib provider")
+
+    with app.app_context():
+        for label, payload in payloads.items():
+            print(f"\n== {label} ==")
+            for name, provider in providers:
+                ms, body = bench_provider(provider, payload, args.runs)
+                gz = len(compress_bytes(body, "gzip"))
+                line = f"{name:>7}: {ms:9.2f} ms  raw {len(body):>10,} B  gzip {gz:>9,} B"
+                if brotli is not None:
+                    line += f"  br {len(compress_bytes(body, 'br')):>9,} B"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Startup benchmark for the Flask backend.
+
+Measures, in a fresh interpreter each time:
+- how long `import app` takes
+- how long `create_app(start_jobs=False)` takes
+- time to first response for GET /
+
+It also checks that the heavy dependencies (supabase, bcrypt, apscheduler)
+are NOT imported just by building the app, since that is what keeps worker
+recycling and test startup fast.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --max-import-ms 400 --max-first-request-ms 800
+
+Exits with status 1 if a budget is exceeded or a heavy module was imported,
+so it can be used as a regression guard in CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["supabase", "bcrypt", "apscheduler"]
+
+# Runs inside a fresh interpreter so module caches never skew the numbers
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+flask_app = app_module.create_app(start_jobs=False)
+t2 = time.perf_counter()
+client = flask_app.test_client()
+response = client.get("/")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t0) * 1000,
+    "status": response.status_code,
+    "heavy_loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe():
+    env = dict(os.environ, START_SCHEDULER="0")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # The app logs to stderr; the probe result is the last stdout line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None, help="fail if median import time exceeds this")
+    parser.add_argument("--max-first-request-ms", type=float, default=None, help="fail if median time to first request exceeds this")
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+
+    failures = []
+    for r in results:
+        if r["status"] != 200:
+            failures.append(f"GET / returned {r['status']}")
+        if r["heavy_loaded"]:
+            failures.append(f"heavy modules imported at startup: {', '.join(r['heavy_loaded'])}")
+
+    summary = {}
+    for field in ("import_ms", "create_app_ms", "first_request_ms"):
+        values = [r[field] for r in results]
+        summary[field] = {
+            "median": round(statistics.median(values), 2),
+            "min": round(min(values), 2),
+            "max": round(max(values), 2),
+        }
+        print(f"{field:>18}: median {summary[field]['median']:8.2f} ms  (min {summary[field]['min']:.2f}, max {summary[field]['max']:.2f})")
+
+    if args.max_import_ms is not None and summary["import_ms"]["median"] > args.max_import_ms:
+        failures.append(f"import time {summary['import_ms']['median']} ms > budget {args.max_import_ms} ms")
+    if args.max_first_request_ms is not None and summary["first_request_ms"]["median"] > args.max_first_request_ms:
+        failures.append(f"time to first request {summary['first_request_ms']['median']} ms > budget {args.max_first_request_ms} ms")
+
+    for f in sorted(set(failures)):
+        print(f"FAIL: {f}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+In-memory stand-in for the Supabase client, for benchmarks and local runs.
+
+Supports the subset of the postgrest query builder this backend uses:
+
+    db.table('habits').select('habit_id, user_id').eq('user_id', 3).lt('last_watered', ts).limit(5).execute()
+
+- operations: select, insert, upsert, update, delete, and rpc() for the
+  database functions in LocalSupabase.functions
+- filters: eq, neq, lt, lte, gt, gte, in_, is_, or_ (eq/neq/in terms)
+- modifiers: order, limit, range
+- NULL follows SQL semantics: comparisons against None never match
+
+Every execute() counts as one round trip (`db.query_count`, and per
+(table, method) in `db.queries`). Builders expose `http_method`, `path` and
+`params` like postgrest builders do, so resilience.execute() and the query
+profiler treat them the same way as real queries.
+
+Equality filters on the columns listed in INDEXES use a hash index, so
+per-row lookups (e.g. users by user_id) stay O(1) at 1M rows.
+"""
+
+import itertools
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+PRIMARY_KEYS = {
+    "users": "user_id",
+    "habits": "habit_id",
+    "habit_completions": "completion_id",
+}
+
+INDEXES = {
+    "users": ["user_id", "email"],
+    "habits": ["habit_id", "user_id"],
+    "habit_completions": ["completion_id", "habit_id", "period_key"],
+    "garden_summaries": ["user_id"],
+}
+
+_OPS = {
+    "eq": lambda a, b: a is not None and a == b,
+    "neq": lambda a, b: a is not None and a != b,
+    "lt": lambda a, b: a is not None and a < b,
+    "lte": lambda a, b: a is not None and a <= b,
+    "gt": lambda a, b: a is not None and a > b,
+    "gte": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a is not None and a in b,
+    "is": lambda a, b: a is b,
+}
+
+
+def _coerce(column, value):
+    """PostgREST casts '5' to 5 for integer id columns; mimic that for *_id."""
+    if column.endswith("_id") and isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+def _coerce_row(row):
+    return {k: _coerce(k, v) for k, v in row.items()}
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalTable:
+    def __init__(self, name):
+        self.name = name
+        self.pk = PRIMARY_KEYS.get(name)
+        self.rows = {}  # internal row id -> row dict
+        self.indexes = {col: defaultdict(set) for col in INDEXES.get(name, [])}
+        self._rids = itertools.count(1)
+        self.next_pk = 1
+
+    def insert(self, row):
+        row = dict(row)
+        if self.pk:
+            if row.get(self.pk) is None:
+                row[self.pk] = self.next_pk
+            if isinstance(row[self.pk], int):
+                self.next_pk = max(self.next_pk, row[self.pk] + 1)
+        rid = next(self._rids)
+        self.rows[rid] = row
+        for col, index in self.indexes.items():
+            index[row.get(col)].add(rid)
+        return row
+
+    def remove(self, rid):
+        row = self.rows.pop(rid)
+        for col, index in self.indexes.items():
+            index[row.get(col)].discard(rid)
+        return row
+
+    def update(self, rid, changes):
+        row = self.rows[rid]
+        for col, index in self.indexes.items():
+            if col in changes and changes[col] != row.get(col):
+                index[row.get(col)].discard(rid)
+                index[changes[col]].add(rid)
+        row.update(changes)
+        return row
+
+    def candidates(self, filters):
+        """Row ids worth checking: from the most selective hash index an eq/in filter allows."""
+        best = None
+        for column, op, value in filters:
+            if column in self.indexes and op == "eq":
+                rids = list(self.indexes[column].get(value, ()))
+            elif column in self.indexes and op == "in":
+                rids = []
+                for v in value:
+                    rids.extend(self.indexes[column].get(v, ()))
+            else:
+                continue
+            if best is None or len(rids) < len(best):
+                best = rids
+        return list(self.rows) if best is None else best
+
+
+class LocalQuery:
+    def __init__(self, db, table, method="GET"):
+        self.db = db
+        self.table_name = table
+        self.http_method = method
+        self.path = f"/rest/v1/{table}"
+        self.params = []  # (key, value) pairs, postgrest style
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.or_groups = []
+        self.order_by = []
+        self.limit_n = None
+        self.offset_n = 0
+        self.count_mode = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+
+    # ---- operations ----
+    def select(self, columns="*", count=None):
+        self.columns = columns
+        self.count_mode = count
+        self.params.append(("select", columns.replace(" ", "")))
+        return self
+
+    def insert(self, rows):
+        self.http_method = "POST"
+        self.payload = [_coerce_row(r) for r in (rows if isinstance(rows, list) else [rows])]
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.http_method = "POST"
+        self.ignore_duplicates = ignore_duplicates
+        self.payload = [_coerce_row(r) for r in (rows if isinstance(rows, list) else [rows])]
+        self.on_conflict = on_conflict or self.db.table_obj(self.table_name).pk
+        self.params.append(("on_conflict", self.on_conflict))
+        return self
+
+    def update(self, data):
+        self.http_method = "PATCH"
+        self.payload = _coerce_row(data)
+        return self
+
+    def delete(self):
+        self.http_method = "DELETE"
+        return self
+
+    # ---- filters ----
+    def _filter(self, op, column, value):
+        value = tuple(_coerce(column, v) for v in value) if op == "in" else _coerce(column, value)
+        self.filters.append((column, op, value))
+        shown = f"({','.join(map(str, value))})" if op == "in" else value
+        self.params.append((column, f"{op}.{shown}"))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, tuple(values))
+
+    def is_(self, column, value):
+        return self._filter("is", column, None if value in (None, "null") else value)
+
+    def or_(self, expression):
+        group = []
+        for term in expression.split(","):
+            column, op, value = term.split(".", 2)
+            group.append((column, op, value))
+        self.or_groups.append(group)
+        self.params.append(("or", f"({expression})"))
+        return self
+
+    # ---- modifiers ----
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        self.params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        self.params.append(("limit", n))
+        return self
+
+    def range(self, start, end):
+        self.offset_n = start
+        self.limit_n = end - start + 1
+        self.params.append(("offset", start))
+        self.params.append(("limit", self.limit_n))
+        return self
+
+    # ---- execution ----
+    def _matches(self, row):
+        for column, op, value in self.filters:
+            if not _OPS[op](row.get(column), value):
+                return False
+        for group in self.or_groups:
+            if not any(_OPS[op](str(row.get(c)) if row.get(c) is not None else None, v) for c, op, v in group):
+                return False
+        return True
+
+    def _project(self, row):
+        if self.columns.strip() == "*":
+            return dict(row)
+        return {c.strip(): row.get(c.strip()) for c in self.columns.split(",")}
+
+    def execute(self):
+        self.db.record(self.table_name, self.http_method)
+        with self.db.lock:
+            table = self.db.table_obj(self.table_name)
+            if self.http_method == "POST":
+                return LocalResponse(self._insert(table))
+
+            rids = [rid for rid in table.candidates(self.filters) if self._matches(table.rows[rid])]
+            if self.http_method == "PATCH":
+                return LocalResponse([dict(table.update(rid, self.payload)) for rid in rids])
+            if self.http_method == "DELETE":
+                return LocalResponse([table.remove(rid) for rid in rids])
+
+            rows = [table.rows[rid] for rid in rids]
+            count = len(rows) if self.count_mode else None
+            for column, desc in reversed(self.order_by):
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if not self.order_by and table.pk:
+                rows.sort(key=lambda r: r.get(table.pk))
+            end = None if self.limit_n is None else self.offset_n + self.limit_n
+            rows = rows[self.offset_n:end]
+            return LocalResponse([self._project(r) for r in rows], count=count)
+
+    def _insert(self, table):
+        inserted = []
+        for row in self.payload:
+            if self.on_conflict:
+                keys = [k.strip() for k in self.on_conflict.split(",")]
+                existing = [rid for rid in table.candidates([(k, "eq", row.get(k)) for k in keys])
+                            if all(table.rows[rid].get(k) == row.get(k) for k in keys)]
+                if existing:
+                    # Like Prefer: resolution=ignore-duplicates, skipped rows are not returned
+                    if not self.ignore_duplicates:
+                        inserted.append(dict(table.update(existing[0], row)))
+                    continue
+            inserted.append(dict(table.insert(row)))
+        return inserted
+
+
+class LocalRpc:
+    """supabase.rpc(name, params): runs a Python stand-in for the database function."""
+
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params or {}
+        self.http_method = "POST"
+        self.path = f"/rest/v1/rpc/{name}"
+
+    def execute(self):
+        self.db.record(f"rpc/{self.name}", "POST")
+        function = self.db.functions.get(self.name)
+        if function is None:
+            raise LookupError(f"No local stand-in for database function {self.name}")
+        with self.db.lock:
+            return LocalResponse(function(self.db, **self.params))
+
+
+def _apply_garden_summary_deltas(db, deltas):
+    """Stand-in for migrations/0003_garden_summary_deltas.sql."""
+    import garden_summary
+    table = db.table_obj(garden_summary.TABLE)
+    updated = []
+    for delta in deltas:
+        for rid in table.candidates([("user_id", "eq", delta["user_id"])]):
+            row = table.rows[rid]
+            if row.get("user_id") == delta["user_id"]:
+                summary = garden_summary.merge_delta(dict(row), delta)
+                summary["updated_at"] = datetime.utcnow().isoformat()
+                table.update(rid, summary)
+                updated.append({"user_id": delta["user_id"]})
+    return updated
+
+
+def stub_reminder_storage():
+    """
+    Register an in-memory `reminder_storage` (the popup reminder store that
+    scheduler.py and habits.routes import) if the real module is not on the
+    path, so the benchmarks can import them. Returns the module in use.
+    """
+    import importlib.util
+    import sys
+    import types
+
+    if "reminder_storage" in sys.modules or importlib.util.find_spec("reminder_storage") is not None:
+        import reminder_storage
+        return reminder_storage
+
+    reminders = {}
+    module = types.ModuleType("reminder_storage")
+    module.add_reminder = lambda user_id, habit_names: reminders.setdefault(user_id, []).append({"habit_names": habit_names})
+    module.get_reminders = lambda user_id: reminders.get(user_id, [])
+    module.clear_reminders = lambda user_id: reminders.pop(user_id, None)
+    sys.modules["reminder_storage"] = module
+    return module
+
+
+class LocalSupabase:
+    """Drop-in for the object returned by db.get_supabase_client()."""
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.RLock()
+        self.queries = Counter()
+        # Database functions callable through rpc(), as Python stand-ins
+        self.functions = {"apply_garden_summary_deltas": _apply_garden_summary_deltas}
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def record(self, table, method):
+        self.queries[(table, method)] += 1
+
+    def reset_counters(self):
+        self.queries.clear()
+
+    def table_obj(self, name):
+        if name not in self.tables:
+            self.tables[name] = LocalTable(name)
+        return self.tables[name]
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return LocalRpc(self, name, params)
+
+    def load(self, name, rows):
+        """Bulk load rows without counting round trips."""
+        with self.lock:
+            table = self.table_obj(name)
+            for row in rows:
+                table.insert(row)
+
+    def rows(self, name):
+        return list(self.table_obj(name).rows.values())
@@ -0,0 +1,120 @@
+"""
+Seedable synthetic data for users, habits and completions.
+
+The mix is meant to look like a live garden rather than uniform noise:
+- 70% daily / 30% weekly habits, 1-8 habits per user (mean ~4)
+- last_watered: ~10% never watered, ~50% watered recently (inside the
+  wilt window), ~25% overdue, ~15% long abandoned
+- plant_state is what the hourly job would have left behind: overdue
+  plants are mostly already 'wilting', but a share of them are still
+  'flourishing' because the job has not caught up with them yet
+- completions: one row per watered period going back from last_watered,
+  with occasional missed periods
+
+Timestamps are relative to `now` (default: the current UTC time, as the
+jobs see it), so the overdue share is what the jobs will actually find.
+The same seed and `now` always produce the same rows, so benchmark runs at
+a given scale are comparable.
+
+Usage:
+    from benchmarks.local_db import LocalSupabase
+    from benchmarks.synthetic import generate, load
+
+    db = LocalSupabase()
+    load(db, generate(n_habits=100_000, seed=1))
+"""
+
+import random
+from datetime import datetime, timedelta
+
+WILT_HOURS = {"daily": 20, "weekly": 140}
+PERIOD_HOURS = {"daily": 24, "weekly": 168}
+
+FIRST_NAMES = ["Ada", "Bilal", "Chen", "Dana", "Eli", "Fatima", "Gus", "Hana", "Ivan", "Jade"]
+HABITS = ["Drink water", "Read", "Stretch", "Journal", "Walk", "Meditate", "Call family",
+          "Practice guitar", "Study", "Cook at home", "No sugar", "Sleep by 11"]
+
+
+def _period_key(frequency, day):
+    if frequency == "daily":
+        return day.isoformat()
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _last_watered(rng, frequency, now):
+    """Pick a last_watered timestamp (or None) from the mix described above."""
+    wilt = WILT_HOURS[frequency]
+    roll = rng.random()
+    if roll < 0.10:
+        return None
+    if roll < 0.60:
+        hours = rng.uniform(0, wilt)
+    elif roll < 0.85:
+        hours = rng.uniform(wilt, wilt * 4)
+    else:
+        hours = rng.uniform(wilt * 4, wilt * 40)
+    return now - timedelta(hours=hours)
+
+
+def generate(n_habits, seed=0, now=None, completions_per_habit=3):
+    """
+    Build {'users': [...], 'habits': [...], 'habit_completions': [...]} with
+    roughly `n_habits` habits. `completions_per_habit` caps the history per
+    habit (0 skips completions entirely).
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+
+    users, habits, completions = [], [], []
+    user_id = 0
+    while len(habits) < n_habits:
+        user_id += 1
+        users.append({
+            "user_id": user_id,
+            "full_name": f"{rng.choice(FIRST_NAMES)} {user_id}",
+            "email": f"user{user_id}@example.com",
+            "password_hash": "$2b$12$synthetic",
+            "created_at": (now - timedelta(days=rng.randint(1, 700))).isoformat(),
+        })
+        for _ in range(min(rng.randint(1, 8), n_habits - len(habits))):
+            habit_id = len(habits) + 1
+            frequency = "daily" if rng.random() < 0.7 else "weekly"
+            watered = _last_watered(rng, frequency, now)
+
+            overdue = watered is not None and now - watered > timedelta(hours=WILT_HOURS[frequency])
+            state = "wilting" if overdue and rng.random() < 0.8 else "flourishing"
+
+            habits.append({
+                "habit_id": habit_id,
+                "user_id": user_id,
+                "habit_name": rng.choice(HABITS),
+                "frequency": frequency,
+                "plant_state": state,
+                "last_watered": watered.strftime("%Y-%m-%dT%H:%M:%S") if watered else None,
+                "created_at": (now - timedelta(days=rng.randint(1, 365))).isoformat(),
+            })
+
+            if watered is None:
+                continue
+            at = watered
+            for _ in range(rng.randint(0, completions_per_habit)):
+                completions.append({
+                    "completion_id": len(completions) + 1,
+                    "habit_id": habit_id,
+                    "user_id": user_id,
+                    "completion_date": at.date().isoformat(),
+                    "completed_at": at.isoformat(),
+                    "period_key": _period_key(frequency, at.date()),
+                })
+                # Step back one period, sometimes skipping one
+                at -= timedelta(hours=PERIOD_HOURS[frequency] * rng.choice((1, 1, 1, 2)))
+
+    return {"users": users, "habits": habits, "habit_completions": completions}
+
+
+def load(db, dataset):
+    """Load a generated dataset into a LocalSupabase instance."""
+    for table, rows in dataset.items():
+        db.load(table, rows)
+    return db
@@ -0,0 +1,94 @@
+"""
+Response compression for API payloads.
+
+Large JSON responses (habit lists, completion histories) are compressed when
+the client advertises support for it in Accept-Encoding. Brotli is preferred
+when the `brotli` package is installed, gzip otherwise. Small responses are
+sent as-is, since compressing a few hundred bytes costs more CPU than it
+saves on the wire.
+
+Settings (app.config, with env var overrides):
+- COMPRESS_MIN_SIZE: minimum body size in bytes (default 1024)
+- COMPRESS_GZIP_LEVEL: gzip level 1-9 (default 6)
+- COMPRESS_BROTLI_QUALITY: brotli quality 0-11 (default 4)
+"""
+
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+    "text/html",
+}
+
+DEFAULTS = {
+    "COMPRESS_MIN_SIZE": 1024,
+    "COMPRESS_GZIP_LEVEL": 6,
+    "COMPRESS_BROTLI_QUALITY": 4,
+}
+
+
+def choose_encoding(accept_encodings):
+    """Pick 'br', 'gzip' or None from a werkzeug Accept-Encoding object."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_bytes(data, encoding, gzip_level=6, brotli_quality=4):
+    """Compress `data` with the given content coding."""
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime=0 keeps the output deterministic for identical payloads
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def init_compression(app):
+    """Register the after_request hook that compresses large responses."""
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, int(os.environ.get(key, value)))
+
+    @app.after_request
+    def compress_response(response):
+        # Streaming responses (exports) and file passthroughs are left alone
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if "Content-Encoding" in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        response.vary.add("Accept-Encoding")
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        response.set_data(compress_bytes(
+            data,
+            encoding,
+            gzip_level=app.config["COMPRESS_GZIP_LEVEL"],
+            brotli_quality=app.config["COMPRESS_BROTLI_QUALITY"],
+        ))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return app
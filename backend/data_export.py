@@ -0,0 +1,165 @@
+"""
+Streaming export of a user's habits and completion history.
+
+`iter_records` yields one dict per habit, then one per completion, reading
+the database in keyset-paginated pages of EXPORT_PAGE_SIZE rows, so memory
+stays at one page no matter how long the history is. Months that were
+compacted by the retention job are expanded back from their rollups.
+
+Every record carries a `type` ("habit" or "completion"). The formatters
+turn records into NDJSON lines or CSV rows as they arrive; GET
+/habits/export wraps them in a streamed response. The status line is sent
+before the first page is written, so a failure part way through can't
+change it: `until_error` ends the stream with a final
+{"type": "error", "error": ...} record instead (in CSV, a row with the
+`error` column set), and a complete export never contains one.
+"""
+
+import csv
+import io
+import json
+
+from resilience import execute
+import plant_state
+import retention
+
+EXPORT_PAGE_SIZE = 1000
+
+HABIT_FIELDS = ["habit_id", "habit_name", "frequency", "plant_state", "last_watered", "created_at"]
+COMPLETION_FIELDS = ["habit_id", "completion_date", "completed_at", "period_key", "rolled_up"]
+CSV_COLUMNS = ["type"] + HABIT_FIELDS + [f for f in COMPLETION_FIELDS if f not in HABIT_FIELDS] + ["error"]
+
+
+def _pages(query_for, key, first_page=None):
+    """
+    Yield pages of rows; query_for(last_key) builds the query for the page
+    after last_key. `first_page`, if given, is used instead of reading it.
+    """
+    last = None
+    rows = first_page
+    while True:
+        if rows is None:
+            rows = execute(query_for(last).order(key).limit(EXPORT_PAGE_SIZE)).data or []
+        if rows:
+            yield rows
+        if len(rows) < EXPORT_PAGE_SIZE:
+            return
+        last = rows[-1][key]
+        rows = None
+
+
+def habit_pages(supabase, user_id, first_page=None):
+    def query_for(last):
+        # Plan checked in check_query_plans.py: "export habits page"
+        query = supabase.table('habits').select(', '.join(HABIT_FIELDS)).eq('user_id', user_id)
+        return query.gt('habit_id', last) if last is not None else query
+    return _pages(query_for, 'habit_id', first_page)
+
+
+def iter_records(supabase, user_id, first_habit_page=None):
+    """
+    All export records of `user_id`. `first_habit_page` lets the caller read
+    the first page up front (to fail before the response has started).
+    """
+    from habits.routes import get_period_key  # late import: habits.routes imports this module
+
+    frequencies = {}
+    for page in habit_pages(supabase, user_id, first_habit_page):
+        for habit in page:
+            frequencies[habit['habit_id']] = habit.get('frequency', 'daily')
+            yield dict({f: habit.get(f) for f in HABIT_FIELDS}, type="habit", plant_state=plant_state.effective(habit))
+
+    # Raw completions, oldest row first
+    def query_for(last):
+        # Plan checked in check_query_plans.py: "export completions page"
+        query = supabase.table('habit_completions').select('completion_id, ' + ', '.join(COMPLETION_FIELDS[:-1])).eq('user_id', user_id)
+        return query.gt('completion_id', last) if last is not None else query
+    for page in _pages(query_for, 'completion_id'):
+        for row in page:
+            yield dict({f: row.get(f) for f in COMPLETION_FIELDS}, type="completion", rolled_up=False)
+
+    # Compacted months, habit by habit
+    def rollups_for(last):
+        # Plan checked in check_query_plans.py: "export rollups page"
+        query = supabase.table(retention.ROLLUP_TABLE).select('habit_id, month, day_bitmap').eq('user_id', user_id)
+        return query.gt('habit_id', last) if last is not None else query
+    for page in _pages_by_habit(rollups_for):
+        for rollup in page:
+            frequency = frequencies.get(rollup['habit_id'], 'daily')
+            for day in retention.bitmap_days(rollup['month'], int(rollup['day_bitmap'])):
+                yield {
+                    "type": "completion",
+                    "habit_id": rollup['habit_id'],
+                    "completion_date": day.isoformat(),
+                    "completed_at": None,
+                    "period_key": get_period_key(frequency, day),
+                    "rolled_up": True,
+                }
+
+
+def _pages_by_habit(query_for):
+    """Keyset pages over rollups, which share habit_id across months: resume after the last full habit."""
+    last = None
+    while True:
+        rows = execute(query_for(last).order('habit_id').order('month').limit(EXPORT_PAGE_SIZE)).data or []
+        if len(rows) < EXPORT_PAGE_SIZE:
+            if rows:
+                yield rows
+            return
+        last_habit = rows[-1]['habit_id']
+        complete = [r for r in rows if r['habit_id'] != last_habit]
+        if not complete:
+            # One habit fills the whole page (over 80 years of months); emit it as is
+            yield rows
+        else:
+            yield complete
+            last_habit = complete[-1]['habit_id']
+        last = last_habit
+
+
+# --------------------------------------------------------
+#                 FORMATS
+# --------------------------------------------------------
+# Records are buffered into chunks of about this size before being sent
+CHUNK_SIZE = 8192
+
+
+def until_error(records, on_error=None):
+    """Yield the records; if reading them fails, call on_error(e) and end with an error record."""
+    try:
+        yield from records
+    except Exception as e:
+        if on_error:
+            on_error(e)
+        yield {"type": "error", "error": f"Export incomplete: {e}"}
+
+
+def to_ndjson(records, dumps=json.dumps):
+    chunk, size = [], 0
+    for record in records:
+        line = dumps(record).rstrip("\n") + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    yield "".join(chunk)
+
+
+def to_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
@@ -0,0 +1,267 @@
+"""
+Bulk import of historical habit completions.
+
+Input is a CSV or NDJSON stream with one completion per row:
+
+    habit_id or habit_name   which of the user's habits was watered
+    date                     YYYY-MM-DD, or an ISO timestamp (also accepted
+                             as completion_date / completed_at)
+
+CSV needs a header row. Rows are processed in batches of IMPORT_BATCH_SIZE:
+- each row gets its period_key from get_period_key, so a weekly habit
+  imported with several days of one week counts once
+- duplicates are dropped, both within the upload and against completions
+  already stored for the same (habit, period): each batch is written with
+  one upsert that ignores rows conflicting with the unique
+  (habit_id, period_key) index, so a completion written concurrently is
+  skipped instead of failing the batch
+Once all rows are in, last_watered and plant_state are recomputed once per
+touched habit (only moving last_watered forward), and the user's garden
+summary is rebuilt once. If a batch fails, that still happens for the
+batches already written before the error is returned.
+
+An interrupted import can simply be uploaded again: rows that made it in
+the first time are skipped as duplicates.
+
+Months older than the retention horizon are imported as raw rows; the next
+compaction run folds them into their rollups (merging is a bitwise OR, so
+a day that is already rolled up is not counted twice).
+"""
+
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+from datetime import date, datetime
+
+from resilience import execute
+import delta_sync
+import garden_summary
+import plant_state
+
+logger = logging.getLogger("DataImport")
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ROWS = int(os.environ.get("IMPORT_MAX_ROWS", 500_000))
+MAX_REPORTED_ERRORS = 20
+
+
+class InvalidImport(ValueError):
+    """The upload as a whole cannot be imported (bad format, too many rows)."""
+
+
+# --------------------------------------------------------
+#                 PARSING
+# --------------------------------------------------------
+def _lines(stream):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in iter(lambda: stream.read(64 * 1024), b""):
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def detect_format(requested, content_type, first_line):
+    if requested:
+        return requested
+    content_type = content_type or ""
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    return "ndjson" if first_line.lstrip().startswith("{") else "csv"
+
+
+def iter_rows(stream, requested_format=None, content_type=None):
+    """Yield (line_number, dict) for every non-empty row of the upload."""
+    lines = _lines(stream)
+    first = next(lines, None)
+    if first is None:
+        return
+    import_format = detect_format(requested_format, content_type, first)
+
+    def all_lines():
+        yield first
+        yield from lines
+
+    if import_format == "ndjson":
+        for number, line in enumerate(all_lines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield number, None
+                continue
+            yield number, row if isinstance(row, dict) else None
+    elif import_format == "csv":
+        reader = csv.DictReader(line.rstrip("\r") for line in all_lines())
+        for row in reader:
+            if any(v for v in row.values() if isinstance(v, str) and v.strip()):
+                yield reader.line_num, {k.strip(): (v or "").strip() for k, v in row.items() if k}
+    else:
+        raise InvalidImport("Format must be 'csv' or 'ndjson'")
+
+
+def parse_day(value):
+    """(date, completed_at ISO string) from a date or timestamp value."""
+    value = str(value or "").strip()
+    if not value:
+        raise ValueError("missing date")
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        return day, f"{day.isoformat()}T00:00:00"
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.replace(tzinfo=None) - moment.utcoffset()
+    return moment.date(), moment.isoformat()
+
+
+# --------------------------------------------------------
+#                 IMPORT
+# --------------------------------------------------------
+class Importer:
+    """Imports one user's upload; see the module docstring."""
+
+    def __init__(self, supabase, user_id):
+        from habits.routes import get_period_key  # late import: habits.routes imports this module
+        self.get_period_key = get_period_key
+        self.supabase = supabase
+        self.user_id = user_id
+        habits = execute(
+            supabase.table('habits').select('habit_id, habit_name, frequency, plant_state, last_watered').eq('user_id', user_id)
+        ).data or []
+        self.habits = {str(h['habit_id']): h for h in habits}
+        self.by_name = {}
+        for habit in habits:
+            self.by_name.setdefault((habit.get('habit_name') or '').strip().lower(), habit)
+        self.seen = set()           # (habit_id, period_key) accepted so far
+        self.latest = {}            # habit_id -> latest imported completed_at
+        self.report = {"rows": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+
+    def _error(self, line, message):
+        self.report["invalid"] += 1
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": line, "message": message})
+
+    def _resolve(self, row):
+        habit_id = row.get('habit_id')
+        if habit_id not in (None, ""):
+            return self.habits.get(str(habit_id))
+        name = row.get('habit_name') or row.get('habit')
+        return self.by_name.get(str(name or '').strip().lower())
+
+    def _prepare(self, line, row, today):
+        if row is None:
+            self._error(line, "not a JSON object")
+            return None
+        habit = self._resolve(row)
+        if habit is None:
+            self._error(line, "unknown habit")
+            return None
+        try:
+            day, completed_at = parse_day(row.get('date') or row.get('completion_date') or row.get('completed_at'))
+        except ValueError as e:
+            self._error(line, f"bad date: {e}")
+            return None
+        if day > today:
+            self._error(line, "date is in the future")
+            return None
+        frequency = habit.get('frequency', 'daily')
+        return {
+            'habit_id': habit['habit_id'],
+            'user_id': self.user_id,
+            'completion_date': day.isoformat(),
+            'completed_at': completed_at,
+            'period_key': self.get_period_key(frequency, day)
+        }
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        # Only the rows actually inserted come back; the rest were already stored
+        written = execute(
+            self.supabase.table('habit_completions')
+            .upsert(batch, on_conflict='habit_id,period_key', ignore_duplicates=True)
+        ).data or []
+        self.report["imported"] += len(written)
+        self.report["duplicates"] += len(batch) - len(written)
+        written_keys = {(r['habit_id'], r['period_key']) for r in written}
+        for r in batch:
+            if (r['habit_id'], r['period_key']) in written_keys and r['completed_at'] > self.latest.get(r['habit_id'], ''):
+                self.latest[r['habit_id']] = r['completed_at']
+
+    def run(self, rows):
+        started = time.perf_counter()
+        try:
+            self._import(rows)
+        except Exception:
+            # Batches written before the failure stay written: bring their
+            # habits and the summary up to date, then report the error
+            try:
+                self._finish()
+            except Exception as e:
+                logger.warning(f"Could not update habits after a failed import for user {self.user_id}: {e}")
+            raise
+        self._finish()
+
+        elapsed = time.perf_counter() - started
+        self.report["seconds"] = round(elapsed, 3)
+        self.report["rows_per_second"] = round(self.report["rows"] / elapsed) if elapsed else None
+        return self.report
+
+    def _import(self, rows):
+        today = date.today()
+        batch = []
+        for line, row in rows:
+            self.report["rows"] += 1
+            if self.report["rows"] > IMPORT_MAX_ROWS:
+                raise InvalidImport(f"Too many rows (limit {IMPORT_MAX_ROWS})")
+            completion = self._prepare(line, row, today)
+            if completion is None:
+                continue
+            key = (completion['habit_id'], completion['period_key'])
+            if key in self.seen:
+                self.report["duplicates"] += 1
+                continue
+            self.seen.add(key)
+            batch.append(completion)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+
+    def _finish(self):
+        self.report["habits_updated"] = self._update_habits()
+        if self.report["imported"]:
+            try:
+                garden_summary.rebuild_summary(self.supabase, self.user_id)
+            except Exception as e:
+                logger.warning(f"Could not rebuild garden summary for user {self.user_id}: {e}")
+
+    def _update_habits(self):
+        """Move last_watered forward where the import has newer completions, once per habit."""
+        from habits.routes import parse_datetime_safe
+
+        updated = 0
+        for habit_id, completed_at in self.latest.items():
+            habit = self.habits[str(habit_id)]
+            current = parse_datetime_safe(habit.get('last_watered'))
+            latest = datetime.fromisoformat(completed_at)
+            if current is not None and current.replace(tzinfo=None) >= latest:
+                continue
+            state = plant_state.compute_state(habit.get('frequency', 'daily'), latest, habit.get('plant_state'))
+            execute(
+                self.supabase.table('habits')
+                .update(delta_sync.stamp({'last_watered': completed_at, 'plant_state': state}))
+                .eq('habit_id', habit_id)
+                .eq('user_id', self.user_id)
+            )
+            updated += 1
+        return updated
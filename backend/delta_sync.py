@@ -0,0 +1,146 @@
+"""
+Delta sync for habits.
+
+Every write to a habits row stamps `updated_at` (see `stamp`), and deleting
+a habit leaves a row in `habit_tombstones`. A client that remembers the
+`watermark` of its last sync can ask GET /habits?since=<watermark> for
+just the habits created, updated or wilted after it, plus the ids of the
+habits deleted after it.
+
+The watermark handed out is the time the sync started minus
+SYNC_SKEW_SECONDS (default 5), so a write stamped just before the read but
+committed just after it is picked up by the next sync. Clients may see a
+row twice; they must not miss one.
+
+A full list is returned instead (`full: true`) when:
+- the watermark is older than the tombstone horizon (TOMBSTONE_TTL_DAYS,
+  default 30): deletes from that far back have been forgotten
+- the watermark is from an earlier UTC day: the is_completed_today /
+  is_completed_this_week flags change at midnight without any write
+
+In lazy plant-state mode, plants that wilted since the watermark are
+included too, although wilting did not write to their rows.
+
+SQL:
+    ALTER TABLE habits ADD COLUMN updated_at TIMESTAMP DEFAULT NOW();
+    CREATE INDEX habits_user_updated ON habits (user_id, updated_at);
+
+    CREATE TABLE habit_tombstones (
+      habit_id INTEGER PRIMARY KEY,
+      user_id INTEGER NOT NULL,
+      deleted_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX habit_tombstones_user_deleted ON habit_tombstones (user_id, deleted_at);
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from resilience import execute
+import plant_state
+from query_profiler import job_context, add_job_rows, fail_job
+
+logger = logging.getLogger("DeltaSync")
+
+TOMBSTONE_TABLE = "habit_tombstones"
+SYNC_SKEW_SECONDS = float(os.environ.get("SYNC_SKEW_SECONDS", 5))
+TOMBSTONE_TTL_DAYS = int(os.environ.get("TOMBSTONE_TTL_DAYS", 30))
+JOB_QUERY_DEADLINE = 30
+
+
+def now_iso():
+    return datetime.utcnow().isoformat()
+
+
+def stamp(data):
+    """Return `data` (a habits insert/update payload) with updated_at set to now."""
+    return dict(data, updated_at=now_iso())
+
+
+def parse_watermark(value):
+    """Watermark string to a naive UTC datetime; raises ValueError if malformed."""
+    moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00").replace(" ", "+"))
+    if moment.tzinfo is not None:
+        moment = moment.replace(tzinfo=None) - moment.utcoffset()
+    return moment
+
+
+def next_watermark(read_started):
+    return (read_started - timedelta(seconds=SYNC_SKEW_SECONDS)).isoformat()
+
+
+def needs_full_sync(since, now=None):
+    now = now or datetime.utcnow()
+    return since < now - timedelta(days=TOMBSTONE_TTL_DAYS) or since.date() < now.date()
+
+
+def record_tombstone(supabase, habit):
+    """Remember a deleted habit for clients that sync later."""
+    execute(
+        supabase.table(TOMBSTONE_TABLE).upsert(
+            {'habit_id': habit['habit_id'], 'user_id': habit['user_id'], 'deleted_at': now_iso()},
+            on_conflict='habit_id'
+        )
+    )
+
+
+def changes_since(supabase, user_id, since):
+    """(habits updated at or after `since`, ids of habits deleted at or after `since`)."""
+    since_iso = since.isoformat()
+    # Plan checked in check_query_plans.py: "habits changed since"
+    habits = execute(
+        supabase.table('habits').select('*').eq('user_id', user_id).gte('updated_at', since_iso)
+    ).data or []
+    # Plan checked in check_query_plans.py: "habits deleted since"
+    deleted = execute(
+        supabase.table(TOMBSTONE_TABLE).select('habit_id').eq('user_id', user_id).gte('deleted_at', since_iso)
+    ).data or []
+    if plant_state.is_lazy():
+        habits += _lazily_wilted_since(supabase, user_id, since, {h['habit_id'] for h in habits})
+    live_ids = {h['habit_id'] for h in habits}
+    # A habit id is never reused, but keep the answer consistent if it were
+    return habits, [t['habit_id'] for t in deleted if t['habit_id'] not in live_ids]
+
+
+def _lazily_wilted_since(supabase, user_id, since, already):
+    """
+    In lazy plant-state mode a plant wilts without any write, so updated_at
+    does not move. Find habits whose wilt moment fell after `since`: their
+    last_watered is within the widest wilt window before now.
+    """
+    now = datetime.utcnow()
+    longest = max(plant_state.WILT_AFTER_HOURS.values())
+    shortest = min(plant_state.WILT_AFTER_HOURS.values())
+    # Plan checked in check_query_plans.py: "habits wilted since"
+    candidates = execute(
+        supabase.table('habits').select('*').eq('user_id', user_id)
+        .gte('last_watered', (since - timedelta(hours=longest)).isoformat())
+        .lt('last_watered', (now - timedelta(hours=shortest)).isoformat())
+    ).data or []
+    return [h for h in candidates if h['habit_id'] not in already and plant_state.wilted_between(h, since, now)]
+
+
+@job_context("prune_tombstones")
+def prune_tombstones():
+    """Delete tombstones older than the horizon; older watermarks get a full sync anyway."""
+    from db import get_supabase_client
+
+    supabase = get_supabase_client()
+    if not supabase:
+        logger.error("Could not connect to DB for tombstone pruning.")
+        fail_job("no database connection")
+        return
+
+    try:
+        cutoff = (datetime.utcnow() - timedelta(days=TOMBSTONE_TTL_DAYS)).isoformat()
+        # Plan checked in check_query_plans.py: "tombstones to prune"
+        deleted = execute(
+            supabase.table(TOMBSTONE_TABLE).delete().lt('deleted_at', cutoff),
+            deadline=JOB_QUERY_DEADLINE,
+        ).data or []
+        add_job_rows(len(deleted))
+        logger.info(f"Pruned {len(deleted)} habit tombstone(s) older than {cutoff}.")
+    except Exception as e:
+        fail_job(e)
+        logger.error(f"Error pruning habit tombstones: {e}")
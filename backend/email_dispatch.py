@@ -0,0 +1,416 @@
+"""
+Outbound email pipeline.
+
+Request handlers and scheduler jobs never talk to the email provider. They
+call `enqueue(...)`, which writes the message to a durable outbox (a local
+SQLite file, EMAIL_OUTBOX_PATH) and returns immediately. A dispatcher thread
+claims due messages in batches and hands them to a bounded pool of sender
+threads (EMAIL_CONCURRENCY, default 4):
+
+- per-provider rate limit: at most EMAIL_RATE_LIMIT messages per second
+  (default 2, Resend's free tier limit) per transport, without bursts
+- one dispatcher per outbox: every worker process starts one, but only the
+  holder of the outbox's dispatcher lease sends, so the rate limit holds
+  across workers; another takes over within DISPATCHER_LEASE_SECONDS if
+  the holder dies
+- retry with exponential backoff and jitter, up to EMAIL_MAX_ATTEMPTS
+  (default 5); then the message is marked 'failed'
+- per-user digests: messages with the same digest_key (e.g. one wilting
+  reminder per user per day) are merged while still pending, and dropped
+  once one has been sent
+- crash safety: a claimed message carries a lease; if the process dies
+  mid-send the lease expires and the message is retried. A batch is never
+  larger than the rate limit lets through in half a lease, so a slow
+  provider can't leave claimed messages waiting until they are re-claimed
+  and sent twice
+
+Transports (EMAIL_TRANSPORT):
+- log (default): only logs the message; reminders still show on the website
+- resend: the send_*_email helpers in email_service (needs a verified domain)
+- smtp: plain SMTP to SMTP_HOST:SMTP_PORT (e.g. `python -m aiosmtpd -n -l localhost:1025`)
+- http: JSON POST to EMAIL_HTTP_URL (any local stand-in that answers 2xx)
+"""
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from rate_limit import InMemoryBucketStore
+
+logger = logging.getLogger("EmailDispatch")
+
+OUTBOX_PATH = os.environ.get(
+    "EMAIL_OUTBOX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_outbox.db"),
+)
+CONCURRENCY = int(os.environ.get("EMAIL_CONCURRENCY", 4))
+RATE_LIMIT = float(os.environ.get("EMAIL_RATE_LIMIT", 2))
+MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 5))
+BACKOFF_BASE = 30.0     # seconds before the first retry
+BACKOFF_CAP = 3600.0
+LEASE_SECONDS = 120.0   # a claimed message is retried if not finished by then
+DISPATCHER_LEASE_SECONDS = 30.0  # renewed before every batch by the sending dispatcher
+POLL_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    user_name TEXT,
+    habit_names TEXT NOT NULL DEFAULT '[]',
+    digest_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS email_outbox_due ON email_outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS email_dispatcher (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT NOT NULL,
+    lease_until REAL NOT NULL
+);
+"""
+
+
+# --------------------------------------------------------
+#                 OUTBOX
+# --------------------------------------------------------
+class Outbox:
+    """Durable message queue in a SQLite file. Safe to share between threads and processes."""
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, kind, recipient, user_name=None, habit_names=None, digest_key=None):
+        """Add a message. Returns its id, or None if its digest was already sent."""
+        habit_names = list(habit_names or [])
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if digest_key is not None:
+                row = conn.execute(
+                    "SELECT id, status, habit_names FROM email_outbox WHERE digest_key = ?", (digest_key,)
+                ).fetchone()
+                if row is not None:
+                    if row["status"] == "pending":
+                        # Fold into the pending digest instead of sending twice
+                        merged = list(dict.fromkeys(json.loads(row["habit_names"]) + habit_names))
+                        conn.execute("UPDATE email_outbox SET habit_names = ? WHERE id = ?", (json.dumps(merged), row["id"]))
+                        conn.execute("COMMIT")
+                        return row["id"]
+                    conn.execute("COMMIT")
+                    return None
+            cursor = conn.execute(
+                "INSERT INTO email_outbox (kind, recipient, user_name, habit_names, digest_key, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, recipient, user_name, json.dumps(habit_names), digest_key, now, now),
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, limit):
+        """Lease up to `limit` due messages to this process."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Expired leases belong to a sender that died; make them due again
+            conn.execute(
+                "UPDATE email_outbox SET status = 'pending' WHERE status = 'sending' AND lease_until < ?", (now,)
+            )
+            rows = conn.execute(
+                "SELECT * FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE email_outbox SET status = 'sending', lease_until = ? WHERE id = ?",
+                    [(now + LEASE_SECONDS, r["id"]) for r in rows],
+                )
+            conn.execute("COMMIT")
+            return [dict(r, habit_names=json.loads(r["habit_names"])) for r in rows]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def mark_sent(self, message_id):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE email_outbox SET status = 'sent', sent_at = ?, lease_until = NULL WHERE id = ?",
+                (time.time(), message_id),
+            )
+
+    def mark_failed(self, message, error):
+        """Schedule a retry with backoff, or give up after MAX_ATTEMPTS."""
+        attempts = message["attempts"] + 1
+        if attempts >= MAX_ATTEMPTS:
+            status, next_at = "failed", message["next_attempt_at"]
+        else:
+            delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** (attempts - 1)))
+            status, next_at = "pending", time.time() + random.uniform(delay / 2, delay)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE email_outbox SET status = ?, attempts = ?, next_attempt_at = ?, lease_until = NULL, last_error = ? WHERE id = ?",
+                (status, attempts, next_at, str(error)[:500], message["id"]),
+            )
+        return status
+
+    def acquire_dispatcher(self, owner, seconds=DISPATCHER_LEASE_SECONDS):
+        """Take or renew the dispatcher lease for `owner`. False while another holds it."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, lease_until FROM email_dispatcher WHERE id = 1").fetchone()
+            held = row is None or row["owner"] == owner or row["lease_until"] < now
+            if held:
+                conn.execute(
+                    "INSERT OR REPLACE INTO email_dispatcher (id, owner, lease_until) VALUES (1, ?, ?)",
+                    (owner, now + seconds),
+                )
+            conn.execute("COMMIT")
+            return held
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def release_dispatcher(self, owner):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM email_dispatcher WHERE id = 1 AND owner = ?", (owner,))
+
+    def counts(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM email_outbox GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+
+# --------------------------------------------------------
+#                 TRANSPORTS
+# --------------------------------------------------------
+SUBJECTS = {
+    "wilting_reminder": "Your plants are wilting 🥀",
+    "daily_reminder": "Time to water your habits 💧",
+}
+
+def render(message):
+    """Subject and plain-text body for transports that don't template themselves."""
+    names = "\n".join(f"  - {n}" for n in message["habit_names"])
+    greeting = f"Hi {message['user_name']}," if message.get("user_name") else "Hi,"
+    body = f"{greeting}\n\nThese habits need some water:\n{names}\n\nSee you in the garden!\n"
+    return SUBJECTS.get(message["kind"], "Pot Your Progress"), body
+
+
+class ResendTransport:
+    """Sends through the existing email_service helpers (Resend API)."""
+    name = "resend"
+
+    def send(self, message):
+        import email_service
+        sender = {
+            "wilting_reminder": email_service.send_wilting_reminder_email,
+            "daily_reminder": email_service.send_daily_reminder_email,
+        }[message["kind"]]
+        result = sender(user_email=message["recipient"], user_name=message["user_name"], habit_names=message["habit_names"])
+        if not result:
+            raise RuntimeError("email_service returned no result")
+
+
+class SMTPTransport:
+    name = "smtp"
+
+    def __init__(self, host=None, port=None, sender=None):
+        self.host = host or os.environ.get("SMTP_HOST", "localhost")
+        self.port = int(port or os.environ.get("SMTP_PORT", 1025))
+        self.sender = sender or os.environ.get("EMAIL_FROM", "reminders@potyourprogress.local")
+
+    def send(self, message):
+        import smtplib
+        from email.message import EmailMessage
+
+        subject, body = render(message)
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message["recipient"]
+        email["Subject"] = subject
+        email.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(email)
+
+
+class HTTPTransport:
+    name = "http"
+
+    def __init__(self, url=None):
+        self.url = url or os.environ.get("EMAIL_HTTP_URL", "http://localhost:8025/send")
+
+    def send(self, message):
+        import urllib.request
+
+        subject, body = render(message)
+        data = json.dumps({"to": message["recipient"], "subject": subject, "text": body, "kind": message["kind"]}).encode()
+        req = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=10) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"HTTP {response.status}")
+
+
+class LogTransport:
+    name = "log"
+
+    def send(self, message):
+        subject, _ = render(message)
+        logger.info(f"[email:log] to={message['recipient']} subject={subject!r} habits={message['habit_names']}")
+
+
+TRANSPORTS = {"resend": ResendTransport, "smtp": SMTPTransport, "http": HTTPTransport, "log": LogTransport}
+
+def transport_from_env():
+    return TRANSPORTS[os.environ.get("EMAIL_TRANSPORT", "log")]()
+
+
+# --------------------------------------------------------
+#                 DISPATCHER
+# --------------------------------------------------------
+class Dispatcher:
+    """Claims due messages and sends them with bounded concurrency and a rate limit."""
+
+    def __init__(self, outbox, transport, concurrency=CONCURRENCY, rate_limit=RATE_LIMIT):
+        self.outbox = outbox
+        self.transport = transport
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        # Process-local, which is enough because only one dispatcher sends
+        self._buckets = InMemoryBucketStore()
+        self.owner = f"{os.getpid()}:{id(self)}"
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="email-send")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _acquire_send_slot(self):
+        # One bucket per provider, shared by all sender threads. It holds a
+        # single token, so sends are spaced 1/rate apart and no one-second
+        # window sees more than the provider's per-second quota, even when
+        # the dispatcher starts with a backlog
+        while not self._stop.is_set():
+            allowed, retry_after = self._buckets.take(f"email:{self.transport.name}", 1, 1 / self.rate_limit)
+            if allowed:
+                return True
+            time.sleep(retry_after)
+        return False
+
+    def _send(self, message):
+        if not self._acquire_send_slot():
+            return
+        try:
+            self.transport.send(message)
+            self.outbox.mark_sent(message["id"])
+        except Exception as e:
+            status = self.outbox.mark_failed(message, e)
+            level = logging.ERROR if status == "failed" else logging.WARNING
+            logger.log(level, f"Email {message['id']} to {message['recipient']} failed (attempt {message['attempts'] + 1}, {status}): {e}")
+
+    def batch_size(self):
+        # A batch must be sent well inside its messages' lease, and inside the
+        # dispatcher lease, which is only renewed between batches
+        window = min(LEASE_SECONDS, DISPATCHER_LEASE_SECONDS) / 2
+        return max(1, min(self.concurrency * 4, int(self.rate_limit * window)))
+
+    def run_once(self):
+        """Claim and send one batch; returns the number of messages handled."""
+        batch = self.outbox.claim(self.batch_size())
+        list(self._pool.map(self._send, batch))
+        return len(batch)
+
+    def drain(self, timeout=None):
+        """Send until nothing is due (used by scripts and benchmarks)."""
+        started = time.time()
+        while self.run_once():
+            if timeout is not None and time.time() - started > timeout:
+                break
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                # Standby while another worker's dispatcher holds the lease
+                if not self.outbox.acquire_dispatcher(self.owner) or not self.run_once():
+                    self._stop.wait(POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"Email dispatcher error: {e}")
+                self._stop.wait(POLL_INTERVAL)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="email-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
+        if self._thread is not None:
+            try:
+                self.outbox.release_dispatcher(self.owner)
+            except Exception as e:
+                logger.warning(f"Could not release the dispatcher lease: {e}")
+
+
+# --------------------------------------------------------
+#                 MODULE-LEVEL API
+# --------------------------------------------------------
+_outbox = None
+_dispatcher = None
+_lock = threading.RLock()
+
+def get_outbox():
+    global _outbox
+    with _lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        return _outbox
+
+def enqueue(kind, recipient, user_name=None, habit_names=None, digest_key=None):
+    """Queue an email for delivery; never blocks on the provider."""
+    return get_outbox().enqueue(kind, recipient, user_name, habit_names, digest_key)
+
+def start_dispatcher():
+    """Start the background dispatcher (once per process)."""
+    global _dispatcher
+    import atexit
+    with _lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher(get_outbox(), transport_from_env())
+            _dispatcher.start()
+            atexit.register(_dispatcher.stop)
+            logger.info(f"Email dispatcher started: transport={_dispatcher.transport.name}, concurrency={_dispatcher.concurrency}")
+    return _dispatcher
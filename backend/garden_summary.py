@@ -0,0 +1,372 @@
+"""
+Per-user garden summary, maintained incrementally.
+
+One row per user in the `garden_summaries` table answers "how is this
+garden doing" without scanning the user's habits:
+
+    habit_count, daily_count, weekly_count
+    flourishing_count, wilting_count
+    daily_done_count / daily_done_key    (daily habits watered in period daily_done_key)
+    weekly_done_count / weekly_done_key  (weekly habits watered in period weekly_done_key)
+    last_activity_at                     (most recent watering)
+
+"Due today" is derived on read: a done counter only counts while its period
+key is still the current one, so nothing has to be reset at midnight.
+
+The write paths (create/update/delete habit, completion, the wilting job)
+call the apply_* helpers after their own write has succeeded. Each change
+is sent as a delta to the apply_garden_summary_deltas function (migration
+0003), which increments the counters in one UPDATE, so concurrent changes
+don't overwrite each other and the wilting job updates all affected users
+in a few round trips. If a helper fails, the request still succeeds and the
+summary drifts until the reconciliation job (reconcile_summaries, run
+daily) rebuilds it from the habits table.
+
+SQL:
+    CREATE TABLE garden_summaries (
+      user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+      habit_count INTEGER NOT NULL DEFAULT 0,
+      daily_count INTEGER NOT NULL DEFAULT 0,
+      weekly_count INTEGER NOT NULL DEFAULT 0,
+      flourishing_count INTEGER NOT NULL DEFAULT 0,
+      wilting_count INTEGER NOT NULL DEFAULT 0,
+      daily_done_count INTEGER NOT NULL DEFAULT 0,
+      daily_done_key VARCHAR(20),
+      weekly_done_count INTEGER NOT NULL DEFAULT 0,
+      weekly_done_key VARCHAR(20),
+      last_activity_at TIMESTAMP,
+      updated_at TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+import logging
+from datetime import date, datetime
+
+from resilience import execute
+from query_profiler import job_context, add_job_rows, fail_job
+
+logger = logging.getLogger("GardenSummary")
+
+TABLE = "garden_summaries"
+COUNTERS = [
+    "habit_count", "daily_count", "weekly_count",
+    "flourishing_count", "wilting_count",
+    "daily_done_count", "weekly_done_count",
+]
+
+# Page size (users, and habits per page of users) for the reconciliation job
+RECONCILE_PAGE_SIZE = 1000
+
+
+def _current_keys(today=None):
+    from habits.routes import get_period_key  # late import: habits.routes imports this module
+    today = today or date.today()
+    return {"daily": get_period_key("daily", today), "weekly": get_period_key("weekly", today)}
+
+
+def _later(a, b):
+    if not a:
+        return b
+    if not b:
+        return a
+    return max(a, b)
+
+
+def empty_summary(user_id, today=None):
+    keys = _current_keys(today)
+    summary = {"user_id": user_id, "last_activity_at": None}
+    summary.update({c: 0 for c in COUNTERS})
+    summary["daily_done_key"] = keys["daily"]
+    summary["weekly_done_key"] = keys["weekly"]
+    return summary
+
+
+def build_summary(user_id, habits, today=None):
+    """Compute a summary from the user's habit rows (used for rebuilds)."""
+    from habits.routes import is_completed_from_row
+    today = today or date.today()
+    summary = empty_summary(user_id, today)
+    for habit in habits:
+        frequency = habit.get("frequency", "daily")
+        summary["habit_count"] += 1
+        summary[f"{frequency}_count"] += 1
+        summary[f"{habit.get('plant_state', 'flourishing')}_count"] += 1
+        if is_completed_from_row(habit, set(), today):
+            summary[f"{frequency}_done_count"] += 1
+        summary["last_activity_at"] = _later(summary["last_activity_at"], habit.get("last_watered"))
+    return summary
+
+
+def to_response(summary, today=None):
+    """Public shape of a summary, with the due counts resolved for today."""
+    keys = _current_keys(today)
+    daily_done = summary["daily_done_count"] if summary.get("daily_done_key") == keys["daily"] else 0
+    weekly_done = summary["weekly_done_count"] if summary.get("weekly_done_key") == keys["weekly"] else 0
+    return {
+        "habit_count": summary["habit_count"],
+        "daily_count": summary["daily_count"],
+        "weekly_count": summary["weekly_count"],
+        "flourishing_count": summary["flourishing_count"],
+        "wilting_count": summary["wilting_count"],
+        "due_today": max(0, summary["daily_count"] - daily_done) + max(0, summary["weekly_count"] - weekly_done),
+        "daily_due": max(0, summary["daily_count"] - daily_done),
+        "weekly_due": max(0, summary["weekly_count"] - weekly_done),
+        "last_activity_at": summary.get("last_activity_at"),
+        "updated_at": summary.get("updated_at"),
+    }
+
+
+# --------------------------------------------------------
+#                 READ / REBUILD
+# --------------------------------------------------------
+def _save(supabase, summary):
+    row = dict(summary)
+    row["updated_at"] = datetime.utcnow().isoformat()
+    execute(supabase.table(TABLE).upsert(row, on_conflict="user_id"))
+    return row
+
+
+def rebuild_summary(supabase, user_id):
+    """Recompute one user's summary from their habits and store it."""
+    # Plan checked in check_query_plans.py: "habits of user"
+    response = execute(
+        supabase.table('habits')
+        .select('habit_id, frequency, plant_state, last_watered')
+        .eq('user_id', user_id)
+    )
+    return _save(supabase, build_summary(user_id, response.data or []))
+
+
+def get_summary(supabase, user_id):
+    """Stored summary for `user_id`, built on first access."""
+    # Plan checked in check_query_plans.py: "garden summary"
+    response = execute(supabase.table(TABLE).select('*').eq('user_id', user_id))
+    if response.data:
+        return response.data[0]
+    return rebuild_summary(supabase, user_id)
+
+
+# --------------------------------------------------------
+#                 INCREMENTAL UPDATES
+# --------------------------------------------------------
+# A change is a delta: counter increments plus, optionally, a done period
+# key with its increment and a last_activity_at candidate, e.g.
+#     {"user_id": 7, "flourishing_count": -2, "wilting_count": 2}
+#     {"user_id": 7, "daily_done_key": "2026-10-19", "daily_done_count": 1, "last_activity_at": "..."}
+# Deltas are applied in the database by DELTA_FUNCTION (migration 0003), as
+# one atomic UPDATE per batch of users.
+DELTA_FUNCTION = "apply_garden_summary_deltas"
+DELTA_BATCH_SIZE = 500
+DONE_FREQUENCIES = ("daily", "weekly")
+
+_delta_function_missing = False
+
+
+def merge_delta(summary, delta):
+    """Apply a delta to a summary dict in place (what DELTA_FUNCTION does in SQL)."""
+    for counter in COUNTERS:
+        if counter.endswith("_done_count"):
+            continue
+        summary[counter] = max(0, (summary.get(counter) or 0) + (delta.get(counter) or 0))
+    for frequency in DONE_FREQUENCIES:
+        period_key = delta.get(f"{frequency}_done_key")
+        if period_key is not None:
+            _bump_done(summary, frequency, period_key, delta.get(f"{frequency}_done_count") or 0)
+            summary[f"{frequency}_done_count"] = max(0, summary[f"{frequency}_done_count"])
+    summary["last_activity_at"] = _later(summary.get("last_activity_at"), delta.get("last_activity_at"))
+    return summary
+
+
+def _bump_done(summary, frequency, period_key, delta):
+    key_field, count_field = f"{frequency}_done_key", f"{frequency}_done_count"
+    if summary.get(key_field) != period_key:
+        summary[key_field] = period_key
+        summary[count_field] = 0
+    summary[count_field] = (summary.get(count_field) or 0) + delta
+
+
+def _apply_read_modify_write(supabase, delta):
+    """Fallback for databases without DELTA_FUNCTION; not safe against concurrent updates."""
+    response = execute(supabase.table(TABLE).select('*').eq('user_id', delta["user_id"]))
+    if response.data:
+        _save(supabase, merge_delta(response.data[0], delta))
+        return True
+    return False
+
+
+def apply_deltas(supabase, deltas):
+    """
+    Apply deltas (at most one per user) atomically, DELTA_BATCH_SIZE users
+    per round trip. Returns the user ids that have no summary row yet;
+    get_summary builds those from the habits table on first read.
+    """
+    global _delta_function_missing
+    missing = []
+    for i in range(0, len(deltas), DELTA_BATCH_SIZE):
+        batch = deltas[i:i + DELTA_BATCH_SIZE]
+        if not _delta_function_missing:
+            try:
+                updated = execute(supabase.rpc(DELTA_FUNCTION, {"deltas": batch})).data or []
+                found = {row["user_id"] for row in updated}
+                missing.extend(d["user_id"] for d in batch if d["user_id"] not in found)
+                continue
+            except Exception as e:
+                if getattr(e, "code", None) != "PGRST202":  # function not found
+                    raise
+                _delta_function_missing = True
+                logger.warning(f"{DELTA_FUNCTION} is missing (run migrate.py); updating summaries row by row")
+        missing.extend(d["user_id"] for d in batch if not _apply_read_modify_write(supabase, d))
+    return missing
+
+
+def _apply(supabase, user_id, delta):
+    """
+    Apply one user's delta. A user without a summary row gets a full
+    rebuild instead, which already includes the change. Never raises:
+    drift is repaired by reconcile_summaries.
+    """
+    try:
+        if apply_deltas(supabase, [dict(delta, user_id=user_id)]):
+            rebuild_summary(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Could not update garden summary for user {user_id}: {e}")
+
+
+def apply_habit_created(supabase, user_id, habit):
+    _apply(supabase, user_id, {
+        "habit_count": 1,
+        f"{habit.get('frequency', 'daily')}_count": 1,
+        f"{habit.get('plant_state', 'flourishing')}_count": 1,
+    })
+
+
+def apply_habit_deleted(supabase, user_id, habit):
+    from habits.routes import is_completed_from_row
+    frequency = habit.get("frequency", "daily")
+    delta = {
+        "habit_count": -1,
+        f"{frequency}_count": -1,
+        f"{habit.get('plant_state', 'flourishing')}_count": -1,
+    }
+    if is_completed_from_row(habit, set()):
+        delta[f"{frequency}_done_key"] = _current_keys()[frequency]
+        delta[f"{frequency}_done_count"] = -1
+    _apply(supabase, user_id, delta)
+
+
+def apply_habit_updated(supabase, user_id, changes):
+    """Renames don't touch the summary; a frequency change moves counts, so rebuild."""
+    if "frequency" not in changes:
+        return
+    try:
+        rebuild_summary(supabase, user_id)
+    except Exception as e:
+        logger.warning(f"Could not rebuild garden summary for user {user_id}: {e}")
+
+
+def apply_completion(supabase, user_id, habit_before, completed_at, period_key):
+    """A habit was watered: count it as done and revive it if it was wilting."""
+    frequency = habit_before.get("frequency", "daily")
+    delta = {
+        f"{frequency}_done_key": period_key,
+        f"{frequency}_done_count": 1,
+        "last_activity_at": completed_at,
+    }
+    if habit_before.get("plant_state") == "wilting":
+        delta["wilting_count"] = -1
+        delta["flourishing_count"] = 1
+    _apply(supabase, user_id, delta)
+
+
+def apply_wilted(supabase, habits):
+    """
+    Habits the scheduler just turned from flourishing to wilting (rows with
+    user_id): one delta per user, applied in batches. Never raises.
+    """
+    per_user = {}
+    for habit in habits:
+        per_user[habit["user_id"]] = per_user.get(habit["user_id"], 0) + 1
+    deltas = [{"user_id": u, "flourishing_count": -n, "wilting_count": n} for u, n in per_user.items()]
+    try:
+        apply_deltas(supabase, deltas)
+    except Exception as e:
+        logger.warning(f"Could not update garden summaries for {len(deltas)} user(s): {e}")
+
+
+# --------------------------------------------------------
+#                 RECONCILIATION JOB
+# --------------------------------------------------------
+@job_context("reconcile_summaries")
+def reconcile_summaries():
+    """
+    Rebuild every summary from the habits table and store the ones that
+    drifted. Users are walked in keyset-paginated pages and each page's
+    habits and summaries are read and compared before the next page, so
+    memory is bounded by one page of users.
+    """
+    from db import get_supabase_client
+
+    supabase = get_supabase_client()
+    if not supabase:
+        logger.error("Could not connect to DB for summary reconciliation.")
+        fail_job("no database connection")
+        return
+
+    try:
+        checked = repaired = 0
+        last_user = 0
+        while True:
+            # Plan checked in check_query_plans.py: "reconcile users page"
+            users = execute(
+                supabase.table('users').select('user_id').gt('user_id', last_user).order('user_id').limit(RECONCILE_PAGE_SIZE),
+                deadline=30,
+            ).data or []
+            if not users:
+                break
+            user_ids = [row['user_id'] for row in users]
+
+            habits_by_user = {}
+            for habit in _habits_of_users(supabase, user_ids):
+                habits_by_user.setdefault(habit['user_id'], []).append(habit)
+            stored = {
+                row['user_id']: row
+                # Plan checked in check_query_plans.py: "reconcile summaries of users"
+                for row in execute(supabase.table(TABLE).select('*').in_('user_id', user_ids), deadline=30).data or []
+            }
+
+            for user_id in user_ids:
+                fresh = build_summary(user_id, habits_by_user.get(user_id, []))
+                current = stored.get(user_id)
+                if current is None or to_response(current) != to_response({**fresh, "updated_at": current.get("updated_at")}):
+                    _save(supabase, fresh)
+                    repaired += 1
+            checked += len(user_ids)
+            add_job_rows(len(user_ids))
+            if len(users) < RECONCILE_PAGE_SIZE:
+                break
+            last_user = user_ids[-1]
+
+        logger.info(f"Garden summaries reconciled: {repaired} of {checked} repaired.")
+    except Exception as e:
+        fail_job(e)
+        logger.error(f"Error reconciling garden summaries: {e}")
+
+
+def _habits_of_users(supabase, user_ids):
+    """The habits of a page of users, themselves read in keyset-paginated pages."""
+    last_id = 0
+    while True:
+        # Plan checked in check_query_plans.py: "reconcile habits of users"
+        page = execute(
+            supabase.table('habits')
+            .select('habit_id, user_id, frequency, plant_state, last_watered')
+            .in_('user_id', user_ids)
+            .gt('habit_id', last_id)
+            .order('habit_id')
+            .limit(RECONCILE_PAGE_SIZE),
+            deadline=30,
+        ).data or []
+        yield from page
+        if len(page) < RECONCILE_PAGE_SIZE:
+            return
+        last_id = page[-1]['habit_id']
@@ -14,18 +14,32 @@ Key Features:
 - Plant Revival: Wilting plants are automatically set to 'flourishing' when completed
 - Duplicate Prevention: Prevents marking the same habit as completed multiple times in the same period
 - Completion History: GET /habits/<habit_id>/completions returns completion history
+- Dashboard Bootstrap: GET /habits/dashboard returns profile, habits and reminders in one call
+- Garden Summary: GET /habits/summary returns per-user counts kept up to date by every write
+- Export: GET /habits/export streams habits and full history as NDJSON or CSV
+- Import: POST /habits/import backfills past completions from CSV or NDJSON
+- Delta Sync: GET /habits?since=<watermark> returns only habits changed or deleted since a previous sync
+- Idempotent Retries: create, complete and send-test-reminder honour an Idempotency-Key header
 """
 
-from flask import Blueprint, request, jsonify, session
-import sys
-import os
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context
 from datetime import datetime, timedelta, date
+import logging
 
-# Path fix to find db.py in parent folder
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from db import get_supabase_client
+from resilience import execute, DatabaseUnavailable, unavailable_response, HEDGE_AFTER
+import data_export
+import data_import
+import delta_sync
+import garden_summary
+import identity_map
+import plant_state
+import retention
+from rate_limit import rate_limit, concurrency_limit, session_user
+from idempotency import idempotent
 
 habits_bp = Blueprint("habits", __name__)
+logger = logging.getLogger(__name__)
 
 # Helper function to get the period key for tracking completions
 def get_period_key(frequency, completion_date=None):
@@ -71,10 +85,20 @@ def parse_datetime_safe(dt_string):
         except:
             return None
 
-def is_already_completed(supabase, habit_id, frequency, completion_date=None):
+def _last_watered(supabase, habit_id, habit=None):
+    """last_watered of a habit, from the given row, the request's identity map, or the database."""
+    if habit is None:
+        habit = identity_map.get('habits', habit_id)
+    if habit is None:
+        habit_response = execute(supabase.table('habits').select('last_watered').eq('habit_id', habit_id))
+        habit = habit_response.data[0] if habit_response.data else {}
+    return parse_datetime_safe(habit.get('last_watered'))
+
+def is_already_completed(supabase, habit_id, frequency, completion_date=None, habit=None):
     """
     Check if the habit is already completed for the current period (day/week).
     Returns True if already completed, False otherwise.
+    Pass the already loaded `habit` row to skip re-fetching it.
     """
     if completion_date is None:
         completion_date = date.today()
@@ -92,19 +116,22 @@ def is_already_completed(supabase, habit_id, frequency, completion_date=None):
             
             # Query habit_completions table if it exists
             try:
-                response = supabase.table('habit_completions').select('*').eq('habit_id', habit_id).eq('period_key', period_key).execute()
+                # Plan checked in check_query_plans.py: "completion in period"
+                response = execute(supabase.table('habit_completions').select('*').eq('habit_id', habit_id).eq('period_key', period_key))
                 if response.data and len(response.data) > 0:
                     return True
+            except DatabaseUnavailable:
+                raise
             except:
                 pass
             
             # Fallback: check last_watered in habits table
             try:
-                habit_response = supabase.table('habits').select('last_watered').eq('habit_id', habit_id).execute()
-                if habit_response.data and habit_response.data[0].get('last_watered'):
-                    last_watered = parse_datetime_safe(habit_response.data[0]['last_watered'])
-                    if last_watered and start_of_day.date() <= last_watered.date() <= end_of_day.date():
-                        return True
+                last_watered = _last_watered(supabase, habit_id, habit)
+                if last_watered and start_of_day.date() <= last_watered.date() <= end_of_day.date():
+                    return True
+            except DatabaseUnavailable:
+                raise
             except:
                 pass
                 
@@ -114,21 +141,25 @@ def is_already_completed(supabase, habit_id, frequency, completion_date=None):
             
             # Query habit_completions table if it exists
             try:
-                response = supabase.table('habit_completions').select('*').eq('habit_id', habit_id).eq('period_key', period_key).execute()
+                response = execute(supabase.table('habit_completions').select('*').eq('habit_id', habit_id).eq('period_key', period_key))
                 if response.data and len(response.data) > 0:
                     return True
+            except DatabaseUnavailable:
+                raise
             except:
                 pass
             
             # Fallback: check last_watered
             try:
-                habit_response = supabase.table('habits').select('last_watered').eq('habit_id', habit_id).execute()
-                if habit_response.data and habit_response.data[0].get('last_watered'):
-                    last_watered = parse_datetime_safe(habit_response.data[0]['last_watered'])
-                    if last_watered and start_of_week <= last_watered.date() <= end_of_week:
-                        return True
+                last_watered = _last_watered(supabase, habit_id, habit)
+                if last_watered and start_of_week <= last_watered.date() <= end_of_week:
+                    return True
+            except DatabaseUnavailable:
+                raise
             except:
                 pass
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         # If there's an error, assume not completed to allow the action
         print(f"Error checking completion status: {e}")
@@ -136,36 +167,180 @@ def is_already_completed(supabase, habit_id, frequency, completion_date=None):
     
     return False
 
+def is_completed_from_row(habit, completed_period_keys, completion_date=None):
+    """
+    Same answer as is_already_completed, computed from data already loaded:
+    the habit row and the set of its period_keys found in habit_completions.
+    Used when completions were fetched in bulk instead of per habit.
+    """
+    if completion_date is None:
+        completion_date = date.today()
+
+    frequency = habit.get('frequency', 'daily')
+    period_key = get_period_key(frequency, completion_date)
+    if not period_key:
+        return False
+    if period_key in completed_period_keys:
+        return True
+
+    last_watered = parse_datetime_safe(habit.get('last_watered'))
+    if not last_watered:
+        return False
+    if frequency == "daily":
+        return last_watered.date() == completion_date
+    start_of_week, end_of_week = get_week_start_end(completion_date)
+    return start_of_week <= last_watered.date() <= end_of_week
+
 # --------------------------------------------------------
 #                 GET ALL HABITS
 # --------------------------------------------------------
 @habits_bp.get("/")
 def get_habits():
-    """Get all habits for the current user with completion status"""
+    """
+    Get all habits for the current user with completion status.
+    With ?since=<watermark> (from a previous response), only the habits
+    changed since then and the ids of deleted ones are returned.
+    """
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"message": "Unauthorized"}), 401
     
+    since = request.args.get('since')
+    if since:
+        try:
+            since = delta_sync.parse_watermark(since)
+        except ValueError:
+            return jsonify({"message": "Invalid 'since' watermark"}), 400
+        if delta_sync.needs_full_sync(since):
+            since = None
+    
     supabase = get_supabase_client()
     if not supabase:
         return jsonify({"message": "Database connection failed"}), 500
     
     try:
-        response = supabase.table('habits').select('*').eq('user_id', user_id).execute()
-        habits = response.data if response.data else []
-        
-        # Add completion status for each habit
+        read_started = datetime.utcnow()
+        deleted = []
+        if since:
+            habits, deleted = delta_sync.changes_since(supabase, user_id, since)
+        else:
+            # Hedged: this read is on the dashboard's critical path
+            # Plan checked in check_query_plans.py: "habits of user"
+            response = execute(supabase.table('habits').select('*').eq('user_id', user_id), hedge_after=HEDGE_AFTER)
+            habits = response.data if response.data else []
+        identity_map.remember('habits', habits)
+        
+        # Add completion status for each habit, on copies: mapped rows stay as stored
+        response_habits = []
         for habit in habits:
             habit_id = habit.get('habit_id')
             frequency = habit.get('frequency', 'daily')
-            is_completed = is_already_completed(supabase, habit_id, frequency)
-            
-            if frequency == 'daily':
-                habit['is_completed_today'] = is_completed
-            else:
-                habit['is_completed_this_week'] = is_completed
+            is_completed = is_already_completed(supabase, habit_id, frequency, habit=habit)
+            status_field = 'is_completed_today' if frequency == 'daily' else 'is_completed_this_week'
+            response_habits.append({
+                **habit,
+                'plant_state': plant_state.effective(habit, read_started),
+                status_field: is_completed,
+            })
         
-        return jsonify({"habits": habits}), 200
+        return jsonify({
+            "habits": response_habits,
+            "deleted": deleted,
+            "full": since is None,
+            "watermark": delta_sync.next_watermark(read_started)
+        }), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+# --------------------------------------------------------
+#                 DASHBOARD BOOTSTRAP (Single Round Trip)
+# --------------------------------------------------------
+@habits_bp.get("/dashboard")
+def get_dashboard():
+    """
+    Everything the dashboard needs on first paint in one response:
+    the user profile, their habits with completion flags, and pending reminders.
+    The returned watermark can be passed to GET /habits?since= afterwards.
+
+    The profile, habits and this period's completions are read with a single
+    embedded PostgREST query (users -> habits -> habit_completions), instead
+    of one query per habit as in GET /habits.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    supabase = get_supabase_client()
+    if not supabase:
+        return jsonify({"message": "Database connection failed"}), 500
+
+    try:
+        today = date.today()
+        current_keys = [get_period_key("daily", today), get_period_key("weekly", today)]
+        read_started = datetime.utcnow()
+
+        # Plan checked in check_query_plans.py: "user by id", "dashboard habits", "dashboard completions"
+        response = execute(
+            supabase.table('users')
+            .select('user_id, full_name, email, habits(*, habit_completions(period_key))')
+            .eq('user_id', user_id)
+            .in_('habits.habit_completions.period_key', current_keys),
+            hedge_after=HEDGE_AFTER,
+        )
+        if not response.data:
+            return jsonify({"message": "User not found"}), 404
+
+        user_row = response.data[0]
+        habits = user_row.get('habits') or []
+        for habit in habits:
+            completed_keys = {c['period_key'] for c in (habit.pop('habit_completions', None) or [])}
+            is_completed = is_completed_from_row(habit, completed_keys, today)
+            habit['plant_state'] = plant_state.effective(habit, read_started)
+            frequency = habit.get('frequency', 'daily')
+            habit['is_completed_today'] = is_completed if frequency == 'daily' else False
+            habit['is_completed_this_week'] = is_completed if frequency == 'weekly' else False
+        habits.sort(key=lambda h: h.get('habit_id') or 0)
+
+        from reminder_storage import get_reminders
+        reminders = get_reminders(user_id)
+
+        return jsonify({
+            "user": {"id": user_row['user_id'], "name": user_row['full_name'], "email": user_row['email']},
+            "habits": habits,
+            "reminders": reminders,
+            "reminder_count": len(reminders),
+            "watermark": delta_sync.next_watermark(read_started)
+        }), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+# --------------------------------------------------------
+#                 GARDEN SUMMARY
+# --------------------------------------------------------
+@habits_bp.get("/summary")
+def get_garden_summary():
+    """
+    Counts for the user's garden (flourishing vs. wilting, due today, last
+    activity), read from the incrementally maintained summary row instead of
+    scanning every habit.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+
+    supabase = get_supabase_client()
+    if not supabase:
+        return jsonify({"message": "Database connection failed"}), 500
+
+    try:
+        summary = garden_summary.get_summary(supabase, user_id)
+        return jsonify({"summary": garden_summary.to_response(summary)}), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -173,6 +348,7 @@ def get_habits():
 #                 CREATE HABIT
 # --------------------------------------------------------
 @habits_bp.post("")
+@idempotent("create-habit")
 def create_habit():
     """Create a new habit"""
     user_id = session.get('user_id')
@@ -191,14 +367,18 @@ def create_habit():
         return jsonify({"message": "Database connection failed"}), 500
     
     try:
-        response = supabase.table('habits').insert({
+        response = execute(supabase.table('habits').insert(delta_sync.stamp({
             'user_id': user_id,
             'habit_name': habit_name,
             'frequency': frequency,
             'plant_state': 'flourishing',
             'last_watered': None
-        }).execute()
+        })))
+        if response.data:
+            garden_summary.apply_habit_created(supabase, user_id, response.data[0])
         return jsonify({"message": "Habit created successfully", "habit": response.data[0] if response.data else None}), 201
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -206,6 +386,9 @@ def create_habit():
 #                 TRACK COMPLETION (Water Droplet Click)
 # --------------------------------------------------------
 @habits_bp.post("/<string:habit_id>/complete")
+@idempotent("complete-habit")
+@rate_limit("complete-user", 30, 60, key=session_user)
+@concurrency_limit("habit-writes", 16)
 def track_completion(habit_id):
     """
     Track a habit completion (water droplet click).
@@ -223,20 +406,19 @@ def track_completion(habit_id):
     
     try:
         # First, get the habit to check ownership and frequency
-        habit_response = supabase.table('habits').select('*').eq('habit_id', habit_id).eq('user_id', user_id).execute()
+        habit = identity_map.load_habit(supabase, habit_id, user_id)
         
-        if not habit_response.data or len(habit_response.data) == 0:
+        if not habit:
             return jsonify({"message": "Habit not found"}), 404
         
-        habit = habit_response.data[0]
         frequency = habit.get('frequency', 'daily')
-        current_state = habit.get('plant_state', 'flourishing')
+        current_state = plant_state.effective(habit)
         
         # Check if already completed for this period
-        if is_already_completed(supabase, habit_id, frequency):
+        if is_already_completed(supabase, habit_id, frequency, habit=habit):
             return jsonify({
                 "message": "Habit already completed for this period",
-                "habit": habit,
+                "habit": dict(habit, plant_state=current_state),
                 "already_completed": True
             }), 200
         
@@ -245,36 +427,46 @@ def track_completion(habit_id):
         completion_date = now.date()
         period_key = get_period_key(frequency, completion_date)
         
-        # Create completion record (if habit_completions table exists)
+        # Create the completion record first: last_watered only moves with one
         try:
-            supabase.table('habit_completions').insert({
+            execute(supabase.table('habit_completions').insert({
                 'habit_id': habit_id,
                 'user_id': user_id,
                 'completion_date': completion_date.isoformat(),
                 'completed_at': now.isoformat(),
                 'period_key': period_key
-            }).execute()
+            }))
         except Exception as e:
-            # If table doesn't exist, that's okay - we'll just update the habit
-            print(f"Note: habit_completions table may not exist: {e}")
-        
+            if getattr(e, 'code', None) != '23505':
+                # DatabaseUnavailable becomes a 503 below, anything else a 500
+                raise
+            # Unique (habit_id, period_key) violation: a concurrent request completed it first
+            return jsonify({
+                "message": "Habit already completed for this period",
+                "habit": dict(habit, plant_state=current_state),
+                "already_completed": True
+            }), 200
+
         # Update the habit: set last_watered and revive if wilting
         update_data = {
             'last_watered': now.isoformat()
         }
         
-        # If plant is wilting, revive it to flourishing
-        if current_state == 'wilting':
+        # If plant is wilting, revive it to flourishing (also resets a
+        # stale 'wilting' left in the column in lazy plant-state mode)
+        if current_state == 'wilting' or habit.get('plant_state') == 'wilting':
             update_data['plant_state'] = 'flourishing'
         
         # Update the habit
-        update_response = supabase.table('habits').update(update_data).eq('habit_id', habit_id).eq('user_id', user_id).execute()
+        update_response = execute(supabase.table('habits').update(delta_sync.stamp(update_data)).eq('habit_id', habit_id).eq('user_id', user_id))
         
         if not update_response.data:
             return jsonify({"message": "Failed to update habit"}), 500
         
         updated_habit = update_response.data[0]
+        identity_map.remember('habits', updated_habit)
         was_revived = current_state == 'wilting'
+        garden_summary.apply_completion(supabase, user_id, habit, now.isoformat(), period_key)
 
         if frequency == 'daily':
             updated_habit['is_completed_today'] = True
@@ -292,6 +484,8 @@ def track_completion(habit_id):
             "period_key": period_key
         }), 200
         
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": f"Error tracking completion: {str(e)}"}), 500
 
@@ -326,12 +520,17 @@ def update_habit(habit_id):
         if not update_data:
             return jsonify({"message": "No valid fields to update"}), 400
         
-        response = supabase.table('habits').update(update_data).eq('habit_id', habit_id).eq('user_id', user_id).execute()
+        # Plan checked in check_query_plans.py: "habit by id"
+        response = execute(supabase.table('habits').update(delta_sync.stamp(update_data)).eq('habit_id', habit_id).eq('user_id', user_id))
         
         if not response.data:
             return jsonify({"message": "Habit not found"}), 404
         
+        identity_map.remember('habits', response.data[0])
+        garden_summary.apply_habit_updated(supabase, user_id, update_data)
         return jsonify({"message": "Habit updated successfully", "habit": response.data[0]}), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -350,21 +549,24 @@ def get_habit(habit_id):
         return jsonify({"message": "Database connection failed"}), 500
     
     try:
-        response = supabase.table('habits').select('*').eq('habit_id', habit_id).eq('user_id', user_id).execute()
+        habit = identity_map.load_habit(supabase, habit_id, user_id)
         
-        if not response.data or len(response.data) == 0:
+        if not habit:
             return jsonify({"message": "Habit not found"}), 404
         
-        habit = response.data[0]
         frequency = habit.get('frequency', 'daily')
         
         # Check if already completed for current period
-        is_completed = is_already_completed(supabase, habit_id, frequency)
-        
-        habit['is_completed_today'] = is_completed if frequency == 'daily' else False
-        habit['is_completed_this_week'] = is_completed if frequency == 'weekly' else False
-        
-        return jsonify({"habit": habit}), 200
+        is_completed = is_already_completed(supabase, habit_id, frequency, habit=habit)
+        
+        return jsonify({"habit": {
+            **habit,
+            'plant_state': plant_state.effective(habit),
+            'is_completed_today': is_completed if frequency == 'daily' else False,
+            'is_completed_this_week': is_completed if frequency == 'weekly' else False,
+        }}), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -384,11 +586,11 @@ def get_completion_history(habit_id):
     
     try:
         # Verify habit belongs to user
-        habit_response = supabase.table('habits').select('frequency').eq('habit_id', habit_id).eq('user_id', user_id).execute()
-        if not habit_response.data:
+        habit = identity_map.load_habit(supabase, habit_id, user_id)
+        if not habit:
             return jsonify({"message": "Habit not found"}), 404
         
-        frequency = habit_response.data[0].get('frequency', 'daily')
+        frequency = habit.get('frequency', 'daily')
         
         # Get query parameters for date range
         days_back = request.args.get('days', type=int, default=30)
@@ -396,16 +598,24 @@ def get_completion_history(habit_id):
         
         # Try to get completions from habit_completions table
         try:
-            response = supabase.table('habit_completions').select('*').eq('habit_id', habit_id).gte('completion_date', start_date.isoformat()).order('completed_at', desc=True).execute()
+            # Plan checked in check_query_plans.py: "completion history"
+            response = execute(supabase.table('habit_completions').select('*').eq('habit_id', habit_id).gte('completion_date', start_date.isoformat()).order('completed_at', desc=True))
             completions = response.data if response.data else []
+        except DatabaseUnavailable:
+            raise
         except:
             # If table doesn't exist, return empty list
             completions = []
         
-        # Also check last_watered from habits table as fallback
-        habit_full = supabase.table('habits').select('last_watered').eq('habit_id', habit_id).execute()
-        if habit_full.data and habit_full.data[0].get('last_watered'):
-            last_watered_str = habit_full.data[0]['last_watered']
+        # Months older than the retention horizon only exist as monthly rollups
+        seen_dates = {c.get('completion_date') for c in completions}
+        for rolled in retention.rolled_up_completions(supabase, habit_id, frequency, start_date):
+            if rolled['completion_date'] not in seen_dates:
+                completions.append(rolled)
+        
+        # Also check last_watered from the habit row as fallback
+        if habit.get('last_watered'):
+            last_watered_str = habit['last_watered']
             try:
                 last_watered = datetime.fromisoformat(last_watered_str.replace('Z', '+00:00'))
                 if last_watered.date() >= start_date:
@@ -430,8 +640,57 @@ def get_completion_history(habit_id):
             "completions": completions,
             "total_completions": len(completions)
         }), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+# --------------------------------------------------------
+#                 EXPORT HABITS AND HISTORY (Streamed)
+# --------------------------------------------------------
+@habits_bp.get("/export")
+def export_habits():
+    """
+    Stream all habits and their full completion history.
+    ?format=ndjson (default) or ?format=csv. Rows are read in keyset pages
+    and written out as they arrive, so memory does not grow with history.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in data_export.FORMATS:
+        return jsonify({"message": "Format must be 'ndjson' or 'csv'"}), 400
+    
+    supabase = get_supabase_client()
+    if not supabase:
+        return jsonify({"message": "Database connection failed"}), 500
+    
+    try:
+        # Read the first page before answering, so a database failure still
+        # gets a proper error status instead of a truncated 200
+        first_page = next(data_export.habit_pages(supabase, user_id), [])
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
+    
+    records = data_export.until_error(
+        data_export.iter_records(supabase, user_id, first_habit_page=first_page),
+        on_error=lambda e: logger.error(f"Export for user {user_id} aborted: {e}"),
+    )
+    if export_format == 'csv':
+        body = data_export.to_csv(records)
+    else:
+        body = data_export.to_ndjson(records, dumps=current_app.json.dumps)
+    
+    mimetype, extension = data_export.FORMATS[export_format]
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="habits-export.{extension}"'}
+    )
 
 # --------------------------------------------------------
 #                 DELETE HABIT
@@ -448,17 +707,71 @@ def delete_habit(habit_id):
         return jsonify({"message": "Database connection failed"}), 500
     
     try:
-        response = supabase.table('habits').delete().eq('habit_id', habit_id).eq('user_id', user_id).execute()
+        # Plan checked in check_query_plans.py: "habit by id"
+        response = execute(supabase.table('habits').delete().eq('habit_id', habit_id).eq('user_id', user_id))
         if not response.data:
             return jsonify({"message": "Habit not found"}), 404
+        identity_map.forget('habits', habit_id)
+        # The habit is gone; side effects below must not turn that into an error
+        try:
+            delta_sync.record_tombstone(supabase, response.data[0])
+        except Exception as e:
+            # Clients syncing with ?since= miss this delete until their next full sync
+            logger.warning(f"Could not record tombstone for habit {habit_id}: {e}")
+        garden_summary.apply_habit_deleted(supabase, user_id, response.data[0])
+
+        # Cascade to the habit's history; leftovers are removed by the weekly purge job
+        try:
+            retention.delete_habit_history(supabase, habit_id)
+        except Exception as e:
+            logger.warning(f"Could not delete completion history for habit {habit_id}: {e}")
         return jsonify({"message": "Habit deleted successfully"}), 200
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
+# --------------------------------------------------------
+#                 BULK IMPORT OF PAST COMPLETIONS
+# --------------------------------------------------------
+@habits_bp.post("/import")
+@rate_limit("import-user", 10, 3600, key=session_user)
+@concurrency_limit("imports", 2)
+def import_completions():
+    """
+    Import historical completions from a CSV or NDJSON body (or a 'file'
+    upload) with one (habit_id or habit_name, date) per row. ?format=csv|ndjson
+    overrides detection. Returns counts of imported, duplicate and invalid rows.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"message": "Unauthorized"}), 401
+    
+    supabase = get_supabase_client()
+    if not supabase:
+        return jsonify({"message": "Database connection failed"}), 500
+    
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    content_type = upload.mimetype if upload else request.mimetype
+    
+    try:
+        importer = data_import.Importer(supabase, user_id)
+        rows = data_import.iter_rows(stream, request.args.get('format'), content_type)
+        report = importer.run(rows)
+        return jsonify({"message": "Import finished", **report}), 200
+    except data_import.InvalidImport as e:
+        return jsonify({"message": str(e)}), 400
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        return jsonify({"message": f"Error importing completions: {str(e)}"}), 500
+
 # --------------------------------------------------------
 #                 SEND TEST REMINDER EMAIL
 # --------------------------------------------------------
 @habits_bp.post("/send-test-reminder")
+@idempotent("test-reminder")
 def send_test_reminder():
     """
     Sends a test reminder email to the logged-in user.
@@ -474,7 +787,7 @@ def send_test_reminder():
     
     try:
         # Get user's email and name
-        user_response = supabase.table('users').select('email, full_name').eq('user_id', user_id).execute()
+        user_response = execute(supabase.table('users').select('email, full_name').eq('user_id', user_id))
         
         if not user_response.data or len(user_response.data) == 0:
             return jsonify({"message": "User not found"}), 404
@@ -483,48 +796,22 @@ def send_test_reminder():
         user_email = user_data['email']
         user_name = user_data['full_name']
         
-        # ====================================================================
-        # RESEND EMAIL API CALL - COMMENTED OUT (Visible for review)
-        # ====================================================================
-        # Free tier email services don't allow sending without domain purchase
-        # This code is kept for reference and can be uncommented once a domain is purchased
-        # 
-        # from email_service import send_daily_reminder_email
-        # import logging
-        # 
-        # logger = logging.getLogger(__name__)
-        # 
-        # # Send a test email with a generic message
-        # logger.info(f"Attempting to send test reminder email to {user_email}")
-        # result = send_daily_reminder_email(
-        #     user_email=user_email,
-        #     user_name=user_name,
-        #     habit_names=["Test Reminder"]
-        # )
-        # 
-        # if result:
-        #     logger.info(f"Test reminder email sent successfully to {user_email}")
-        #     return jsonify({
-        #         "message": "Test reminder email sent successfully! Please check your inbox.",
-        #         "email": user_email
-        #     }), 200
-        # else:
-        #     logger.error(f"Failed to send test reminder email to {user_email} - send_daily_reminder_email returned None")
-        #     # Provide helpful error message about Resend restrictions
-        #     return jsonify({
-        #         "message": f"Failed to send test email to {user_email}. During Resend testing, you can only send emails to the address you used to sign up for Resend. Please verify your email in Resend dashboard or use your Resend signup email for testing."
-        #     }), 500
-        # ====================================================================
-        
-        # Store test reminder for popup display instead
+        # Queue the test email; the email dispatcher sends it in the background
+        import email_dispatch
+        queued = email_dispatch.enqueue("daily_reminder", user_email, user_name=user_name, habit_names=["Test Reminder"])
+
+        # Also store test reminder for popup display
         from reminder_storage import add_reminder
         add_reminder(user_id, ["Test Reminder"])
         
         return jsonify({
             "message": "Test reminder created! You will see it as a popup notification on the dashboard.",
-            "email": user_email
+            "email": user_email,
+            "email_id": queued
         }), 200
             
+    except DatabaseUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -0,0 +1,326 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A client that may retry a request (flaky mobile network, double submit)
+sends the same `Idempotency-Key: <unique string>` header on every attempt.
+For routes wrapped with `idempotent(scope)`:
+
+- the first request with a key runs normally and its response is stored
+  for IDEMPOTENCY_TTL_SECONDS (default 24 h)
+- a repeat gets the stored response (with `Idempotency-Replayed: true`)
+  without running the view, so without touching the database
+- a repeat that arrives while the first is still running waits for its
+  result (up to IDEMPOTENCY_WAIT_SECONDS, default 30, then 409 with
+  Retry-After) instead of running a second time
+- reusing a key for a different request (other path or body) is rejected
+  with 422
+- responses that ask for a retry (429, 5xx) and exceptions are not stored,
+  so the next attempt runs again
+
+Keys are scoped per user (or per client IP before login), so one client
+can't replay another's response. Requests without the header are not
+affected.
+
+Responses live in memory by default: per process, at most
+IDEMPOTENCY_MAX_ENTRIES of them, dropping the least recently used. With
+several workers a retry can land on another process, so set
+IDEMPOTENCY_STORAGE_URL to a redis:// URL to share them (requires the
+`redis` package, like RATELIMIT_STORAGE_URL). In Redis an in-flight claim
+expires after IDEMPOTENCY_LOCK_SECONDS (default 60) in case its worker
+dies, and waiting repeats poll for the result.
+
+Put the decorator above rate_limit / concurrency_limit so replays don't
+use up tokens or slots.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, make_response, request
+
+from rate_limit import session_user
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10_000))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", 30))
+IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", 60))
+# Response headers worth replaying; cookies and per-response headers are not
+REPLAYED_HEADERS = ("Content-Type", "Location", "Retry-After")
+
+
+# --------------------------------------------------------
+#                 RESPONSE CACHES
+# --------------------------------------------------------
+# A cache has claim(key, fingerprint) -> (entry, owner), wait(entry, timeout)
+# -> (finished, response), store(key, entry, response) and release(key, entry).
+# A response is (body bytes, status, [(header, value)]).
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None   # (body bytes, status, headers) once stored
+        self.expires = None
+
+
+class ResponseCache:
+    """Bounded LRU of responses by idempotency key, with in-flight entries for coalescing."""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL_SECONDS, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> _Entry
+        self._lock = threading.Lock()
+
+    def claim(self, key, fingerprint):
+        """
+        (entry, owner). The owner runs the request and must call store() or
+        release(); everyone else calls wait().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry, False
+            entry = _Entry(fingerprint)
+            self._entries[key] = entry
+            self._evict()
+            return entry, True
+
+    def _evict(self):
+        # Oldest first; in-flight entries are skipped so their waiters aren't orphaned
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        victims = []
+        for key, entry in self._entries.items():
+            if entry.done.is_set():
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self._entries[key]
+
+    def wait(self, entry, timeout):
+        """(finished, response): response is None if the owner released the entry."""
+        finished = entry.done.wait(timeout)
+        return finished, entry.response
+
+    def store(self, key, entry, response):
+        with self._lock:
+            entry.response = response
+            entry.expires = time.monotonic() + self.ttl
+        entry.done.set()
+
+    def release(self, key, entry):
+        """Forget an in-flight entry without a result; waiters retry the request themselves."""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _StoredEntry:
+    """An entry as read from Redis; `raw` is the exact stored value, to detect changes."""
+    __slots__ = ("name", "raw", "fingerprint", "response")
+
+    def __init__(self, name, raw):
+        self.name = name
+        self.raw = raw
+        stored = json.loads(raw)
+        self.fingerprint = stored["fingerprint"]
+        self.response = None
+        if stored.get("response") is not None:
+            body, status, headers = stored["response"]
+            self.response = (base64.b64decode(body), status, [tuple(h) for h in headers])
+
+
+class RedisResponseCache:
+    """Responses in Redis, shared by every worker. Entries expire on their own."""
+
+    # Replace (or, given no value, delete) the entry only if it is still the caller's claim
+    SWAP_SCRIPT = """
+    if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    if ARGV[2] == '' then
+        redis.call('DEL', KEYS[1])
+    else
+        redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+    end
+    return 1
+    """
+    POLL_SECONDS = 0.05
+
+    def __init__(self, url, ttl=IDEMPOTENCY_TTL_SECONDS, lock_seconds=IDEMPOTENCY_LOCK_SECONDS):
+        import redis  # optional dependency, only needed for a shared backend
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._swap = self._redis.register_script(self.SWAP_SCRIPT)
+
+    def claim(self, key, fingerprint):
+        # The random part makes each claim's value unique, so a late store()
+        # or release() can't touch a newer claim of the same key
+        name = f"idempotency:{key}"
+        claim = json.dumps({"fingerprint": fingerprint, "claim": os.urandom(8).hex()})
+        while True:
+            if self._redis.set(name, claim, nx=True, px=int(self.lock_seconds * 1000)):
+                return _StoredEntry(name, claim), True
+            raw = self._redis.get(name)
+            if raw is not None:  # else it was released or expired meanwhile: claim again
+                return _StoredEntry(name, raw), False
+
+    def wait(self, entry, timeout):
+        """Poll until the claim is replaced by a response, released or expired."""
+        deadline = time.monotonic() + timeout
+        while entry.response is None:
+            raw = self._redis.get(entry.name)
+            if raw != entry.raw:
+                # The owner stored its response, or released the key (gone, or
+                # already claimed again by another repeat: no response)
+                changed = _StoredEntry(entry.name, raw) if raw is not None else None
+                return True, changed.response if changed else None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, None
+            time.sleep(min(self.POLL_SECONDS, remaining))
+        return True, entry.response
+
+    def store(self, key, entry, response):
+        body, status, headers = response
+        stored = json.dumps({
+            "fingerprint": entry.fingerprint,
+            "response": [base64.b64encode(body).decode("ascii"), status, headers],
+        })
+        self._swap(keys=[entry.name], args=[entry.raw, stored, int(self.ttl * 1000)])
+
+    def release(self, key, entry):
+        self._swap(keys=[entry.name], args=[entry.raw, "", 0])
+
+    def clear(self):
+        for key in self._redis.scan_iter("idempotency:*"):
+            self._redis.delete(key)
+
+
+def _cache_from_env():
+    url = os.environ.get("IDEMPOTENCY_STORAGE_URL", "memory://")
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisResponseCache(url)
+    return ResponseCache()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Response cache, created from IDEMPOTENCY_STORAGE_URL on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _cache_from_env()
+    return _cache
+
+def set_cache(cache):
+    """Swap the response cache (e.g. a RedisResponseCache configured in code, or a fresh one in tests)."""
+    global _cache
+    _cache = cache
+
+
+# --------------------------------------------------------
+#                 DECORATOR
+# --------------------------------------------------------
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode("utf-8"))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _cacheable(response):
+    return not response.is_streamed and response.status_code != 429 and response.status_code < 500
+
+
+def _error(status, message, retry_after=None):
+    response = jsonify({"message": message})
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _replay(stored):
+    body, status, headers = stored
+    response = make_response(body, status)
+    for name, value in headers:
+        response.headers[name] = value
+    response.headers["Idempotency-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope):
+    """Honour the Idempotency-Key header on this route; see the module docstring."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            client_key = request.headers.get(HEADER)
+            if not client_key:
+                return view(*args, **kwargs)
+            if len(client_key) > MAX_KEY_LENGTH:
+                return _error(400, f"{HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+            key = f"{scope}:{session_user()}:{client_key}"
+            fingerprint = _fingerprint()
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+            cache = get_cache()
+            while True:
+                entry, owner = cache.claim(key, fingerprint)
+                if owner:
+                    break
+                if entry.fingerprint != fingerprint:
+                    return _error(422, f"{HEADER} was already used for a different request")
+                finished, stored = cache.wait(entry, max(0.0, deadline - time.monotonic()))
+                if not finished:
+                    return _error(409, "A request with this Idempotency-Key is still in progress", retry_after=1)
+                if stored is not None:
+                    return _replay(stored)
+                # The first attempt failed without a stored response: run this one
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                cache.release(key, entry)
+                raise
+            if _cacheable(response):
+                headers = [(name, response.headers[name]) for name in REPLAYED_HEADERS if name in response.headers]
+                cache.store(key, entry, (response.get_data(), response.status_code, headers))
+            else:
+                cache.release(key, entry)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,85 @@
+"""
+Request-scoped identity map for database rows.
+
+Within one request, a habit row is loaded once and then reused: route
+handlers and helpers such as is_already_completed look rows up here before
+going to the database. Rows live on flask.g, so they are dropped at the end
+of the request and never shared between users or requests.
+
+- load_habit(supabase, habit_id, user_id)  fetch-or-reuse one habit owned by user_id
+- remember(table, rows)                    register rows loaded some other way
+- get(table, row_id)                       a row already loaded in this request, or None
+- forget(table, row_id)                    drop a row after a write that changed it
+
+Outside a request (scheduler jobs, scripts) nothing is cached and every
+lookup goes to the database, as before.
+
+Rows returned by get/load_habit are the mapped rows themselves and must
+match the database: treat them as read-only and build responses from
+copies ({**habit, ...}). remember() stores its own copies, so rows passed
+in can still be changed by the caller.
+"""
+
+from flask import g, has_request_context
+
+from resilience import execute
+
+# Primary key column of each table that rows are cached for
+PRIMARY_KEYS = {
+    "habits": "habit_id",
+    "users": "user_id",
+}
+
+
+def _rows():
+    if not has_request_context():
+        return None
+    if "identity_map" not in g:
+        g.identity_map = {}
+    return g.identity_map
+
+
+def _key(table, row_id):
+    # Route parameters are strings, database ids are ints
+    return (table, str(row_id))
+
+
+def get(table, row_id):
+    rows = _rows()
+    if rows is None:
+        return None
+    return rows.get(_key(table, row_id))
+
+
+def remember(table, rows_to_add):
+    """Register full rows (select '*') so later lookups in this request reuse them."""
+    rows = _rows()
+    if rows is None:
+        return
+    if isinstance(rows_to_add, dict):
+        rows_to_add = [rows_to_add]
+    pk = PRIMARY_KEYS[table]
+    for row in rows_to_add or []:
+        if row.get(pk) is not None:
+            rows[_key(table, row[pk])] = dict(row)
+
+
+def forget(table, row_id):
+    rows = _rows()
+    if rows is not None:
+        rows.pop(_key(table, row_id), None)
+
+
+def load_habit(supabase, habit_id, user_id):
+    """The habit `habit_id` if it belongs to `user_id`, else None. One query per request at most."""
+    habit = get("habits", habit_id)
+    if habit is None:
+        # Plan checked in check_query_plans.py: "habit by id"
+        response = execute(supabase.table('habits').select('*').eq('habit_id', habit_id).eq('user_id', user_id))
+        if not response.data:
+            return None
+        habit = response.data[0]
+        remember("habits", habit)
+    if str(habit.get('user_id')) != str(user_id):
+        return None
+    return habit
@@ -0,0 +1,188 @@
+"""
+Scheduler job telemetry and run history.
+
+`install(scheduler)` registers APScheduler event listeners that turn every
+job run into a structured record:
+
+    job, status (ok / error / missed / skipped), scheduled_at, started_at,
+    finished_at, duration_ms, lag_ms (start - scheduled time), rows,
+    round_trips, interval_s, budget_ratio (duration / interval), error
+
+Start/end times, rows and round trips come from the job's JobContext
+(query_profiler.job_context); the listener adds the scheduled time, the
+outcome and the job's interval. Records go into a ring buffer of the last
+JOB_HISTORY_SIZE runs (default 200), and per-job aggregates are kept for
+metrics. A run that uses more than JOB_BUDGET_WARN_RATIO (default 0.5) of
+its interval is logged as a warning.
+
+Served by GET /admin/jobs (history and per-job summary) and GET
+/admin/metrics (Prometheus text format).
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import query_profiler
+
+logger = logging.getLogger("JobTelemetry")
+
+JOB_HISTORY_SIZE = int(os.environ.get("JOB_HISTORY_SIZE", 200))
+JOB_BUDGET_WARN_RATIO = float(os.environ.get("JOB_BUDGET_WARN_RATIO", 0.5))
+
+_history = deque(maxlen=JOB_HISTORY_SIZE)
+_totals = {}  # job -> aggregates, see _account
+_lock = threading.Lock()
+
+
+def _iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _interval_seconds(job):
+    interval = getattr(getattr(job, "trigger", None), "interval", None)
+    return interval.total_seconds() if interval is not None else None
+
+
+# --------------------------------------------------------
+#                 RECORDING
+# --------------------------------------------------------
+def _account(run):
+    with _lock:
+        _history.append(run)
+        totals = _totals.setdefault(run["job"], {
+            "runs": 0, "errors": 0, "missed": 0, "skipped": 0,
+            "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "round_trips": 0, "last": None,
+        })
+        totals["runs"] += 1
+        if run["status"] == "error":
+            totals["errors"] += 1
+        elif run["status"] in ("missed", "skipped"):
+            totals[run["status"]] += 1
+        if run["duration_ms"] is not None:
+            totals["total_ms"] += run["duration_ms"]
+            totals["max_ms"] = max(totals["max_ms"], run["duration_ms"])
+        totals["rows"] += run["rows"] or 0
+        totals["round_trips"] += run["round_trips"] or 0
+        totals["last"] = run
+
+    ratio = run.get("budget_ratio")
+    if ratio is not None and ratio >= JOB_BUDGET_WARN_RATIO:
+        logger.warning(f"Job {run['job']} used {ratio:.0%} of its {run['interval_s']:.0f}s interval ({run['duration_ms']:.0f} ms)")
+
+
+def record_run(job_id, status, scheduled=None, context=None, interval_s=None, error=None):
+    """Build and store the record of one run. `scheduled` is a datetime or None."""
+    started = context.started if context else None
+    finished = context.finished if context else None
+    duration_ms = (finished - started) * 1000 if started is not None and finished is not None else None
+    scheduled_ts = scheduled.timestamp() if scheduled is not None else None
+    run = {
+        "job": job_id,
+        "status": status,
+        "scheduled_at": _iso(scheduled_ts),
+        "started_at": _iso(started),
+        "finished_at": _iso(finished),
+        "duration_ms": round(duration_ms, 2) if duration_ms is not None else None,
+        "lag_ms": round((started - scheduled_ts) * 1000, 2) if started is not None and scheduled_ts is not None else None,
+        "rows": context.rows if context else None,
+        "round_trips": context.queries if context else None,
+        "interval_s": interval_s,
+        "budget_ratio": round(duration_ms / 1000 / interval_s, 4) if duration_ms is not None and interval_s else None,
+        "error": str(error)[:500] if error is not None else None,
+    }
+    _account(run)
+    return run
+
+
+def install(scheduler):
+    """Attach the telemetry listeners to an APScheduler scheduler."""
+    from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+
+    def on_event(event):
+        try:
+            job = scheduler.get_job(event.job_id)
+            interval_s = _interval_seconds(job) if job is not None else None
+            scheduled = getattr(event, "scheduled_run_time", None)
+            if scheduled is None:
+                scheduled = (getattr(event, "scheduled_run_times", None) or [None])[0]
+            if event.code == EVENT_JOB_MISSED:
+                record_run(event.job_id, "missed", scheduled, interval_s=interval_s)
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                record_run(event.job_id, "skipped", scheduled, interval_s=interval_s)
+            else:
+                context = query_profiler.pop_finished_job(event.job_id)
+                error = getattr(event, "exception", None) or (context.error if context else None)
+                status = "error" if event.code == EVENT_JOB_ERROR or error is not None else "ok"
+                record_run(event.job_id, status, scheduled, context, interval_s, error)
+        except Exception as e:
+            logger.debug(f"Could not record job telemetry: {e}")
+
+    scheduler.add_listener(on_event, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+
+# --------------------------------------------------------
+#                 READING
+# --------------------------------------------------------
+def history(job=None, limit=50):
+    """Most recent runs first, optionally for one job."""
+    with _lock:
+        runs = [r for r in _history if job is None or r["job"] == job]
+    return list(reversed(runs))[:limit]
+
+
+def summary():
+    """Per-job aggregates."""
+    with _lock:
+        items = [(name, dict(totals)) for name, totals in _totals.items()]
+    result = {}
+    for name, totals in items:
+        timed_runs = totals["runs"] - totals["missed"] - totals["skipped"]
+        last = totals.pop("last")
+        totals["avg_ms"] = round(totals["total_ms"] / timed_runs, 2) if timed_runs else None
+        totals["total_ms"] = round(totals["total_ms"], 2)
+        totals["last_status"] = last["status"] if last else None
+        totals["last_started_at"] = last["started_at"] if last else None
+        totals["last_duration_ms"] = last["duration_ms"] if last else None
+        totals["last_budget_ratio"] = last["budget_ratio"] if last else None
+        totals["last_lag_ms"] = last["lag_ms"] if last else None
+        totals["interval_s"] = last["interval_s"] if last else None
+        result[name] = totals
+    return result
+
+
+def prometheus_metrics():
+    """The per-job aggregates in Prometheus text exposition format."""
+    jobs = summary()
+    metrics = [
+        ("job_runs_total", "counter", "Job runs by outcome", None),
+        ("job_duration_seconds_total", "counter", "Total time spent running the job", lambda t: t["total_ms"] / 1000),
+        ("job_duration_seconds_max", "gauge", "Longest run", lambda t: t["max_ms"] / 1000),
+        ("job_last_duration_seconds", "gauge", "Duration of the last run", lambda t: (t["last_duration_ms"] or 0) / 1000),
+        ("job_last_start_lag_seconds", "gauge", "Delay between scheduled and actual start of the last run", lambda t: (t["last_lag_ms"] or 0) / 1000),
+        ("job_last_budget_ratio", "gauge", "Last run duration as a fraction of the job interval", lambda t: t["last_budget_ratio"] or 0),
+        ("job_rows_total", "counter", "Rows processed", lambda t: t["rows"]),
+        ("job_round_trips_total", "counter", "Database round trips issued", lambda t: t["round_trips"]),
+    ]
+    lines = []
+    for name, kind, help_text, value in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for job, totals in sorted(jobs.items()):
+            if value is None:
+                ok = totals["runs"] - totals["errors"] - totals["missed"] - totals["skipped"]
+                for status, count in (("ok", ok), ("error", totals["errors"]), ("missed", totals["missed"]), ("skipped", totals["skipped"])):
+                    lines.append(f'{name}{{job="{job}",status="{status}"}} {count}')
+            else:
+                lines.append(f'{name}{{job="{job}"}} {value(totals):g}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _history.clear()
+        _totals.clear()
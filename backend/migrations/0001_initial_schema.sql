@@ -0,0 +1,62 @@
+-- Tables used by the backend (the schema from the README).
+-- Databases created by hand from the README already have these: mark this
+-- version as applied with `python migrate.py --baseline 0001`.
+
+CREATE TABLE IF NOT EXISTS users (
+  user_id SERIAL PRIMARY KEY,
+  full_name VARCHAR(255) NOT NULL,
+  email VARCHAR(255) UNIQUE NOT NULL,
+  password_hash TEXT NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS habits (
+  habit_id SERIAL PRIMARY KEY,
+  user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+  habit_name VARCHAR(255) NOT NULL,
+  frequency VARCHAR(20) CHECK (frequency IN ('daily', 'weekly')) DEFAULT 'daily',
+  plant_state VARCHAR(20) CHECK (plant_state IN ('flourishing', 'wilting')) DEFAULT 'flourishing',
+  last_watered TIMESTAMP,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS habit_completions (
+  completion_id SERIAL PRIMARY KEY,
+  habit_id INTEGER REFERENCES habits(habit_id) ON DELETE CASCADE,
+  user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+  completion_date DATE NOT NULL,
+  completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  period_key VARCHAR(20) NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS habit_completion_rollups (
+  habit_id INTEGER NOT NULL,
+  user_id INTEGER NOT NULL,
+  month VARCHAR(7) NOT NULL,
+  day_bitmap BIGINT NOT NULL DEFAULT 0,
+  completion_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (habit_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS garden_summaries (
+  user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+  habit_count INTEGER NOT NULL DEFAULT 0,
+  daily_count INTEGER NOT NULL DEFAULT 0,
+  weekly_count INTEGER NOT NULL DEFAULT 0,
+  flourishing_count INTEGER NOT NULL DEFAULT 0,
+  wilting_count INTEGER NOT NULL DEFAULT 0,
+  daily_done_count INTEGER NOT NULL DEFAULT 0,
+  daily_done_key VARCHAR(20),
+  weekly_done_count INTEGER NOT NULL DEFAULT 0,
+  weekly_done_key VARCHAR(20),
+  last_activity_at TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS habit_tombstones (
+  habit_id INTEGER PRIMARY KEY,
+  user_id INTEGER NOT NULL,
+  deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,35 @@
+-- Indexes for the filters the routes and jobs run on every request or run.
+-- check_query_plans.py fails if one of those queries falls back to a full scan.
+
+-- Login looks users up by email OR full_name (email is already UNIQUE)
+CREATE INDEX IF NOT EXISTS users_full_name ON users (full_name);
+
+-- GET /habits, dashboard, garden summary rebuilds; export pages by habit_id
+CREATE INDEX IF NOT EXISTS habits_user ON habits (user_id, habit_id);
+-- Delta sync (GET /habits?since=)
+CREATE INDEX IF NOT EXISTS habits_user_updated ON habits (user_id, updated_at);
+-- update_plant_states and the lazy-mode reminder query
+CREATE INDEX IF NOT EXISTS habits_frequency_state_watered ON habits (frequency, plant_state, last_watered);
+-- send_reminder_emails in stored mode
+CREATE INDEX IF NOT EXISTS habits_state_user ON habits (plant_state, user_id);
+
+-- One completion per habit and period. Keep the oldest of any duplicates
+-- written before the constraint existed.
+DELETE FROM habit_completions
+WHERE completion_id NOT IN (
+  SELECT MIN(completion_id) FROM habit_completions GROUP BY habit_id, period_key
+);
+CREATE UNIQUE INDEX IF NOT EXISTS habit_completions_habit_period ON habit_completions (habit_id, period_key);
+-- Completion history (GET /habits/<id>/completions)
+CREATE INDEX IF NOT EXISTS habit_completions_habit_date ON habit_completions (habit_id, completion_date);
+-- Export pages by completion_id
+CREATE INDEX IF NOT EXISTS habit_completions_user ON habit_completions (user_id, completion_id);
+-- Retention compaction (filters and orders by date, then id)
+CREATE INDEX IF NOT EXISTS habit_completions_date ON habit_completions (completion_date, completion_id);
+
+-- Export of compacted history
+CREATE INDEX IF NOT EXISTS habit_completion_rollups_user ON habit_completion_rollups (user_id, habit_id, month);
+
+-- Delta sync deletes, and pruning
+CREATE INDEX IF NOT EXISTS habit_tombstones_user_deleted ON habit_tombstones (user_id, deleted_at);
+CREATE INDEX IF NOT EXISTS habit_tombstones_deleted ON habit_tombstones (deleted_at);
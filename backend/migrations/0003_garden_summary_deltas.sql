@@ -0,0 +1,42 @@
+-- dialect: postgresql
+-- Atomic, batched garden summary updates (garden_summary.apply_deltas).
+-- `deltas` is a JSON array with at most one object per user; counters are
+-- added, done counters restart when the period key moves on, and
+-- last_activity_at only moves forward. Returns the users that have a
+-- summary row; the others are built on first read.
+
+CREATE OR REPLACE FUNCTION apply_garden_summary_deltas(deltas jsonb)
+RETURNS TABLE (user_id integer)
+LANGUAGE sql
+AS $$
+  UPDATE garden_summaries AS s SET
+    habit_count = GREATEST(0, s.habit_count + COALESCE(d.habit_count, 0)),
+    daily_count = GREATEST(0, s.daily_count + COALESCE(d.daily_count, 0)),
+    weekly_count = GREATEST(0, s.weekly_count + COALESCE(d.weekly_count, 0)),
+    flourishing_count = GREATEST(0, s.flourishing_count + COALESCE(d.flourishing_count, 0)),
+    wilting_count = GREATEST(0, s.wilting_count + COALESCE(d.wilting_count, 0)),
+    daily_done_count = CASE
+      WHEN d.daily_done_key IS NULL THEN s.daily_done_count
+      WHEN s.daily_done_key = d.daily_done_key THEN GREATEST(0, s.daily_done_count + COALESCE(d.daily_done_count, 0))
+      ELSE GREATEST(0, COALESCE(d.daily_done_count, 0))
+    END,
+    daily_done_key = COALESCE(d.daily_done_key, s.daily_done_key),
+    weekly_done_count = CASE
+      WHEN d.weekly_done_key IS NULL THEN s.weekly_done_count
+      WHEN s.weekly_done_key = d.weekly_done_key THEN GREATEST(0, s.weekly_done_count + COALESCE(d.weekly_done_count, 0))
+      ELSE GREATEST(0, COALESCE(d.weekly_done_count, 0))
+    END,
+    weekly_done_key = COALESCE(d.weekly_done_key, s.weekly_done_key),
+    last_activity_at = GREATEST(s.last_activity_at, d.last_activity_at),
+    updated_at = NOW()
+  FROM jsonb_to_recordset(deltas) AS d(
+    user_id integer,
+    habit_count integer, daily_count integer, weekly_count integer,
+    flourishing_count integer, wilting_count integer,
+    daily_done_key varchar, daily_done_count integer,
+    weekly_done_key varchar, weekly_done_count integer,
+    last_activity_at timestamp
+  )
+  WHERE s.user_id = d.user_id
+  RETURNING s.user_id
+$$;
@@ -0,0 +1,6 @@
+-- update_plant_states and the lazy-mode reminder query filter on
+-- frequency = ? AND last_watered < ?. With plant_state between the two in
+-- habits_frequency_state_watered, only `frequency` (two values) could be
+-- used as an index condition, so half the table was read. Replace it.
+CREATE INDEX IF NOT EXISTS habits_frequency_watered ON habits (frequency, last_watered);
+DROP INDEX IF EXISTS habits_frequency_state_watered;
@@ -0,0 +1,77 @@
+"""
+Plant state rules.
+
+A plant wilts when its habit has not been watered for longer than the
+habit's wilt window:
+- daily habits: 20 hours
+- weekly habits: 140 hours
+A plant that was never watered stays as it is (new plants start out
+flourishing).
+
+PLANT_STATE_MODE selects where the state comes from:
+- stored (default): the habits.plant_state column, kept up to date by the
+  hourly update_plant_states job
+- lazy: derived on read from last_watered and frequency, so it is exact at
+  read time and the hourly table-wide write is not scheduled. The column
+  becomes a cache, written only when a plant actually changes state: by
+  completions (revive) and by the daily reminder job (wilt)
+`effective(habit)` answers for either mode.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+WILT_AFTER_HOURS = {"daily": 20, "weekly": 140}
+PLANT_STATE_MODE = os.environ.get("PLANT_STATE_MODE", "stored")
+
+
+def is_lazy():
+    return PLANT_STATE_MODE == "lazy"
+
+
+def wilt_threshold(frequency, now=None):
+    """Habits last watered before this moment are wilting."""
+    now = now or datetime.utcnow()
+    return now - timedelta(hours=WILT_AFTER_HOURS.get(frequency, WILT_AFTER_HOURS["daily"]))
+
+
+def compute_state(frequency, last_watered, current_state="flourishing", now=None):
+    """
+    'flourishing' or 'wilting' for a habit watered at `last_watered` (a naive
+    UTC datetime, or None if never watered).
+    """
+    if last_watered is None:
+        return current_state or "flourishing"
+    if last_watered.tzinfo is not None:
+        last_watered = last_watered.replace(tzinfo=None) - (last_watered.utcoffset() or timedelta(0))
+    return "wilting" if last_watered < wilt_threshold(frequency, now) else "flourishing"
+
+
+def _parse(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def effective(habit, now=None):
+    """The plant state to show for a habits row in the configured mode."""
+    stored = habit.get("plant_state") or "flourishing"
+    if not is_lazy():
+        return stored
+    return compute_state(habit.get("frequency", "daily"), _parse(habit.get("last_watered")), stored, now)
+
+
+def wilted_between(habit, start, end):
+    """True if the habit's wilt moment (last_watered + window) falls in [start, end)."""
+    last_watered = _parse(habit.get("last_watered"))
+    if last_watered is None:
+        return False
+    if last_watered.tzinfo is not None:
+        last_watered = last_watered.replace(tzinfo=None) - (last_watered.utcoffset() or timedelta(0))
+    wilts_at = last_watered + timedelta(hours=WILT_AFTER_HOURS.get(habit.get("frequency"), WILT_AFTER_HOURS["daily"]))
+    return start <= wilts_at < end
@@ -0,0 +1,236 @@
+"""
+Slow-query log and per-shape query statistics.
+
+resilience.execute() reports every query here with its duration. For each
+query we capture its *shape*: table, operation, filtered columns (not the
+values), projection, order and limit. Two queries that differ only in the
+user id they look up share a shape, so stats aggregate into a small table:
+
+    habits select filters=(user_id) select=*          count=1200  total=3.1s  max=210ms
+    users  select filters=(or:email,or:full_name)   count=80    total=0.9s  max=95ms
+
+Calls to database functions through rpc() get the operation `rpc:<name>`;
+their arguments travel in the request body and are not part of the shape.
+
+Queries slower than SLOW_QUERY_MS (default 200) are logged together with the
+route (Flask endpoint) or scheduler job that issued them. At high volume,
+SLOW_QUERY_SAMPLE_RATE (0-1, default 1) logs only that fraction of them; the
+aggregate stats always see every query.
+
+Scheduler jobs mark themselves with `job_context(name)` so their queries are
+attributed to the job (and counted per run) instead of "unknown".
+
+The aggregate top-N view is served by GET /admin/slow-queries.
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import unquote
+
+from flask import has_request_context, request
+
+logger = logging.getLogger("SlowQueries")
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 1))
+# Shapes are few in practice; the cap only guards against unbounded growth
+MAX_SHAPES = 500
+
+_MODIFIERS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+# --------------------------------------------------------
+#                 JOB CONTEXT
+# --------------------------------------------------------
+class JobContext:
+    """Marks work done on behalf of a scheduler job; counts its queries and the rows it handled."""
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.rows = 0
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+# Most recent finished run of each job, picked up by job_telemetry
+_finished_jobs = {}
+
+@contextlib.contextmanager
+def job_context(name):
+    context = JobContext(name)
+    token = _current_job.set(context)
+    try:
+        yield context
+    finally:
+        _current_job.reset(token)
+        context.finished = time.time()
+        _finished_jobs[name] = context
+
+def current_job():
+    """The JobContext of the running job, or None outside of jobs."""
+    return _current_job.get()
+
+def add_job_rows(count):
+    """Count rows processed by the running job (no-op outside of jobs)."""
+    job = _current_job.get()
+    if job is not None:
+        job.rows += count
+
+def fail_job(error):
+    """Mark the running job as failed; for jobs that catch and log their own errors."""
+    job = _current_job.get()
+    if job is not None:
+        job.error = error
+
+def pop_finished_job(name):
+    return _finished_jobs.pop(name, None)
+
+def current_caller():
+    """'route:<endpoint>', 'job:<name>' or 'unknown'."""
+    job = _current_job.get()
+    if job is not None:
+        return f"job:{job.name}"
+    if has_request_context():
+        return f"route:{request.endpoint}"
+    return "unknown"
+
+
+# --------------------------------------------------------
+#                 QUERY SHAPE
+# --------------------------------------------------------
+def _param_items(params):
+    # A dict is a request body (the local rpc() stand-in keeps its arguments
+    # there), not query-string filters
+    if params is None or isinstance(params, dict):
+        return []
+    if hasattr(params, "multi_items"):  # httpx.QueryParams
+        return params.multi_items()
+    return list(params)
+
+def query_shape(query):
+    """Shape of a postgrest (or local stand-in) query builder, as a hashable tuple."""
+    request_config = getattr(query, "request", query)
+    method = (getattr(request_config, "http_method", None) or "GET").upper()
+    path = str(getattr(request_config, "path", "") or "")
+    items = [(k, unquote(str(v))) for k, v in _param_items(getattr(request_config, "params", None))]
+    keys = {k for k, _ in items}
+
+    name = path.rstrip("/").rsplit("/", 1)[-1]
+    operation = _OPERATIONS.get(method, method.lower())
+    if "/rpc/" in path:
+        # rpc() calls a database function: POST /rpc/<name>, arguments in the body
+        operation = f"rpc:{name}"
+    elif method == "POST" and "on_conflict" in keys:
+        operation = "upsert"
+
+    filters = []
+    for key, value in items:
+        if key in _MODIFIERS:
+            continue
+        if key in ("or", "and"):
+            # or=(email.eq.x,full_name.eq.y) -> or:email, or:full_name
+            terms = value.strip("()").split(",")
+            filters.extend(f"{key}:{t.split('.', 1)[0]}" for t in terms if t)
+        else:
+            op = value.split(".", 1)[0]
+            filters.append(f"{key}.{op}")
+
+    values = dict(items)
+    return (
+        name,
+        operation,
+        tuple(sorted(filters)),
+        values.get("select"),
+        values.get("order"),
+        values.get("limit"),
+    )
+
+def describe_shape(shape):
+    table, operation, filters, projection, order, limit = shape
+    return {
+        "table": table,
+        "operation": operation,
+        "filters": list(filters),
+        "projection": projection,
+        "order": order,
+        "limit": int(limit) if limit is not None and str(limit).isdigit() else limit,
+    }
+
+
+# --------------------------------------------------------
+#                 RECORDING
+# --------------------------------------------------------
+_stats = {}  # shape -> {count, errors, total_ms, max_ms, slow, callers}
+_lock = threading.Lock()
+
+def record(query, duration_ms, error=None):
+    """Account one executed query. Never raises."""
+    try:
+        job = _current_job.get()
+        if job is not None:
+            job.queries += 1
+
+        shape = query_shape(query)
+        caller = current_caller()
+        slow = duration_ms >= SLOW_QUERY_MS
+
+        with _lock:
+            entry = _stats.get(shape)
+            if entry is None:
+                if len(_stats) >= MAX_SHAPES:
+                    # Forget the cheapest shape to make room
+                    del _stats[min(_stats, key=lambda s: _stats[s]["total_ms"])]
+                entry = _stats[shape] = {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0, "callers": {}}
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["callers"][caller] = entry["callers"].get(caller, 0) + 1
+            if error is not None:
+                entry["errors"] += 1
+            if slow:
+                entry["slow"] += 1
+
+        if slow and random.random() < SLOW_QUERY_SAMPLE_RATE:
+            info = describe_shape(shape)
+            logger.warning(
+                f"Slow query ({duration_ms:.0f} ms) from {caller}: {info['operation']} {info['table']} "
+                f"filters={info['filters']} select={info['projection']} order={info['order']} limit={info['limit']}"
+                + (f" error={error}" if error is not None else "")
+            )
+    except Exception as e:
+        logger.debug(f"Could not record query stats: {e}")
+
+def top_shapes(n=20, sort="total"):
+    """The `n` most expensive query shapes, by total time, max time, count or slow count."""
+    sort_key = {"total": "total_ms", "max": "max_ms", "count": "count", "slow": "slow"}.get(sort, "total_ms")
+    with _lock:
+        entries = [(shape, dict(entry, callers=dict(entry["callers"]))) for shape, entry in _stats.items()]
+    entries.sort(key=lambda item: item[1][sort_key], reverse=True)
+
+    result = []
+    for shape, entry in entries[:n]:
+        item = describe_shape(shape)
+        item.update({
+            "count": entry["count"],
+            "errors": entry["errors"],
+            "slow": entry["slow"],
+            "total_ms": round(entry["total_ms"], 2),
+            "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+            "max_ms": round(entry["max_ms"], 2),
+            "callers": entry["callers"],
+        })
+        result.append(item)
+    return result
+
+def reset():
+    with _lock:
+        _stats.clear()
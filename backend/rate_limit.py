@@ -0,0 +1,221 @@
+"""
+Admission control for expensive endpoints.
+
+Two decorators are provided for routes:
+
+- rate_limit(scope, limit, period, key): a token bucket per key (user, IP,
+  submitted email, ...). A bucket holds up to `limit` tokens and refills at
+  `limit / period` tokens per second. A request that finds the bucket empty
+  is rejected with 429 and a Retry-After header.
+
+- concurrency_limit(scope, max_inflight): caps how many requests of a scope
+  run at the same time in this process (e.g. bcrypt hashing). Requests over
+  the cap are shed immediately with 503 and Retry-After instead of queueing
+  behind the slow ones, which keeps tail latency bounded under overload.
+
+Buckets live in memory by default. Set RATELIMIT_STORAGE_URL to a redis://
+URL to share them between workers (requires the `redis` package).
+RATELIMIT_ENABLED=0 turns the limits off (e.g. for load tests).
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request, session
+
+
+# --------------------------------------------------------
+#                 BUCKET STORES
+# --------------------------------------------------------
+class InMemoryBucketStore:
+    """
+    Token buckets in a process-local LRU of at most `max_keys` buckets.
+    Cheap, but not shared between workers.
+    """
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last_refill_monotonic), least recently used first
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, period, cost=1):
+        """
+        Try to take `cost` tokens from the bucket for `key`.
+        Returns (allowed, retry_after_seconds).
+        """
+        rate = limit / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (limit, now))
+            tokens = min(limit, tokens + (now - last) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+            self._buckets.move_to_end(key)
+            # Evicting the least recently used bucket refills it early, which
+            # only errs towards allowing; with max_keys well above the number
+            # of active clients the evicted buckets are long since full
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, shared by every worker. Updated atomically with a Lua script."""
+
+    SCRIPT = """
+    local limit = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or limit
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(limit, tokens + (now - ts) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        retry_after = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(limit / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for a shared backend
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    def take(self, key, limit, period, cost=1):
+        allowed, retry_after = self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[limit, limit / period, time.time(), cost],
+        )
+        return bool(allowed), float(retry_after)
+
+    def reset(self):
+        for key in self._redis.scan_iter("ratelimit:*"):
+            self._redis.delete(key)
+
+
+def _store_from_env():
+    url = os.environ.get("RATELIMIT_STORAGE_URL", "memory://")
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisBucketStore(url)
+    return InMemoryBucketStore()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Bucket store, created from RATELIMIT_STORAGE_URL on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _store_from_env()
+    return _store
+
+def set_store(store):
+    """Swap the bucket store (e.g. a RedisBucketStore configured in code)."""
+    global _store
+    _store = store
+
+def limits_enabled():
+    return os.environ.get("RATELIMIT_ENABLED", "1") != "0"
+
+
+# --------------------------------------------------------
+#                 KEY FUNCTIONS
+# --------------------------------------------------------
+def client_ip():
+    """Client address. Honour X-Forwarded-For only via ProxyFix, not here."""
+    return request.remote_addr or "unknown"
+
+def session_user():
+    """Logged-in user id; falls back to the client IP for anonymous calls."""
+    user_id = session.get("user_id")
+    return f"user:{user_id}" if user_id else f"ip:{client_ip()}"
+
+def json_field(name):
+    """Key on a field of the JSON body (e.g. the email being logged into)."""
+    def key():
+        data = request.get_json(silent=True) or {}
+        value = data.get(name)
+        return f"{name}:{str(value).strip().lower()}" if value else None
+    return key
+
+
+# --------------------------------------------------------
+#                 DECORATORS
+# --------------------------------------------------------
+def _reject(status, message, retry_after):
+    response = jsonify({"message": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def rate_limit(scope, limit, period, key=client_ip):
+    """
+    Allow at most `limit` requests per `period` seconds (with bursts up to
+    `limit`) for each value of `key()`. Stack the decorator to apply
+    several limits, e.g. one per IP and one per account.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if limits_enabled():
+                bucket = key()
+                if bucket is not None:
+                    allowed, retry_after = get_store().take(f"{scope}:{bucket}", limit, period)
+                    if not allowed:
+                        return _reject(429, "Too many requests. Please try again later.", retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+def _semaphore(scope, max_inflight):
+    with _semaphores_lock:
+        if scope not in _semaphores:
+            _semaphores[scope] = threading.BoundedSemaphore(max_inflight)
+        return _semaphores[scope]
+
+def concurrency_limit(scope, max_inflight, retry_after=1):
+    """
+    Run at most `max_inflight` requests of `scope` at once in this process.
+    Routes sharing a scope share the cap. Excess requests get 503 right away.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not limits_enabled():
+                return view(*args, **kwargs)
+            semaphore = _semaphore(scope, max_inflight)
+            if not semaphore.acquire(blocking=False):
+                return _reject(503, "Server is busy. Please try again shortly.", retry_after)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                semaphore.release()
+        return wrapper
+    return decorator
@@ -0,0 +1,299 @@
+"""
+Resilience layer for Supabase queries.
+
+Every query should go through `execute(query)` instead of `query.execute()`:
+
+    response = execute(supabase.table('habits').select('*').eq('user_id', user_id))
+
+On top of a plain execute this adds:
+- a deadline per operation (reads and writes have separate defaults); the
+  caller gets QueryTimeout once it passes, instead of holding the worker
+  thread for the HTTP client's own (2 minute) timeout
+- retry with exponential backoff and full jitter for idempotent reads
+  (GET/HEAD); writes are never retried
+- optional hedging for latency-critical reads: if the first attempt has not
+  answered after `hedge_after` seconds, a second identical request is sent
+  and whichever finishes first wins
+- a circuit breaker shared by all queries: after repeated transport failures
+  it opens and calls fail fast with CircuitOpen until a probe succeeds
+
+Errors returned by PostgREST itself (bad filter, unique violation, ...) mean
+the backend is healthy, so they are raised unchanged, never retried and do
+not count against the breaker. 5xx responses, connection/pool errors and
+statement timeouts (see is_transient) are retried; a call whose attempts
+all fail counts as one breaker failure, however many attempts it made.
+
+Every call is timed and reported to query_profiler (slow-query log).
+
+Routes turn DatabaseUnavailable into a 503 with `unavailable_response(e)`.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from flask import jsonify
+
+import query_profiler
+
+logger = logging.getLogger("Resilience")
+
+# Defaults, overridable through the environment
+READ_DEADLINE = float(os.environ.get("DB_READ_DEADLINE", 5))
+WRITE_DEADLINE = float(os.environ.get("DB_WRITE_DEADLINE", 8))
+READ_RETRIES = int(os.environ.get("DB_READ_RETRIES", 2))
+# Hedge delay for latency-critical reads, roughly the p95 of a healthy read
+HEDGE_AFTER = float(os.environ.get("DB_HEDGE_AFTER", 0.25))
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 1.0
+
+READ_METHODS = ("GET", "HEAD")
+
+
+class DatabaseUnavailable(Exception):
+    """The database could not answer in time or is known to be unhealthy."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueryTimeout(DatabaseUnavailable):
+    """A query did not finish before its deadline."""
+
+
+class CircuitOpen(DatabaseUnavailable):
+    """The circuit breaker is open; the query was not sent."""
+
+
+# --------------------------------------------------------
+#                 CIRCUIT BREAKER
+# --------------------------------------------------------
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+    - closed: calls go through; `failure_threshold` consecutive failures open it
+    - open: calls are rejected until `reset_timeout` seconds have passed
+    - half-open: a single probe call is let through; success closes the
+      breaker, failure re-opens it
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                self._probe_in_flight = False
+            if self.state == "half-open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def is_open(self):
+        with self._lock:
+            return self.state == "open"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit breaker opened after {self.failures} failure(s)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def retry_after(self):
+        with self._lock:
+            if self.state != "open":
+                return 1
+            return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+
+breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get("DB_BREAKER_THRESHOLD", 5)),
+    reset_timeout=float(os.environ.get("DB_BREAKER_RESET", 30)),
+)
+
+# Attempts run here so the caller can stop waiting at the deadline. An
+# abandoned attempt that already started finishes in the background,
+# bounded by the HTTP timeout; one still queued is cancelled.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("DB_MAX_CONCURRENCY", 32)),
+    thread_name_prefix="db-query",
+)
+
+
+# --------------------------------------------------------
+#                 HELPERS
+# --------------------------------------------------------
+def http_method(query):
+    """HTTP method of a postgrest builder (works across postgrest versions)."""
+    request = getattr(query, "request", query)
+    return (getattr(request, "http_method", None) or "GET").upper()
+
+# PostgREST error codes that mean the database (not the query) is in trouble:
+# PGRST000-PGRST003 are connection and pool-timeout errors
+TRANSIENT_PGRST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+# SQLSTATE classes / codes: connection exception, insufficient resources,
+# operator intervention (statement timeout, shutdown), serialization failure, deadlock
+TRANSIENT_SQLSTATE_CLASSES = ("08", "53", "57")
+TRANSIENT_SQLSTATES = ("40001", "40P01")
+
+def _is_transient_api_error(error):
+    """
+    postgrest raises APIError for every non-2xx response. Its `code` is the
+    HTTP status when the body wasn't PostgREST JSON (e.g. a 502 from the
+    gateway), otherwise a PGRST code or a Postgres SQLSTATE.
+    """
+    code = str(error.code or "")
+    if code.isdigit() and len(code) == 3:
+        return int(code) >= 500
+    if code in TRANSIENT_PGRST_CODES or code in TRANSIENT_SQLSTATES:
+        return True
+    return len(code) == 5 and code[:2] in TRANSIENT_SQLSTATE_CLASSES
+
+def is_transient(error):
+    """True for failures that say nothing about the query itself (network, timeouts, 5xx)."""
+    if isinstance(error, (QueryTimeout, ConnectionError, TimeoutError, OSError)):
+        return True
+    try:
+        from postgrest.exceptions import APIError  # installed with supabase
+    except ImportError:
+        APIError = None
+    if APIError is not None and isinstance(error, APIError):
+        return _is_transient_api_error(error)
+    try:
+        import httpx  # installed with supabase
+    except ImportError:
+        return False
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def _wait_first(futures, timeout):
+    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+    return next(iter(done), None)
+
+
+def _attempt(query, deadline_at, hedge_after):
+    """Run one (possibly hedged) attempt, raising QueryTimeout at the deadline."""
+    futures = [_executor.submit(query.execute)]
+    try:
+        return _await_attempt(query, futures, deadline_at, hedge_after)
+    finally:
+        # The caller has its answer or gave up: queued copies must not run
+        # later and add load, least of all while the database is struggling
+        for future in futures:
+            future.cancel()
+
+
+def _await_attempt(query, futures, deadline_at, hedge_after):
+    remaining = deadline_at - time.monotonic()
+
+    if hedge_after is not None and hedge_after < remaining:
+        finished = _wait_first(futures, hedge_after)
+        if finished is None:
+            futures.append(_executor.submit(query.execute))
+        remaining = deadline_at - time.monotonic()
+
+    pending = list(futures)
+    while pending:
+        finished = _wait_first(pending, max(0.0, remaining))
+        if finished is None:
+            raise QueryTimeout("Database query timed out")
+        pending.remove(finished)
+        # A hedge that failed loses to one that may still succeed
+        if finished.exception() is None or not pending:
+            return finished.result()
+        remaining = deadline_at - time.monotonic()
+    raise QueryTimeout("Database query timed out")
+
+
+# --------------------------------------------------------
+#                 EXECUTE
+# --------------------------------------------------------
+def execute(query, deadline=None, retries=None, hedge_after=None):
+    """
+    Execute a postgrest query builder with a deadline, retries for reads,
+    optional hedging and the shared circuit breaker. The total time spent
+    (including retries) is reported to the query profiler.
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        return _execute(query, deadline, retries, hedge_after)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        query_profiler.record(query, (time.perf_counter() - started) * 1000, error)
+
+
+def _execute(query, deadline, retries, hedge_after):
+    is_read = http_method(query) in READ_METHODS
+    if deadline is None:
+        deadline = READ_DEADLINE if is_read else WRITE_DEADLINE
+    if retries is None:
+        retries = READ_RETRIES if is_read else 0
+    if not is_read:
+        # Writes are not idempotent: never send them twice
+        retries, hedge_after = 0, None
+
+    deadline_at = time.monotonic() + deadline
+    if not breaker.allow():
+        raise CircuitOpen("Database temporarily unavailable", retry_after=breaker.retry_after())
+    attempt = 0
+    while True:
+        try:
+            result = _attempt(query, deadline_at, hedge_after)
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()
+                raise
+            delay = backoff_delay(attempt)
+            # Retries stop early if other calls have opened the breaker meanwhile
+            if attempt >= retries or time.monotonic() + delay >= deadline_at or breaker.is_open():
+                # One failure per call, however many attempts it made
+                breaker.record_failure()
+                if isinstance(e, DatabaseUnavailable):
+                    raise
+                raise DatabaseUnavailable(f"Database error: {e}") from e
+            attempt += 1
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+def unavailable_response(error):
+    """503 response with Retry-After for a DatabaseUnavailable error."""
+    response = jsonify({"message": "Database temporarily unavailable. Please try again shortly."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(getattr(error, "retry_after", 1))
+    return response
@@ -0,0 +1,285 @@
+"""
+Completion-history retention.
+
+Raw `habit_completions` rows are kept for RETENTION_DAYS (default 365).
+Whole calendar months older than that are compacted into one row per habit
+and month in `habit_completion_rollups`:
+
+    day_bitmap        bit (d - 1) is set if the habit was completed on day d
+    completion_count  number of days completed in that month
+
+so a habit's history costs at most one raw row per period inside the
+horizon plus one small row per month before it.
+
+Jobs (registered in scheduler.start_scheduler):
+- compact_completions: daily; folds old raw rows into rollups, merging with
+  any rollup already stored for that month, then deletes the raw rows.
+  Rollups are written before raw rows are deleted, and merging is a bitwise
+  OR, so a run interrupted halfway is safely redone by the next one.
+- purge_orphaned_completions: weekly; deletes completions and rollups whose
+  habit no longer exists, in batches.
+
+Readers use `rolled_up_completions` to expand rollups back into per-day
+entries, so history queries see one continuous list.
+
+SQL:
+    CREATE TABLE habit_completion_rollups (
+      habit_id INTEGER NOT NULL,
+      user_id INTEGER NOT NULL,
+      month VARCHAR(7) NOT NULL,            -- YYYY-MM
+      day_bitmap BIGINT NOT NULL DEFAULT 0,
+      completion_count INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (habit_id, month)
+    );
+"""
+
+import logging
+import os
+from datetime import date, timedelta
+
+from resilience import execute
+from query_profiler import job_context, add_job_rows, fail_job
+
+logger = logging.getLogger("Retention")
+
+ROLLUP_TABLE = "habit_completion_rollups"
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", 365))
+BATCH_SIZE = 1000
+JOB_QUERY_DEADLINE = 30
+
+
+def compaction_cutoff(today=None):
+    """
+    First day of the oldest month that is kept raw. Everything before it is
+    compacted; months are never split between raw rows and a rollup.
+    """
+    today = today or date.today()
+    horizon = today - timedelta(days=RETENTION_DAYS)
+    return horizon.replace(day=1)
+
+
+def month_key(day):
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def _month_start(key):
+    year, month = key.split("-")
+    return date(int(year), int(month), 1)
+
+
+def bitmap_days(key, bitmap):
+    """Dates whose bit is set in a month's bitmap."""
+    start = _month_start(key)
+    days = []
+    day = 0
+    while bitmap >> day:
+        if (bitmap >> day) & 1:
+            days.append(start + timedelta(days=day))
+        day += 1
+    return days
+
+
+# --------------------------------------------------------
+#                 READ PATH
+# --------------------------------------------------------
+def rolled_up_completions(supabase, habit_id, frequency, start_date):
+    """
+    Completions on or after `start_date` that only exist as rollups, as
+    completion-shaped dicts (completed_at is unknown, so it is None).
+    Skips the query entirely when `start_date` is inside the raw horizon.
+    """
+    from habits.routes import get_period_key  # late import: habits.routes imports this module
+
+    if start_date >= compaction_cutoff():
+        return []
+
+    # Plan checked in check_query_plans.py: "rollups of habit"
+    response = execute(
+        supabase.table(ROLLUP_TABLE)
+        .select('month, day_bitmap')
+        .eq('habit_id', habit_id)
+        .gte('month', month_key(start_date))
+        .order('month', desc=True)
+    )
+    completions = []
+    for rollup in response.data or []:
+        for day in reversed(bitmap_days(rollup['month'], int(rollup['day_bitmap']))):
+            if day >= start_date:
+                completions.append({
+                    'habit_id': habit_id,
+                    'completion_date': day.isoformat(),
+                    'completed_at': None,
+                    'period_key': get_period_key(frequency, day),
+                    'rolled_up': True
+                })
+    return completions
+
+
+def delete_habit_history(supabase, habit_id):
+    """Remove raw completions and rollups of a deleted habit."""
+    execute(supabase.table('habit_completions').delete().eq('habit_id', habit_id))
+    execute(supabase.table(ROLLUP_TABLE).delete().eq('habit_id', habit_id))
+
+
+# --------------------------------------------------------
+#                 COMPACTION JOB
+# --------------------------------------------------------
+def _merge_rollups(supabase, rows):
+    """Fold raw completion rows into their monthly rollups (read, OR, upsert)."""
+    groups = {}
+    for row in rows:
+        day = date.fromisoformat(str(row['completion_date'])[:10])
+        key = (row['habit_id'], month_key(day))
+        entry = groups.setdefault(key, {'habit_id': row['habit_id'], 'user_id': row['user_id'], 'month': key[1], 'day_bitmap': 0})
+        entry['day_bitmap'] |= 1 << (day.day - 1)
+
+    habit_ids = sorted({habit_id for habit_id, _ in groups})
+    months = sorted({month for _, month in groups})
+    # Plan checked in check_query_plans.py: "rollups to merge"
+    existing = execute(
+        supabase.table(ROLLUP_TABLE)
+        .select('habit_id, month, day_bitmap')
+        .in_('habit_id', habit_ids)
+        .in_('month', months),
+        deadline=JOB_QUERY_DEADLINE,
+    ).data or []
+    for rollup in existing:
+        key = (rollup['habit_id'], rollup['month'])
+        if key in groups:
+            groups[key]['day_bitmap'] |= int(rollup['day_bitmap'])
+
+    rollups = list(groups.values())
+    for rollup in rollups:
+        rollup['completion_count'] = bin(rollup['day_bitmap']).count("1")
+    execute(supabase.table(ROLLUP_TABLE).upsert(rollups, on_conflict='habit_id,month'), deadline=JOB_QUERY_DEADLINE)
+    return len(rollups)
+
+
+@job_context("compact_completions")
+def compact_completions(max_batches=None):
+    """Compact raw completions older than the retention horizon into monthly rollups."""
+    from db import get_supabase_client
+
+    supabase = get_supabase_client()
+    if not supabase:
+        logger.error("Could not connect to DB for completion compaction.")
+        fail_job("no database connection")
+        return
+
+    try:
+        cutoff = compaction_cutoff().isoformat()
+        compacted, rollups_written, batches = 0, 0, 0
+        while max_batches is None or batches < max_batches:
+            # Plan checked in check_query_plans.py: "completions to compact"
+            rows = execute(
+                supabase.table('habit_completions')
+                .select('completion_id, habit_id, user_id, completion_date')
+                .lt('completion_date', cutoff)
+                .order('completion_date')
+                .order('completion_id')
+                .limit(BATCH_SIZE),
+                deadline=JOB_QUERY_DEADLINE,
+            ).data or []
+            if not rows:
+                break
+
+            rollups_written += _merge_rollups(supabase, rows)
+            execute(
+                supabase.table('habit_completions').delete().in_('completion_id', [r['completion_id'] for r in rows]),
+                deadline=JOB_QUERY_DEADLINE,
+            )
+            compacted += len(rows)
+            add_job_rows(len(rows))
+            batches += 1
+            if len(rows) < BATCH_SIZE:
+                break
+
+        logger.info(f"Compacted {compacted} completion(s) older than {cutoff} into {rollups_written} monthly rollup write(s).")
+    except Exception as e:
+        fail_job(e)
+        logger.error(f"Error compacting completions: {e}")
+
+
+# --------------------------------------------------------
+#                 ORPHAN PURGE JOB
+# --------------------------------------------------------
+def _purge_table(supabase, table, id_column):
+    """Delete rows of `table` whose habit is gone, scanning in keyset pages."""
+    purged = 0
+    last_id = None
+    while True:
+        query = supabase.table(table).select(f'{id_column}, habit_id').order(id_column).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.gt(id_column, last_id)
+        rows = execute(query, deadline=JOB_QUERY_DEADLINE).data or []
+        if not rows:
+            break
+        last_id = rows[-1][id_column]
+
+        habit_ids = sorted({r['habit_id'] for r in rows})
+        alive = execute(
+            supabase.table('habits').select('habit_id').in_('habit_id', habit_ids),
+            deadline=JOB_QUERY_DEADLINE,
+        ).data or []
+        orphaned = sorted(set(habit_ids) - {h['habit_id'] for h in alive})
+        if orphaned:
+            deleted = execute(
+                supabase.table(table).delete().in_('habit_id', orphaned),
+                deadline=JOB_QUERY_DEADLINE,
+            ).data or []
+            purged += len(deleted)
+        if len(rows) < BATCH_SIZE:
+            break
+    return purged
+
+
+def _purge_rollups(supabase):
+    """Same as _purge_table for rollups, which are keyed by (habit_id, month)."""
+    purged = 0
+    last_habit = None
+    while True:
+        query = supabase.table(ROLLUP_TABLE).select('habit_id').order('habit_id').limit(BATCH_SIZE)
+        if last_habit is not None:
+            query = query.gt('habit_id', last_habit)
+        rows = execute(query, deadline=JOB_QUERY_DEADLINE).data or []
+        if not rows:
+            break
+        habit_ids = sorted({r['habit_id'] for r in rows})
+        # Several months share a habit_id: resume after the last full habit
+        last_habit = habit_ids[-1] if len(rows) < BATCH_SIZE or len(habit_ids) == 1 else habit_ids[-2]
+
+        alive = execute(
+            supabase.table('habits').select('habit_id').in_('habit_id', habit_ids),
+            deadline=JOB_QUERY_DEADLINE,
+        ).data or []
+        orphaned = sorted(set(habit_ids) - {h['habit_id'] for h in alive})
+        if orphaned:
+            deleted = execute(
+                supabase.table(ROLLUP_TABLE).delete().in_('habit_id', orphaned),
+                deadline=JOB_QUERY_DEADLINE,
+            ).data or []
+            purged += len(deleted)
+        if len(rows) < BATCH_SIZE:
+            break
+    return purged
+
+
+@job_context("purge_orphaned_completions")
+def purge_orphaned_completions():
+    """Delete completion rows and rollups left behind by deleted habits."""
+    from db import get_supabase_client
+
+    supabase = get_supabase_client()
+    if not supabase:
+        logger.error("Could not connect to DB for orphan purge.")
+        fail_job("no database connection")
+        return
+
+    try:
+        raw = _purge_table(supabase, 'habit_completions', 'completion_id')
+        rolled = _purge_rollups(supabase)
+        add_job_rows(raw + rolled)
+        logger.info(f"Purged {raw} orphaned completion(s) and {rolled} orphaned rollup(s).")
+    except Exception as e:
+        fail_job(e)
+        logger.error(f"Error purging orphaned completions: {e}")
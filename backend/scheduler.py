@@ -1,7 +1,14 @@
 import atexit
-from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import date, datetime
 from db import get_supabase_client
-# from email_service import send_wilting_reminder_email  # Commented out - visible for review
+from resilience import execute
+import delta_sync
+import garden_summary
+import plant_state
+import retention
+from query_profiler import job_context, add_job_rows, fail_job
+import job_telemetry
+import email_dispatch
 from reminder_storage import add_reminder
 import logging
 
@@ -9,6 +16,10 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("HabitScheduler")
 
+# Bulk job queries touch many rows, so they get a longer deadline than routes
+JOB_QUERY_DEADLINE = 30
+
+@job_context("update_plant_states")
 def update_plant_states():
     """
     Checks all flourishing plants. 
@@ -19,6 +30,7 @@ def update_plant_states():
     supabase = get_supabase_client()
     if not supabase:
         logger.error("Could not connect to DB for scheduled task.")
+        fail_job("no database connection")
         return
 
     try:
@@ -31,70 +43,127 @@ def update_plant_states():
         # Format thresholds for database comparison (ensure ISO format without microseconds)
         daily_threshold_str = daily_threshold.strftime('%Y-%m-%dT%H:%M:%S')
         weekly_threshold_str = weekly_threshold.strftime('%Y-%m-%dT%H:%M:%S')
+        # Wilting is a change delta-syncing clients must see
+        now_str = datetime.utcnow().isoformat()
         
         logger.info(f"Checking for wilting plants. Daily threshold: {daily_threshold_str}, Weekly threshold: {weekly_threshold_str}")
         
         # Update Daily Habits (20 hours threshold)
         # Update all habits (except already wilting ones) where last_watered is more than 20 hours ago
-        daily_response = (supabase.table('habits')
-                         .update({'plant_state': 'wilting'})
-                         .eq('frequency', 'daily')
-                         .lt('last_watered', daily_threshold_str)
-                         .neq('plant_state', 'wilting')
-                         .execute())
+        # Plan checked in check_query_plans.py: "habits to wilt"
+        daily_response = execute(
+            supabase.table('habits')
+            .update({'plant_state': 'wilting', 'updated_at': now_str})
+            .eq('frequency', 'daily')
+            .lt('last_watered', daily_threshold_str)
+            .neq('plant_state', 'wilting'),
+            deadline=JOB_QUERY_DEADLINE,
+        )
         daily_updated = len(daily_response.data) if daily_response.data else 0
 
         # Update Weekly Habits (140 hours threshold)
-        weekly_response = (supabase.table('habits')
-                          .update({'plant_state': 'wilting'})
-                          .eq('frequency', 'weekly')
-                          .lt('last_watered', weekly_threshold_str)
-                          .neq('plant_state', 'wilting')
-                          .execute())
+        # Plan checked in check_query_plans.py: "habits to wilt"
+        weekly_response = execute(
+            supabase.table('habits')
+            .update({'plant_state': 'wilting', 'updated_at': now_str})
+            .eq('frequency', 'weekly')
+            .lt('last_watered', weekly_threshold_str)
+            .neq('plant_state', 'wilting'),
+            deadline=JOB_QUERY_DEADLINE,
+        )
         weekly_updated = len(weekly_response.data) if weekly_response.data else 0
+        garden_summary.apply_wilted(supabase, (daily_response.data or []) + (weekly_response.data or []))
 
+        add_job_rows(daily_updated + weekly_updated)
         logger.info(f"Updated Plants: {daily_updated} daily became wilting, {weekly_updated} weekly became wilting.")
         
         # Debug: Log some habits to see what's happening
         if daily_updated == 0 and weekly_updated == 0:
             # Check what habits exist
-            all_habits = supabase.table('habits').select('habit_id, habit_name, frequency, plant_state, last_watered').limit(5).execute()
+            all_habits = execute(supabase.table('habits').select('habit_id, habit_name, frequency, plant_state, last_watered').limit(5))
             if all_habits.data:
                 logger.info(f"Debug: Found {len(all_habits.data)} habits (showing first 5)")
                 for h in all_habits.data:
                     logger.info(f"  - {h.get('habit_name')}: state={h.get('plant_state')}, last_watered={h.get('last_watered')}, freq={h.get('frequency')}")
             
     except Exception as e:
+        fail_job(e)
         logger.error(f"Error updating plant states: {e}")
         import traceback
         logger.error(traceback.format_exc())
 
+# Habit ids per write-back update in lazy plant-state mode
+WRITE_BACK_CHUNK_SIZE = 500
+
+def find_wilting_habits(supabase):
+    """
+    Habits whose plant is wilting, as rows with user_id and habit_name.
+    In lazy plant-state mode the state is derived from last_watered, and
+    plants that wilted since the column was last written are stored as
+    'wilting' here (the only time the job writes to habits in that mode).
+    """
+    if not plant_state.is_lazy():
+        # Plan checked in check_query_plans.py: "wilting habits"
+        response = execute(supabase.table('habits').select('user_id, habit_name').eq('plant_state', 'wilting'), deadline=JOB_QUERY_DEADLINE)
+        return response.data or []
+
+    now = datetime.utcnow()
+    wilting = []
+    for frequency in plant_state.WILT_AFTER_HOURS:
+        threshold = plant_state.wilt_threshold(frequency, now).strftime('%Y-%m-%dT%H:%M:%S')
+        # Plan checked in check_query_plans.py: "wilting habits by threshold"
+        response = execute(
+            supabase.table('habits')
+            .select('habit_id, user_id, habit_name, plant_state')
+            .eq('frequency', frequency)
+            .lt('last_watered', threshold),
+            deadline=JOB_QUERY_DEADLINE,
+        )
+        wilting.extend(response.data or [])
+
+    transitioned = [h['habit_id'] for h in wilting if h.get('plant_state') != 'wilting']
+    for i in range(0, len(transitioned), WRITE_BACK_CHUNK_SIZE):
+        updated = execute(
+            supabase.table('habits')
+            .update({'plant_state': 'wilting', 'updated_at': now.isoformat()})
+            .in_('habit_id', transitioned[i:i + WRITE_BACK_CHUNK_SIZE])
+            .neq('plant_state', 'wilting'),
+            deadline=JOB_QUERY_DEADLINE,
+        )
+        garden_summary.apply_wilted(supabase, updated.data or [])
+    if transitioned:
+        logger.info(f"Lazy plant state: stored {len(transitioned)} new wilting plant(s).")
+    return wilting
+
+@job_context("send_reminder_emails")
 def send_reminder_emails():
     """
-    Finds users with 'wilting' plants and sends them an email reminder using Resend.
-    Sends emails to the user's signup email address.
+    Finds users with 'wilting' plants and queues an email reminder for each
+    of them (see email_dispatch). Emails go to the user's signup address.
     """
     supabase = get_supabase_client()
     if not supabase:
         logger.error("Could not connect to DB for email reminders.")
+        fail_job("no database connection")
         return
 
     try:
         # Query wilting habits with user info
-        habits_response = supabase.table('habits').select('user_id, habit_name').eq('plant_state', 'wilting').execute()
+        wilting_habits = find_wilting_habits(supabase)
         
-        if not habits_response.data:
+        if not wilting_habits:
             logger.info("No wilting plants found, skipping email reminders.")
             return
         
         # Get unique user IDs
-        user_ids = list(set([h['user_id'] for h in habits_response.data]))
+        user_ids = list(set([h['user_id'] for h in wilting_habits]))
         
         # Get user emails - Query users for each user_id
         users_dict = {}
         for uid in user_ids:
             try:
-                user_response = supabase.table('users').select('user_id, email, full_name').eq('user_id', uid).execute()
+                # Plan checked in check_query_plans.py: "user by id"
+                user_response = execute(supabase.table('users').select('user_id, email, full_name').eq('user_id', uid))
                 if user_response.data and len(user_response.data) > 0:
                     users_dict[uid] = user_response.data[0]
             except Exception as e:
@@ -106,65 +175,92 @@ def send_reminder_emails():
         
         # Create a mapping of user_id to habits
         habits_by_user = {}
-        for h in habits_response.data:
+        for h in wilting_habits:
             user_id = h['user_id']
             if user_id not in habits_by_user:
                 habits_by_user[user_id] = []
             habits_by_user[user_id].append(h['habit_name'])
         
         # Store reminders for display on website (like OTP popup)
-        # Also attempt to send via Resend API (may fail due to free tier restrictions)
+        # and queue the reminder email
         for user_id, user_info in users_dict.items():
             if user_id in habits_by_user:
                 habit_names = habits_by_user[user_id]
                 
                 # Store reminder for website popup display
                 add_reminder(user_id, habit_names)
+                add_job_rows(1)
                 logger.info(f"Reminder stored for user {user_id} ({user_info['email']}) for {len(habit_names)} habit(s)")
                 
-                # ====================================================================
-                # RESEND EMAIL API CALL - COMMENTED OUT (Visible for review)
-                # ====================================================================
-                # Free tier email services don't allow scheduled emails without domain purchase
-                # This code is kept for reference and can be uncommented once a domain is purchased
-                # 
-                # try:
-                #     result = send_wilting_reminder_email(
-                #         user_email=user_info['email'],
-                #         user_name=user_info['full_name'],
-                #         habit_names=habit_names
-                #     )
-                #     if result:
-                #         logger.info(f"Wilting reminder email also sent to {user_info['email']} for {len(habit_names)} habit(s)")
-                #     else:
-                #         logger.info(f"Email sending failed for {user_info['email']} (expected in free tier - reminder will show on website)")
-                # except Exception as mail_err:
-                #     logger.info(f"Email sending exception for {user_info['email']}: {mail_err} (expected in free tier - reminder will show on website)")
-                # ====================================================================
+                # Queue one wilting digest per user per day; the dispatcher
+                # delivers it (with retries) without holding up this job
+                try:
+                    email_dispatch.enqueue(
+                        "wilting_reminder",
+                        user_info['email'],
+                        user_name=user_info['full_name'],
+                        habit_names=habit_names,
+                        digest_key=f"wilting:{user_id}:{date.today().isoformat()}",
+                    )
+                except Exception as mail_err:
+                    logger.error(f"Could not queue reminder email for user {user_id}: {mail_err}")
 
     except Exception as e:
+        fail_job(e)
         logger.error(f"Error sending reminders: {e}")
         import traceback
         logger.error(traceback.format_exc())
 
+# The running scheduler, if any. Guards against starting the jobs twice when
+# create_app() is called more than once in the same process.
+_scheduler = None
+
 def start_scheduler():
     """
     Starts the background scheduler for plant state updates and email reminders.
     No longer requires app or mail parameters since we use Resend directly.
+    Calling it again once the scheduler is running is a no-op.
     """
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+
+    # Imported here so that importing this module (e.g. from tests or the
+    # app factory) does not pay for apscheduler unless jobs are started.
+    from apscheduler.schedulers.background import BackgroundScheduler
+
     scheduler = BackgroundScheduler()
+    # Per-run duration, rows, round trips and interval budget (GET /admin/jobs)
+    job_telemetry.install(scheduler)
     
     # 1. Task: Update Plant States (Run every hour)
-    scheduler.add_job(func=update_plant_states, trigger="interval", hours=1)
+    # Not needed when plant state is derived on read (PLANT_STATE_MODE=lazy)
+    if not plant_state.is_lazy():
+        scheduler.add_job(func=update_plant_states, id="update_plant_states", trigger="interval", hours=1)
     
     # 2. Task: Send Email Reminders (Run daily)
     # Using 'interval' hours for testing purposes, change to 'cron' for production
     # Example for daily at 9:00 AM: trigger="cron", hour=9, minute=0
-    scheduler.add_job(func=send_reminder_emails, trigger="interval", hours=24)
+    scheduler.add_job(func=send_reminder_emails, id="send_reminder_emails", trigger="interval", hours=24)
+
+    # 3. Task: Repair drift in the per-user garden summaries (Run daily)
+    scheduler.add_job(func=garden_summary.reconcile_summaries, id="reconcile_summaries", trigger="interval", hours=24)
+
+    # 4. Task: Compact completions older than the retention horizon (Run daily)
+    scheduler.add_job(func=retention.compact_completions, id="compact_completions", trigger="interval", hours=24)
+
+    # 5. Task: Purge completions of deleted habits (Run weekly)
+    scheduler.add_job(func=retention.purge_orphaned_completions, id="purge_orphaned_completions", trigger="interval", weeks=1)
+
+    # 6. Task: Forget delete tombstones past the delta-sync horizon (Run daily)
+    scheduler.add_job(func=delta_sync.prune_tombstones, id="prune_tombstones", trigger="interval", hours=24)
 
     scheduler.start()
-    logger.info("Scheduler started: Plant state updates (hourly) and email reminders (daily)")
+    logger.info("Scheduler started: Plant state updates (hourly), email reminders, summary reconciliation, completion compaction and tombstone pruning (daily), orphan purge (weekly)")
     
     # Shut down scheduler when exiting the app
     atexit.register(lambda: scheduler.shutdown())
 
+    _scheduler = scheduler
+    return scheduler
+
@@ -0,0 +1,83 @@
+"""
+Unit tests for app.py: building the app with create_app() registers the
+blueprints without importing the heavy dependencies, and the background
+jobs start only when asked to.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import bench_startup
+from local_db import stub_reminder_storage
+
+stub_reminder_storage()
+
+import email_dispatch
+import scheduler
+from app import create_app
+
+
+class TestCreateApp(unittest.TestCase):
+
+    def test_routes_are_registered(self):
+        app = create_app(start_jobs=False)
+        self.assertEqual(set(app.blueprints), {"auth", "habits", "admin"})
+        response = app.test_client().get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"message": "Habit Garden Backend is Running!"})
+
+    def test_building_the_app_imports_no_heavy_modules(self):
+        # In a fresh interpreter: this one may already have them loaded
+        result = bench_startup.run_probe()
+        self.assertEqual(result["status"], 200)
+        self.assertEqual(result["heavy_loaded"], [])
+
+
+class TestStartJobs(unittest.TestCase):
+
+    def setUp(self):
+        patches = [
+            patch.object(scheduler, "start_scheduler"),
+            patch.object(email_dispatch, "start_dispatcher"),
+        ]
+        self.start_scheduler, self.start_dispatcher = (p.start() for p in patches)
+        for p in patches:
+            self.addCleanup(p.stop)
+
+    def assertStarted(self, started):
+        self.assertEqual(self.start_scheduler.called, started)
+        self.assertEqual(self.start_dispatcher.called, started)
+
+    def test_jobs_start_when_asked(self):
+        create_app(start_jobs=True)
+        self.assertStarted(True)
+
+    def test_jobs_are_skipped_when_asked(self):
+        create_app(start_jobs=False)
+        self.assertStarted(False)
+
+    def test_env_var_decides_by_default(self):
+        with patch.dict(os.environ, {"START_SCHEDULER": "0"}):
+            create_app()
+        self.assertStarted(False)
+        with patch.dict(os.environ, {"START_SCHEDULER": "1"}):
+            create_app()
+        self.assertStarted(True)
+
+
+class TestStartScheduler(unittest.TestCase):
+
+    def test_running_scheduler_is_not_started_twice(self):
+        running = object()
+        with patch.object(scheduler, "_scheduler", running):
+            self.assertIs(scheduler.start_scheduler(), running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Unit tests for GET /habits/dashboard: one embedded query for the profile,
+habits and this period's completions, the completion flags computed from
+it, and the error responses.
+"""
+
+import copy
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from flask import Flask
+
+from local_db import stub_reminder_storage
+
+reminder_storage = stub_reminder_storage()
+
+import habits.routes as routes
+import resilience
+from resilience import CircuitBreaker, CircuitOpen
+
+
+class DashboardQuery:
+    """
+    Stands in for the embedded users -> habits -> habit_completions builder
+    (which local_db does not support): records the calls and returns `rows`.
+    """
+    http_method = "GET"
+    path = "/rest/v1/users"
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+        self.params = []
+        self.executed = 0
+
+    def select(self, columns):
+        self.calls.append(("select", columns))
+        return self
+
+    def eq(self, column, value):
+        self.calls.append(("eq", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.calls.append(("in_", column, values))
+        return self
+
+    def execute(self):
+        self.executed += 1
+        return type("Response", (), {"data": copy.deepcopy(self.rows)})()
+
+
+class DashboardClient:
+    """Supabase client whose only table is the dashboard query."""
+
+    def __init__(self, rows):
+        self.query = DashboardQuery(rows)
+        self.tables = []
+
+    def table(self, name):
+        self.tables.append(name)
+        return self.query
+
+
+class DashboardTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.secret_key = "test"
+        self.app.register_blueprint(routes.habits_bp, url_prefix="/habits")
+        self.today = date.today()
+        patcher = patch.object(resilience, "breaker", CircuitBreaker(failure_threshold=5, reset_timeout=30))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(reminder_storage.clear_reminders, 1)
+
+    def user(self, habits):
+        return [{"user_id": 1, "full_name": "Ada", "email": "ada@example.com", "habits": habits}]
+
+    def get(self, rows, user_id=1):
+        self.db = DashboardClient(rows)
+        client = self.app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as s:
+                s["user_id"] = user_id
+        with patch.object(routes, "get_supabase_client", return_value=self.db):
+            return client.get("/habits/dashboard")
+
+
+class TestDashboard(DashboardTestCase):
+
+    def test_everything_comes_from_one_query(self):
+        self.get(self.user([]))
+        self.assertEqual(self.db.tables, ["users"])
+        self.assertEqual(self.db.query.executed, 1)
+        [select] = [c for c in self.db.query.calls if c[0] == "select"]
+        self.assertIn("habits(*, habit_completions(period_key))", select[1])
+        self.assertIn(("eq", "user_id", 1), self.db.query.calls)
+        current_keys = [routes.get_period_key("daily", self.today), routes.get_period_key("weekly", self.today)]
+        self.assertIn(("in_", "habits.habit_completions.period_key", current_keys), self.db.query.calls)
+
+    def test_completion_flags_from_embedded_completions(self):
+        today_key = routes.get_period_key("daily", self.today)
+        week_key = routes.get_period_key("weekly", self.today)
+        watered_today = datetime.combine(self.today, datetime.min.time()).isoformat()
+        response = self.get(self.user([
+            {"habit_id": 3, "frequency": "daily", "habit_completions": []},
+            {"habit_id": 1, "frequency": "daily", "habit_completions": [{"period_key": today_key}]},
+            {"habit_id": 2, "frequency": "weekly", "habit_completions": [{"period_key": week_key}]},
+            {"habit_id": 4, "frequency": "daily", "habit_completions": [], "last_watered": watered_today},
+        ]))
+        self.assertEqual(response.status_code, 200)
+        habits = response.get_json()["habits"]
+        self.assertEqual([h["habit_id"] for h in habits], [1, 2, 3, 4])
+        flags = {h["habit_id"]: (h["is_completed_today"], h["is_completed_this_week"]) for h in habits}
+        self.assertEqual(flags, {1: (True, False), 2: (False, True), 3: (False, False), 4: (True, False)})
+        self.assertTrue(all("habit_completions" not in h and "plant_state" in h for h in habits))
+
+    def test_profile_reminders_and_watermark(self):
+        reminder_storage.add_reminder(1, ["Read"])
+        body = self.get(self.user([])).get_json()
+        self.assertEqual(body["user"], {"id": 1, "name": "Ada", "email": "ada@example.com"})
+        self.assertEqual(body["reminder_count"], len(body["reminders"]))
+        self.assertGreaterEqual(body["reminder_count"], 1)
+        self.assertIn("watermark", body)
+
+    def test_user_without_habits(self):
+        self.assertEqual(self.get(self.user(None)).get_json()["habits"], [])
+
+
+class TestDashboardErrors(DashboardTestCase):
+
+    def test_requires_a_session(self):
+        self.assertEqual(self.get(self.user([]), user_id=None).status_code, 401)
+
+    def test_unknown_user_is_not_found(self):
+        self.assertEqual(self.get([]).status_code, 404)
+
+    def test_unavailable_database_is_a_503(self):
+        with patch.object(routes, "execute", side_effect=CircuitOpen("open", retry_after=7)):
+            response = self.get(self.user([]))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "7")
+
+
+class TestIsCompletedFromRow(unittest.TestCase):
+    """Same answers as is_already_completed, without the per-habit queries."""
+
+    def test_last_watered_fallback(self):
+        today = date(2026, 10, 19)  # a Monday
+        sunday_before = (today - timedelta(days=1)).isoformat() + "T20:00:00"
+        wednesday = (today + timedelta(days=2)).isoformat() + "T08:00:00Z"
+        self.assertFalse(routes.is_completed_from_row({"frequency": "daily", "last_watered": sunday_before}, set(), today))
+        self.assertFalse(routes.is_completed_from_row({"frequency": "weekly", "last_watered": sunday_before}, set(), today))
+        self.assertTrue(routes.is_completed_from_row({"frequency": "weekly", "last_watered": wednesday}, set(), today))
+
+    def test_unknown_frequency_is_never_completed(self):
+        self.assertFalse(routes.is_completed_from_row({"frequency": "monthly"}, {"anything"}, date(2026, 10, 19)))
+
+
+if __name__ == "__main__":
+    unittest.main()
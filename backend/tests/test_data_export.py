@@ -0,0 +1,105 @@
+"""
+Unit tests for data_export.py: keyset-paginated records (including
+rollups expanded back into days), the error trailer and the NDJSON/CSV
+formatters.
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import data_export
+from data_export import iter_records, to_csv, to_ndjson, until_error
+from local_db import LocalSupabase
+from retention import ROLLUP_TABLE
+
+
+class TestIterRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.db = LocalSupabase()
+        self.db.load("habits", [
+            {"habit_id": i, "user_id": 1, "habit_name": f"h{i}", "frequency": "daily", "plant_state": "flourishing"}
+            for i in range(1, 6)
+        ] + [{"habit_id": 6, "user_id": 2, "habit_name": "other", "frequency": "daily"}])
+        self.db.load("habit_completions", [
+            {"completion_id": i, "habit_id": 1 + i % 5, "user_id": 1, "completion_date": f"2026-10-{i:02d}",
+             "completed_at": f"2026-10-{i:02d}T08:00:00", "period_key": f"2026-10-{i:02d}"}
+            for i in range(1, 8)
+        ])
+        self.db.load(ROLLUP_TABLE, [
+            {"habit_id": habit_id, "user_id": 1, "month": month, "day_bitmap": 0b101}
+            for habit_id in (1, 2, 3) for month in ("2024-01", "2024-02")
+        ])
+        patcher = patch.object(data_export, "EXPORT_PAGE_SIZE", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_row_of_the_user_is_exported_once_across_pages(self):
+        records = list(iter_records(self.db, 1))
+        habits = [r["habit_id"] for r in records if r["type"] == "habit"]
+        raw = [r for r in records if r["type"] == "completion" and not r["rolled_up"]]
+        self.assertEqual(habits, [1, 2, 3, 4, 5])
+        self.assertEqual([r["completion_date"] for r in raw], [f"2026-10-{i:02d}" for i in range(1, 8)])
+
+    def test_rollups_are_expanded_into_days(self):
+        rolled = [r for r in iter_records(self.db, 1) if r.get("rolled_up")]
+        # 3 habits x 2 months x 2 days, each once even though pages split habits
+        self.assertEqual(len(rolled), 12)
+        self.assertEqual(len({(r["habit_id"], r["completion_date"]) for r in rolled}), 12)
+        first = rolled[0]
+        self.assertEqual((first["habit_id"], first["completion_date"], first["period_key"]), (1, "2024-01-01", "2024-01-01"))
+        self.assertIsNone(first["completed_at"])
+
+    def test_first_page_read_up_front_is_not_read_again(self):
+        first_page = next(data_export.habit_pages(self.db, 1))
+        self.db.reset_counters()
+        list(iter_records(self.db, 1, first_habit_page=first_page))
+        # Pages 2 and 3 of habits only
+        self.assertEqual(self.db.queries[("habits", "GET")], 2)
+
+
+class TestFormats(unittest.TestCase):
+
+    def test_failure_ends_the_stream_with_an_error_record(self):
+        errors = []
+
+        def records():
+            yield {"type": "habit", "habit_id": 1}
+            raise ConnectionError("db down")
+
+        out = list(until_error(records(), on_error=errors.append))
+        self.assertEqual(out[-1], {"type": "error", "error": "Export incomplete: db down"})
+        self.assertEqual(len(out), 2)
+        self.assertIsInstance(errors[0], ConnectionError)
+
+    def test_ndjson_is_one_object_per_line_in_chunks(self):
+        records = [{"type": "habit", "habit_id": i} for i in range(3)]
+        with patch.object(data_export, "CHUNK_SIZE", 40):
+            chunks = list(to_ndjson(records))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([json.loads(line) for line in "".join(chunks).splitlines()], records)
+
+    def test_csv_has_one_column_set_for_all_record_types(self):
+        records = [
+            {"type": "habit", "habit_id": 1, "habit_name": "Read"},
+            {"type": "completion", "habit_id": 1, "completion_date": "2026-10-19", "rolled_up": False},
+            {"type": "error", "error": "Export incomplete: db down"},
+        ]
+        rows = list(csv.DictReader(io.StringIO("".join(to_csv(records)))))
+        self.assertEqual(list(rows[0].keys()), data_export.CSV_COLUMNS)
+        self.assertEqual([r["type"] for r in rows], ["habit", "completion", "error"])
+        self.assertEqual(rows[1]["completion_date"], "2026-10-19")
+        self.assertEqual(rows[2]["error"], "Export incomplete: db down")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Unit tests for data_import.py: CSV/NDJSON row parsing, date parsing,
+deduplication within an upload and against stored completions, and the
+habit updates after a (possibly failed) import.
+"""
+
+import io
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import data_import
+from data_import import Importer, InvalidImport, iter_rows, parse_day
+from local_db import LocalSupabase
+
+
+def rows_of(text, **kwargs):
+    return list(iter_rows(io.BytesIO(text.encode("utf-8")), **kwargs))
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_csv_rows_are_numbered_by_line_and_stripped(self):
+        rows = rows_of("habit_id,date\n 1 ,2026-01-02\n\n2,2026-01-03\n")
+        self.assertEqual(rows, [(2, {"habit_id": "1", "date": "2026-01-02"}), (4, {"habit_id": "2", "date": "2026-01-03"})])
+
+    def test_ndjson_is_detected_and_bad_lines_are_none(self):
+        rows = rows_of('{"habit_id": 1, "date": "2026-01-02"}\nnot json\n[1]\n')
+        self.assertEqual(rows, [(1, {"habit_id": 1, "date": "2026-01-02"}), (2, None), (3, None)])
+
+    def test_byte_order_mark_and_crlf_are_handled(self):
+        rows = rows_of("\ufeffhabit_name,date\r\nRead,2026-01-02\r\n")
+        self.assertEqual(rows, [(2, {"habit_name": "Read", "date": "2026-01-02"})])
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(InvalidImport):
+            rows_of("a,b\n", requested_format="xml")
+
+    def test_parse_day_accepts_dates_and_timestamps(self):
+        self.assertEqual(parse_day("2026-01-02"), (date(2026, 1, 2), "2026-01-02T00:00:00"))
+        self.assertEqual(parse_day("2026-01-02T23:30:00-02:00"), (date(2026, 1, 3), "2026-01-03T01:30:00"))
+        with self.assertRaises(ValueError):
+            parse_day("")
+
+
+class ImporterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = LocalSupabase()
+        self.db.load("habits", [
+            {"habit_id": 1, "user_id": 1, "habit_name": "Read", "frequency": "daily", "plant_state": "wilting", "last_watered": None},
+            {"habit_id": 2, "user_id": 1, "habit_name": "Run", "frequency": "weekly", "plant_state": "flourishing", "last_watered": None},
+            {"habit_id": 3, "user_id": 2, "habit_name": "Other", "frequency": "daily", "plant_state": "flourishing", "last_watered": None},
+        ])
+
+    def run_import(self, text):
+        return Importer(self.db, 1).run(iter_rows(io.BytesIO(text.encode("utf-8"))))
+
+    def stored(self):
+        return sorted((r["habit_id"], r["period_key"]) for r in self.db.rows("habit_completions"))
+
+
+class TestImporter(ImporterTestCase):
+
+    def test_rows_are_resolved_by_id_or_name_and_invalid_ones_reported(self):
+        report = self.run_import(
+            "habit_id,habit_name,date\n"
+            "1,,2026-01-05\n"
+            ",read,2026-01-06\n"
+            "3,,2026-01-05\n"                                  # someone else's habit
+            f"1,,{(date.today() + timedelta(days=2)).isoformat()}\n"
+            "1,,soon\n"
+        )
+        self.assertEqual(report["imported"], 2)
+        self.assertEqual(report["invalid"], 3)
+        self.assertEqual([e["line"] for e in report["errors"]], [4, 5, 6])
+        self.assertEqual(self.stored(), [(1, "2026-01-05"), (1, "2026-01-06")])
+
+    def test_days_of_one_week_count_once_for_a_weekly_habit(self):
+        report = self.run_import("habit_id,date\n2,2026-01-05\n2,2026-01-06\n2,2026-01-12\n")
+        self.assertEqual((report["imported"], report["duplicates"]), (2, 1))
+
+    def test_uploading_again_skips_stored_rows(self):
+        text = "habit_id,date\n1,2026-01-05\n1,2026-01-06\n"
+        self.run_import(text)
+        report = self.run_import(text + "1,2026-01-07\n")
+        self.assertEqual((report["imported"], report["duplicates"]), (1, 2))
+        self.assertEqual(len(self.stored()), 3)
+
+    def test_last_watered_moves_forward_only(self):
+        self.db.table_obj("habits").update(2, {"last_watered": "2026-06-01T08:00:00"})
+        report = self.run_import("habit_id,date\n1,2026-01-05\n1,2026-01-04\n2,2026-01-05\n")
+        habits = {h["habit_id"]: h for h in self.db.rows("habits")}
+        self.assertEqual(report["habits_updated"], 1)
+        self.assertEqual(habits[1]["last_watered"], "2026-01-05T00:00:00")
+        self.assertEqual(habits[2]["last_watered"], "2026-06-01T08:00:00")
+
+    def test_too_many_rows_are_rejected(self):
+        with patch.object(data_import, "IMPORT_MAX_ROWS", 1):
+            with self.assertRaises(InvalidImport):
+                self.run_import("habit_id,date\n1,2026-01-05\n1,2026-01-06\n")
+
+
+class TestFailedImport(ImporterTestCase):
+
+    def test_habits_of_batches_written_before_a_failure_are_updated(self):
+        with patch.object(data_import, "IMPORT_BATCH_SIZE", 1), patch.object(data_import, "IMPORT_MAX_ROWS", 2):
+            with self.assertRaises(InvalidImport):
+                self.run_import("habit_id,date\n1,2026-01-05\n1,2026-01-06\n1,2026-01-07\n")
+        habit = next(h for h in self.db.rows("habits") if h["habit_id"] == 1)
+        self.assertEqual(habit["last_watered"], "2026-01-06T00:00:00")
+        self.assertEqual(len(self.stored()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
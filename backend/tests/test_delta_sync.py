@@ -0,0 +1,100 @@
+"""
+Unit tests for delta_sync.py: watermark parsing, when a full sync is
+needed, and the changes returned since a watermark.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import delta_sync
+import plant_state
+from delta_sync import changes_since, needs_full_sync, next_watermark, parse_watermark
+from local_db import LocalSupabase
+
+
+class TestWatermark(unittest.TestCase):
+
+    def test_naive_iso_is_taken_as_utc(self):
+        self.assertEqual(parse_watermark("2026-10-19T09:30:00"), datetime(2026, 10, 19, 9, 30))
+
+    def test_offsets_are_converted_to_naive_utc(self):
+        self.assertEqual(parse_watermark("2026-10-19T09:30:00Z"), datetime(2026, 10, 19, 9, 30))
+        self.assertEqual(parse_watermark("2026-10-19T11:30:00+02:00"), datetime(2026, 10, 19, 9, 30))
+
+    def test_plus_decoded_as_space_from_the_query_string(self):
+        self.assertEqual(parse_watermark("2026-10-19T11:30:00 02:00"), datetime(2026, 10, 19, 9, 30))
+
+    def test_malformed_watermark_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            parse_watermark("last tuesday")
+
+    def test_next_watermark_allows_for_clock_skew(self):
+        with patch.object(delta_sync, "SYNC_SKEW_SECONDS", 5):
+            self.assertEqual(next_watermark(datetime(2026, 10, 19, 9, 30)), "2026-10-19T09:29:55")
+
+
+class TestNeedsFullSync(unittest.TestCase):
+
+    NOW = datetime(2026, 10, 19, 12, 0)
+
+    def test_same_day_watermark_syncs_deltas(self):
+        self.assertFalse(needs_full_sync(datetime(2026, 10, 19, 0, 5), now=self.NOW))
+
+    def test_earlier_day_needs_full_sync(self):
+        # The completed-today flags flipped at midnight without a write
+        self.assertTrue(needs_full_sync(datetime(2026, 10, 18, 23, 59), now=self.NOW))
+
+    def test_watermark_past_the_tombstone_horizon_needs_full_sync(self):
+        with patch.object(delta_sync, "TOMBSTONE_TTL_DAYS", 0):
+            self.assertTrue(needs_full_sync(self.NOW - timedelta(minutes=1), now=self.NOW))
+
+
+class TestChangesSince(unittest.TestCase):
+
+    def setUp(self):
+        self.db = LocalSupabase()
+        self.now = datetime.utcnow()
+        self.since = self.now - timedelta(minutes=10)
+        before, after = (self.since - timedelta(minutes=1)).isoformat(), (self.since + timedelta(minutes=1)).isoformat()
+        self.db.load("habits", [
+            {"habit_id": 1, "user_id": 1, "frequency": "daily", "updated_at": before, "last_watered": self.now.isoformat()},
+            {"habit_id": 2, "user_id": 1, "frequency": "daily", "updated_at": after, "last_watered": self.now.isoformat()},
+            {"habit_id": 3, "user_id": 2, "frequency": "daily", "updated_at": after, "last_watered": self.now.isoformat()},
+            # Wilted 5 minutes ago, without a write
+            {"habit_id": 4, "user_id": 1, "frequency": "daily", "updated_at": before,
+             "last_watered": (self.now - timedelta(hours=20, minutes=5)).isoformat()},
+        ])
+        self.db.load(delta_sync.TOMBSTONE_TABLE, [
+            {"habit_id": 5, "user_id": 1, "deleted_at": after},
+            {"habit_id": 6, "user_id": 1, "deleted_at": before},
+        ])
+
+    def ids(self, habits):
+        return sorted(h["habit_id"] for h in habits)
+
+    def test_stored_mode_returns_updated_habits_and_deletes(self):
+        with patch.object(plant_state, "PLANT_STATE_MODE", "stored"):
+            habits, deleted = changes_since(self.db, 1, self.since)
+        self.assertEqual(self.ids(habits), [2])
+        self.assertEqual(deleted, [5])
+
+    def test_lazy_mode_adds_plants_that_wilted_since(self):
+        with patch.object(plant_state, "PLANT_STATE_MODE", "lazy"):
+            habits, _ = changes_since(self.db, 1, self.since)
+        self.assertEqual(self.ids(habits), [2, 4])
+
+    def test_stamp_sets_updated_at(self):
+        stamped = delta_sync.stamp({"habit_name": "Read"})
+        self.assertEqual(stamped["habit_name"], "Read")
+        self.assertLessEqual(abs(parse_watermark(stamped["updated_at"]) - datetime.utcnow()), timedelta(seconds=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Unit tests for email_dispatch.py: the outbox (digest folding, claim
+leases, retries), the dispatcher lease and sending a batch.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import email_dispatch
+from email_dispatch import Dispatcher, Outbox
+
+
+class RecordingTransport:
+    """Remembers sent messages; fails for recipients in `failing`."""
+    name = "test"
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def send(self, message):
+        if message["recipient"] in self.failing:
+            raise RuntimeError("provider said no")
+        self.sent.append(message)
+
+
+class OutboxTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.outbox = Outbox(os.path.join(directory, "outbox.db"))
+
+    def reminder(self, recipient="a@example.com", habits=("Read",), digest_key="wilting:1"):
+        return self.outbox.enqueue("wilting_reminder", recipient, "A", list(habits), digest_key=digest_key)
+
+
+class TestOutbox(OutboxTestCase):
+
+    def test_pending_digest_absorbs_later_messages(self):
+        first = self.reminder(habits=["Read", "Run"])
+        second = self.reminder(habits=["Run", "Stretch"])
+        self.assertEqual(first, second)
+        [message] = self.outbox.claim(10)
+        self.assertEqual(message["habit_names"], ["Read", "Run", "Stretch"])
+
+    def test_digest_already_sent_is_dropped(self):
+        message_id = self.reminder()
+        self.outbox.claim(10)
+        self.outbox.mark_sent(message_id)
+        self.assertIsNone(self.reminder())
+        self.assertEqual(self.outbox.counts(), {"sent": 1})
+
+    def test_messages_without_digest_key_are_separate(self):
+        self.reminder(digest_key=None)
+        self.reminder(digest_key=None)
+        self.assertEqual(len(self.outbox.claim(10)), 2)
+
+    def test_claimed_messages_are_leased(self):
+        self.reminder()
+        self.assertEqual(len(self.outbox.claim(10)), 1)
+        self.assertEqual(self.outbox.claim(10), [])
+
+    def test_expired_lease_makes_the_message_due_again(self):
+        self.reminder()
+        with patch.object(email_dispatch, "LEASE_SECONDS", -1):
+            self.outbox.claim(10)
+        self.assertEqual(len(self.outbox.claim(10)), 1)
+
+    def test_claim_respects_the_limit_and_order(self):
+        ids = [self.reminder(recipient=f"{i}@example.com", digest_key=None) for i in range(3)]
+        self.assertEqual([m["id"] for m in self.outbox.claim(2)], ids[:2])
+
+    def test_failed_message_waits_out_its_backoff(self):
+        self.reminder()
+        [message] = self.outbox.claim(10)
+        self.assertEqual(self.outbox.mark_failed(message, "boom"), "pending")
+        self.assertEqual(self.outbox.claim(10), [])
+        self.assertEqual(self.outbox.counts(), {"pending": 1})
+
+    def test_message_fails_for_good_after_max_attempts(self):
+        self.reminder()
+        with patch.object(email_dispatch, "MAX_ATTEMPTS", 2), patch.object(email_dispatch, "BACKOFF_BASE", 0):
+            [message] = self.outbox.claim(10)
+            self.assertEqual(self.outbox.mark_failed(message, "boom"), "pending")
+            [message] = self.outbox.claim(10)
+            self.assertEqual(message["attempts"], 1)
+            self.assertEqual(self.outbox.mark_failed(message, "boom"), "failed")
+        self.assertEqual(self.outbox.claim(10), [])
+        self.assertEqual(self.outbox.counts(), {"failed": 1})
+
+
+class TestDispatcherLease(OutboxTestCase):
+
+    def test_one_owner_at_a_time(self):
+        self.assertTrue(self.outbox.acquire_dispatcher("a"))
+        self.assertTrue(self.outbox.acquire_dispatcher("a"))
+        self.assertFalse(self.outbox.acquire_dispatcher("b"))
+        self.outbox.release_dispatcher("a")
+        self.assertTrue(self.outbox.acquire_dispatcher("b"))
+
+    def test_expired_lease_is_taken_over(self):
+        self.outbox.acquire_dispatcher("a", seconds=-1)
+        self.assertTrue(self.outbox.acquire_dispatcher("b"))
+
+
+class TestDispatcher(OutboxTestCase):
+
+    def dispatcher(self, transport, **kwargs):
+        dispatcher = Dispatcher(self.outbox, transport, concurrency=2, rate_limit=1000, **kwargs)
+        self.addCleanup(dispatcher.stop)
+        return dispatcher
+
+    def test_drain_sends_due_messages_and_schedules_retries(self):
+        for i in range(5):
+            self.reminder(recipient=f"{i}@example.com", digest_key=f"wilting:{i}")
+        transport = RecordingTransport(failing={"3@example.com"})
+        self.dispatcher(transport).drain()
+
+        self.assertEqual(sorted(m["recipient"] for m in transport.sent), [f"{i}@example.com" for i in (0, 1, 2, 4)])
+        self.assertEqual(self.outbox.counts(), {"sent": 4, "pending": 1})
+
+    def test_batch_fits_inside_half_a_lease(self):
+        self.assertEqual(Dispatcher(self.outbox, RecordingTransport(), concurrency=4, rate_limit=0.1).batch_size(), 1)
+        self.assertEqual(Dispatcher(self.outbox, RecordingTransport(), concurrency=4, rate_limit=1000).batch_size(), 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
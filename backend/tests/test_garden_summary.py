@@ -0,0 +1,151 @@
+"""
+Unit tests for garden_summary.py: merging deltas, due counts on read,
+rebuilds, the delta function and its fallback, and reconciliation.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from postgrest.exceptions import APIError
+
+import garden_summary
+from garden_summary import TABLE, build_summary, empty_summary, merge_delta, to_response
+from local_db import LocalSupabase
+
+TODAY = date(2026, 10, 19)  # a Monday
+
+
+def summary(**counters):
+    row = empty_summary(1, TODAY)
+    row.update(counters)
+    return row
+
+
+class TestMergeDelta(unittest.TestCase):
+
+    def test_counters_are_added_and_never_go_negative(self):
+        row = merge_delta(summary(habit_count=2, wilting_count=1), {"habit_count": 1, "wilting_count": -3})
+        self.assertEqual((row["habit_count"], row["wilting_count"]), (3, 0))
+
+    def test_done_count_grows_within_its_period(self):
+        row = merge_delta(summary(daily_done_count=1), {"daily_done_key": "2026-10-19", "daily_done_count": 1})
+        self.assertEqual(row["daily_done_count"], 2)
+
+    def test_a_new_period_restarts_the_done_count(self):
+        row = merge_delta(summary(daily_done_count=3), {"daily_done_key": "2026-10-20", "daily_done_count": 1})
+        self.assertEqual((row["daily_done_key"], row["daily_done_count"]), ("2026-10-20", 1))
+
+    def test_done_count_without_a_key_is_ignored(self):
+        row = merge_delta(summary(daily_done_count=1), {"daily_done_count": 5})
+        self.assertEqual(row["daily_done_count"], 1)
+
+    def test_last_activity_only_moves_forward(self):
+        row = summary(last_activity_at="2026-10-19T09:00:00")
+        merge_delta(row, {"last_activity_at": "2026-10-18T09:00:00"})
+        self.assertEqual(row["last_activity_at"], "2026-10-19T09:00:00")
+        merge_delta(row, {"last_activity_at": "2026-10-19T10:00:00"})
+        self.assertEqual(row["last_activity_at"], "2026-10-19T10:00:00")
+
+
+class TestReadShape(unittest.TestCase):
+
+    def test_due_counts_use_done_counts_of_the_current_period(self):
+        row = summary(daily_count=3, weekly_count=2, daily_done_count=1, weekly_done_count=2)
+        response = to_response(row, TODAY)
+        self.assertEqual((response["daily_due"], response["weekly_due"], response["due_today"]), (2, 0, 2))
+
+    def test_done_counts_of_a_past_period_do_not_count(self):
+        row = summary(daily_count=3, daily_done_count=3, daily_done_key="2026-10-18")
+        self.assertEqual(to_response(row, TODAY)["daily_due"], 3)
+
+    def test_build_summary_counts_habits(self):
+        habits = [
+            {"frequency": "daily", "plant_state": "flourishing", "last_watered": "2026-10-19T08:00:00"},
+            {"frequency": "daily", "plant_state": "wilting", "last_watered": "2026-10-10T08:00:00"},
+            {"frequency": "weekly", "plant_state": "flourishing", "last_watered": "2026-10-19T07:00:00"},
+        ]
+        row = build_summary(1, habits, TODAY)
+        self.assertEqual(
+            (row["habit_count"], row["daily_count"], row["weekly_count"], row["wilting_count"]), (3, 2, 1, 1)
+        )
+        self.assertEqual((row["daily_done_count"], row["weekly_done_count"]), (1, 1))
+        self.assertEqual(row["last_activity_at"], "2026-10-19T08:00:00")
+
+
+class StoredSummaryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = LocalSupabase()
+        self.db.load("users", [{"user_id": 1}, {"user_id": 2}])
+        self.db.load(TABLE, [summary(habit_count=1, daily_count=1, flourishing_count=1)])
+        patcher = patch.object(garden_summary, "_delta_function_missing", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored(self, user_id):
+        return next((r for r in self.db.rows(TABLE) if r["user_id"] == user_id), None)
+
+
+class TestApplyDeltas(StoredSummaryTestCase):
+
+    def test_deltas_go_through_the_database_function(self):
+        missing = garden_summary.apply_deltas(self.db, [{"user_id": 1, "habit_count": 1}, {"user_id": 2, "habit_count": 1}])
+        self.assertEqual(missing, [2])
+        self.assertEqual(self.stored(1)["habit_count"], 2)
+        self.assertEqual(self.db.queries[("rpc/apply_garden_summary_deltas", "POST")], 1)
+
+    def test_missing_function_falls_back_to_read_modify_write(self):
+        def missing_function(db, deltas):
+            raise APIError({"code": "PGRST202", "message": "function not found"})
+
+        self.db.functions[garden_summary.DELTA_FUNCTION] = missing_function
+        garden_summary.apply_deltas(self.db, [{"user_id": 1, "habit_count": 1}])
+        garden_summary.apply_deltas(self.db, [{"user_id": 1, "habit_count": 1}])
+        self.assertEqual(self.stored(1)["habit_count"], 3)
+        # The function is not asked again once it is known to be missing
+        self.assertEqual(self.db.queries[("rpc/apply_garden_summary_deltas", "POST")], 1)
+
+    def test_user_without_a_summary_gets_a_rebuild(self):
+        self.db.load("habits", [{"habit_id": 1, "user_id": 2, "frequency": "weekly", "plant_state": "flourishing"}])
+        garden_summary.apply_habit_created(self.db, 2, {"frequency": "weekly"})
+        self.assertEqual((self.stored(2)["habit_count"], self.stored(2)["weekly_count"]), (1, 1))
+
+    def test_wilting_moves_counts_per_user(self):
+        garden_summary.apply_wilted(self.db, [{"user_id": 1}])
+        self.assertEqual((self.stored(1)["flourishing_count"], self.stored(1)["wilting_count"]), (0, 1))
+
+
+class TestReconcile(StoredSummaryTestCase):
+
+    def test_drifted_and_missing_summaries_are_rebuilt(self):
+        self.db.load("habits", [
+            {"habit_id": 1, "user_id": 1, "frequency": "daily", "plant_state": "wilting"},
+            {"habit_id": 2, "user_id": 1, "frequency": "daily", "plant_state": "wilting"},
+            {"habit_id": 3, "user_id": 2, "frequency": "weekly", "plant_state": "flourishing"},
+        ])
+        with patch("db.get_supabase_client", return_value=self.db):
+            garden_summary.reconcile_summaries()
+        self.assertEqual((self.stored(1)["habit_count"], self.stored(1)["wilting_count"]), (2, 2))
+        self.assertEqual(self.stored(2)["weekly_count"], 1)
+
+    def test_summaries_in_sync_are_not_written(self):
+        self.db.load("habits", [{"habit_id": 1, "user_id": 1, "frequency": "daily", "plant_state": "flourishing"}])
+        self.db.load(TABLE, [empty_summary(2)])
+        for row in self.db.rows(TABLE):
+            row.update(daily_done_key=empty_summary(row["user_id"])["daily_done_key"],
+                       weekly_done_key=empty_summary(row["user_id"])["weekly_done_key"])
+        self.db.reset_counters()
+        with patch("db.get_supabase_client", return_value=self.db):
+            garden_summary.reconcile_summaries()
+        self.assertEqual(self.db.queries[(TABLE, "POST")], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
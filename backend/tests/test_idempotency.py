@@ -0,0 +1,220 @@
+"""
+Unit tests for idempotency.py: replay, coalescing of concurrent repeats,
+key reuse for a different request, and release on failures.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask, jsonify, request
+
+import idempotency
+from idempotency import ResponseCache, idempotent
+
+
+def make_app(view):
+    """An app with POST /items wrapped in idempotent("items"), running `view`."""
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    @app.post("/items")
+    @idempotent("items")
+    def create_item():
+        return view()
+
+    return app
+
+
+class IdempotencyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60, max_entries=100)
+        idempotency.set_cache(self.cache)
+        self.addCleanup(idempotency.set_cache, None)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def count(self):
+        with self.lock:
+            self.calls += 1
+            return self.calls
+
+    def post(self, app, key="k1", body=None, user_id=None):
+        client = app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as s:
+                s["user_id"] = user_id
+        headers = {"Idempotency-Key": key} if key else {}
+        return client.post("/items", json=body or {"name": "a"}, headers=headers)
+
+
+class TestReplay(IdempotencyTestCase):
+
+    def test_repeat_is_replayed_without_running_the_view(self):
+        app = make_app(lambda: (jsonify({"id": self.count()}), 201))
+        first = self.post(app)
+        second = self.post(app)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.get_json(), {"id": 1})
+        self.assertEqual(second.headers.get("Idempotency-Replayed"), "true")
+        self.assertIsNone(first.headers.get("Idempotency-Replayed"))
+        self.assertEqual(self.calls, 1)
+
+    def test_requests_without_a_key_always_run(self):
+        app = make_app(lambda: (jsonify({"id": self.count()}), 201))
+        self.post(app, key=None)
+        self.post(app, key=None)
+        self.assertEqual(self.calls, 2)
+
+    def test_keys_are_scoped_per_user(self):
+        app = make_app(lambda: (jsonify({"id": self.count()}), 201))
+        self.assertEqual(self.post(app, user_id=1).get_json(), {"id": 1})
+        self.assertEqual(self.post(app, user_id=2).get_json(), {"id": 2})
+
+    def test_client_errors_are_replayed(self):
+        app = make_app(lambda: (jsonify({"message": "bad", "n": self.count()}), 400))
+        self.post(app)
+        self.assertEqual(self.post(app).status_code, 400)
+        self.assertEqual(self.calls, 1)
+
+    def test_overlong_key_is_rejected(self):
+        app = make_app(lambda: (jsonify({}), 201))
+        self.assertEqual(self.post(app, key="x" * 300).status_code, 400)
+
+
+class TestFingerprint(IdempotencyTestCase):
+
+    def test_key_reused_for_a_different_body_is_rejected(self):
+        app = make_app(lambda: (jsonify({"id": self.count()}), 201))
+        self.post(app, body={"name": "a"})
+        response = self.post(app, body={"name": "b"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+
+class TestCoalescing(IdempotencyTestCase):
+
+    def test_concurrent_repeat_waits_for_the_first_result(self):
+        started, finish = threading.Event(), threading.Event()
+
+        def view():
+            n = self.count()
+            started.set()
+            finish.wait(5)
+            return jsonify({"id": n}), 201
+
+        app = make_app(view)
+        responses = {}
+        first = threading.Thread(target=lambda: responses.setdefault("first", self.post(app)))
+        first.start()
+        self.assertTrue(started.wait(5))
+        second = threading.Thread(target=lambda: responses.setdefault("second", self.post(app)))
+        second.start()
+        finish.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(responses["first"].get_json(), {"id": 1})
+        self.assertEqual(responses["second"].get_json(), {"id": 1})
+        self.assertEqual(responses["second"].headers.get("Idempotency-Replayed"), "true")
+
+    def test_repeat_gives_up_with_409_after_the_wait(self):
+        started, finish = threading.Event(), threading.Event()
+
+        def view():
+            started.set()
+            finish.wait(5)
+            return jsonify({}), 201
+
+        app = make_app(view)
+        first = threading.Thread(target=lambda: self.post(app))
+        first.start()
+        self.assertTrue(started.wait(5))
+        with patch.object(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.05):
+            response = self.post(app)
+        finish.set()
+        first.join(5)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("Retry-After", response.headers)
+
+
+class TestRelease(IdempotencyTestCase):
+
+    def test_server_error_is_not_stored(self):
+        app = make_app(lambda: (jsonify({}), 503 if self.count() == 1 else 201))
+        self.assertEqual(self.post(app).status_code, 503)
+        retry = self.post(app)
+        self.assertEqual(retry.status_code, 201)
+        self.assertIsNone(retry.headers.get("Idempotency-Replayed"))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_rate_limited_response_is_not_stored(self):
+        app = make_app(lambda: (jsonify({}), 429 if self.count() == 1 else 201))
+        self.post(app)
+        self.assertEqual(self.post(app).status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_exception_releases_the_key(self):
+        def view():
+            if self.count() == 1:
+                raise RuntimeError("boom")
+            return jsonify({"ok": True}), 201
+
+        app = make_app(view)
+        self.assertEqual(self.post(app).status_code, 500)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.post(app).status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_waiter_runs_the_request_after_a_release(self):
+        started, finish = threading.Event(), threading.Event()
+
+        def view():
+            n = self.count()
+            if n == 1:
+                started.set()
+                finish.wait(5)
+                return jsonify({}), 503
+            return jsonify({"id": n}), 201
+
+        app = make_app(view)
+        first = threading.Thread(target=lambda: self.post(app))
+        first.start()
+        self.assertTrue(started.wait(5))
+        threading.Timer(0.05, finish.set).start()
+        response = self.post(app)
+        first.join(5)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json(), {"id": 2})
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used_completed_entries(self):
+        cache = ResponseCache(ttl=60, max_entries=2)
+        in_flight, _ = cache.claim("a", "f")
+        for key in ("b", "c"):
+            entry, _ = cache.claim(key, "f")
+            cache.store(key, entry, (b"{}", 201, []))
+        # "a" is still running, so the oldest completed entry goes instead
+        self.assertEqual(len(cache), 2)
+        self.assertFalse(cache.claim("a", "f")[1])
+        self.assertTrue(cache.claim("b", "f")[1])
+
+    def test_expired_entries_are_claimed_again(self):
+        cache = ResponseCache(ttl=0, max_entries=10)
+        entry, owner = cache.claim("a", "f")
+        cache.store("a", entry, (b"{}", 201, []))
+        self.assertTrue(cache.claim("a", "f")[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Unit tests for identity_map.py: one habit query per request, ownership
+checks, copies on remember, and no caching outside requests.
+"""
+
+import os
+import sys
+import unittest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from flask import Flask
+
+import identity_map
+from local_db import LocalSupabase
+
+
+class IdentityMapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.db = LocalSupabase()
+        self.db.load("habits", [
+            {"habit_id": 1, "user_id": 1, "habit_name": "Read"},
+            {"habit_id": 2, "user_id": 2, "habit_name": "Run"},
+        ])
+
+    def habit_queries(self):
+        return self.db.queries[("habits", "GET")]
+
+
+class TestLoadHabit(IdentityMapTestCase):
+
+    def test_habit_is_fetched_once_per_request(self):
+        with self.app.test_request_context():
+            first = identity_map.load_habit(self.db, 1, 1)
+            again = identity_map.load_habit(self.db, "1", 1)
+        self.assertEqual(first, again)
+        self.assertEqual(self.habit_queries(), 1)
+
+    def test_requests_do_not_share_rows(self):
+        for _ in range(2):
+            with self.app.test_request_context():
+                identity_map.load_habit(self.db, 1, 1)
+        self.assertEqual(self.habit_queries(), 2)
+
+    def test_habit_of_another_user_is_not_returned(self):
+        with self.app.test_request_context():
+            self.assertIsNone(identity_map.load_habit(self.db, 2, 1))
+            # Even when another lookup already mapped it
+            identity_map.remember("habits", {"habit_id": 2, "user_id": 2})
+            self.assertIsNone(identity_map.load_habit(self.db, 2, 1))
+
+    def test_missing_habit_is_none(self):
+        with self.app.test_request_context():
+            self.assertIsNone(identity_map.load_habit(self.db, 99, 1))
+
+    def test_forget_drops_a_stale_row(self):
+        with self.app.test_request_context():
+            identity_map.load_habit(self.db, 1, 1)
+            identity_map.forget("habits", 1)
+            identity_map.load_habit(self.db, 1, 1)
+        self.assertEqual(self.habit_queries(), 2)
+
+    def test_nothing_is_cached_outside_a_request(self):
+        identity_map.load_habit(self.db, 1, 1)
+        identity_map.load_habit(self.db, 1, 1)
+        self.assertIsNone(identity_map.get("habits", 1))
+        self.assertEqual(self.habit_queries(), 2)
+
+
+class TestRemember(IdentityMapTestCase):
+
+    def test_remember_stores_a_copy(self):
+        row = {"habit_id": 3, "user_id": 1, "habit_name": "Stretch"}
+        with self.app.test_request_context():
+            identity_map.remember("habits", [row])
+            row["habit_name"] = "changed by the caller"
+            self.assertEqual(identity_map.get("habits", "3")["habit_name"], "Stretch")
+
+    def test_rows_without_a_primary_key_are_ignored(self):
+        with self.app.test_request_context():
+            identity_map.remember("habits", [{"habit_name": "partial"}])
+            self.assertEqual(identity_map._rows(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Unit tests for job_telemetry.py: run records, per-job aggregates, the
+budget warning, the Prometheus output and the APScheduler listeners.
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import job_telemetry
+from job_telemetry import record_run
+from query_profiler import JobContext, add_job_rows, job_context
+
+
+def finished_context(name, seconds, rows=0, queries=0):
+    context = JobContext(name)
+    context.started = 1_000_000.0
+    context.finished = context.started + seconds
+    context.rows, context.queries = rows, queries
+    return context
+
+
+class TelemetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        job_telemetry.reset()
+        self.addCleanup(job_telemetry.reset)
+
+
+class TestRecordRun(TelemetryTestCase):
+
+    def test_run_record_from_the_job_context(self):
+        scheduled = datetime.fromtimestamp(1_000_000.0 - 0.5, timezone.utc)
+        run = record_run("compact", "ok", scheduled, finished_context("compact", 2, rows=10, queries=3), interval_s=100)
+        self.assertEqual(run["duration_ms"], 2000)
+        self.assertEqual(run["lag_ms"], 500)
+        self.assertEqual((run["rows"], run["round_trips"]), (10, 3))
+        self.assertEqual(run["budget_ratio"], 0.02)
+        self.assertIsNone(run["error"])
+
+    def test_missed_run_has_no_timings(self):
+        run = record_run("compact", "missed", interval_s=100)
+        self.assertIsNone(run["duration_ms"])
+        self.assertIsNone(run["budget_ratio"])
+
+    def test_run_over_budget_is_logged(self):
+        with patch.object(job_telemetry, "JOB_BUDGET_WARN_RATIO", 0.5):
+            with self.assertLogs("JobTelemetry", level="WARNING"):
+                record_run("compact", "ok", context=finished_context("compact", 60), interval_s=100)
+
+
+class TestAggregates(TelemetryTestCase):
+
+    def test_summary_and_history(self):
+        record_run("a", "ok", context=finished_context("a", 1, rows=5), interval_s=3600)
+        record_run("a", "error", context=finished_context("a", 3), interval_s=3600, error=ValueError("boom"))
+        record_run("a", "missed", interval_s=3600)
+        record_run("b", "ok", context=finished_context("b", 1))
+
+        totals = job_telemetry.summary()["a"]
+        self.assertEqual((totals["runs"], totals["errors"], totals["missed"]), (3, 1, 1))
+        self.assertEqual(totals["avg_ms"], 2000)
+        self.assertEqual(totals["max_ms"], 3000)
+        self.assertEqual(totals["rows"], 5)
+        self.assertEqual(totals["last_status"], "missed")
+        self.assertEqual([r["status"] for r in job_telemetry.history("a")], ["missed", "error", "ok"])
+        self.assertEqual(len(job_telemetry.history(limit=2)), 2)
+
+    def test_prometheus_metrics(self):
+        record_run("a", "ok", context=finished_context("a", 1.5, queries=4))
+        text = job_telemetry.prometheus_metrics()
+        self.assertIn('job_runs_total{job="a",status="ok"} 1', text)
+        self.assertIn('job_runs_total{job="a",status="error"} 0', text)
+        self.assertIn('job_duration_seconds_max{job="a"} 1.5', text)
+        self.assertIn('job_round_trips_total{job="a"} 4', text)
+        self.assertIn("# TYPE job_runs_total counter", text)
+
+
+class TestSchedulerListeners(TelemetryTestCase):
+
+    def run_once(self, func):
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        scheduler = BackgroundScheduler()
+        job_telemetry.install(scheduler)
+        scheduler.add_job(func, id=func.__name__, trigger="interval", hours=1, next_run_time=datetime.now())
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not job_telemetry.history() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.shutdown()
+        return job_telemetry.history()
+
+    def test_run_is_recorded_with_its_context_and_interval(self):
+        @job_context("nightly")
+        def nightly():
+            add_job_rows(7)
+
+        [run] = self.run_once(nightly)
+        self.assertEqual((run["job"], run["status"], run["rows"]), ("nightly", "ok", 7))
+        self.assertEqual(run["interval_s"], 3600)
+        self.assertIsNotNone(run["lag_ms"])
+
+    def test_failing_job_is_recorded_as_error(self):
+        @job_context("broken")
+        def broken():
+            raise RuntimeError("boom")
+
+        [run] = self.run_once(broken)
+        self.assertEqual((run["status"], run["error"]), ("error", "boom"))
+
+
+if __name__ == "__main__":
+    unittest.main()
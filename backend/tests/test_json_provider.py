@@ -0,0 +1,78 @@
+"""
+Unit tests for json_provider.py: provider selection and byte-for-byte
+compatibility of the orjson provider with Flask's default output.
+"""
+
+import os
+import sys
+import unittest
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask
+
+import json_provider
+from json_provider import OrjsonProvider, StdlibJSONProvider, get_provider_class
+
+PAYLOAD = {
+    "habits": [{"habit_name": "Read", "habit_id": 2, "last_watered": "2026-10-19T09:00:00"}],
+    "completion_date": date(2026, 10, 19),
+    "completed_at": datetime(2026, 10, 19, 9, 30),
+    "id": uuid.UUID(int=7),
+    "ratio": Decimal("0.5"),
+    "missing": None,
+}
+
+
+def response_body(provider_name, compact=None):
+    app = Flask(__name__)
+    json_provider.init_json(app, provider_name)
+    app.json.compact = compact
+    with app.app_context():
+        return app.json.response(PAYLOAD).get_data()
+
+
+class TestProviderSelection(unittest.TestCase):
+
+    def test_default_selects_the_stdlib_provider(self):
+        self.assertIs(get_provider_class("default"), StdlibJSONProvider)
+
+    def test_auto_prefers_orjson_when_installed(self):
+        expected = OrjsonProvider if json_provider.orjson is not None else StdlibJSONProvider
+        self.assertIs(get_provider_class("auto"), expected)
+
+
+class TestStdlibProvider(unittest.TestCase):
+
+    def test_dates_are_written_like_flask_writes_them(self):
+        body = response_body("default")
+        self.assertIn(b'"completed_at":"Mon, 19 Oct 2026 09:30:00 GMT"', body)
+        self.assertIn(b'"completion_date":"Mon, 19 Oct 2026 00:00:00 GMT"', body)
+
+
+@unittest.skipIf(json_provider.orjson is None, "orjson is not installed")
+class TestOrjsonProvider(unittest.TestCase):
+
+    def test_response_matches_the_default_provider(self):
+        self.assertEqual(response_body("orjson"), response_body("default"))
+
+    def test_indented_response_matches_the_default_provider(self):
+        self.assertEqual(response_body("orjson", compact=False), response_body("default", compact=False))
+
+    def test_unsorted_keys_when_sorting_is_off(self):
+        app = Flask(__name__)
+        json_provider.init_json(app, "orjson")
+        app.json.sort_keys = False
+        self.assertEqual(app.json.dumps({"b": 1, "a": 2}), '{"b":1,"a":2}')
+
+    def test_loads_round_trips(self):
+        app = Flask(__name__)
+        json_provider.init_json(app, "orjson")
+        self.assertEqual(app.json.loads('{"a":[1,2]}'), {"a": [1, 2]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Unit tests for migrate.py and check_query_plans.py: statement splitting,
+applying, editing and baselining migrations (on in-memory SQLite), and the
+hot-path query plans of the shipped migrations.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import check_query_plans
+import migrate
+from migrate import MigrationError, split_statements
+
+
+class TestSplitStatements(unittest.TestCase):
+
+    def test_comments_are_dropped_and_statements_split(self):
+        sql = "-- header\nCREATE TABLE a (id INTEGER);\n\n-- note\nCREATE INDEX a_id ON a (id);\n"
+        self.assertEqual(split_statements(sql), ["CREATE TABLE a (id INTEGER)", "CREATE INDEX a_id ON a (id)"])
+
+    def test_statement_may_span_lines_and_end_without_semicolon(self):
+        sql = "CREATE TABLE a (\n  id INTEGER\n);\nSELECT 1"
+        self.assertEqual(split_statements(sql), ["CREATE TABLE a (\n  id INTEGER\n)", "SELECT 1"])
+
+    def test_function_body_is_kept_whole(self):
+        sql = (
+            "CREATE FUNCTION f() RETURNS void AS $$\n"
+            "BEGIN\n"
+            "  -- inside the body\n"
+            "  UPDATE a SET id = 1;\n"
+            "END;\n"
+            "$$ LANGUAGE plpgsql;\n"
+            "SELECT 2;\n"
+        )
+        statements = split_statements(sql)
+        self.assertEqual(len(statements), 2)
+        self.assertIn("-- inside the body", statements[0])
+        self.assertTrue(statements[0].endswith("$$ LANGUAGE plpgsql"))
+
+
+class MigrationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.db = migrate.connect("sqlite:///:memory:")
+        self.addCleanup(self.db.close)
+
+    def write(self, file_name, sql):
+        with open(os.path.join(self.dir, file_name), "w", encoding="utf-8") as f:
+            f.write(sql)
+
+    def migrations(self):
+        return migrate.load_migrations(self.dir)
+
+    def tables(self):
+        rows = self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return {name for (name,) in rows} - {migrate.MIGRATIONS_TABLE}
+
+
+class TestMigrate(MigrationsTestCase):
+
+    def test_pending_migrations_are_applied_once_in_order(self):
+        self.write("0002_b.sql", "CREATE TABLE b (a_id INTEGER REFERENCES a (id));")
+        self.write("0001_a.sql", "CREATE TABLE a (id SERIAL PRIMARY KEY);")
+        self.assertEqual(migrate.migrate(self.db, migrations=self.migrations()), ["0001", "0002"])
+        self.assertEqual(migrate.migrate(self.db, migrations=self.migrations()), [])
+        self.assertEqual(self.tables(), {"a", "b"})
+
+    def test_target_stops_at_a_version(self):
+        self.write("0001_a.sql", "CREATE TABLE a (id INTEGER);")
+        self.write("0002_b.sql", "CREATE TABLE b (id INTEGER);")
+        self.assertEqual(migrate.migrate(self.db, target="0001", migrations=self.migrations()), ["0001"])
+        self.assertEqual([state for _, state in migrate.status(self.db, self.migrations())], ["applied", "pending"])
+
+    def test_edited_migration_is_reported(self):
+        self.write("0001_a.sql", "CREATE TABLE a (id INTEGER);")
+        migrate.migrate(self.db, migrations=self.migrations())
+        self.write("0001_a.sql", "CREATE TABLE a (id INTEGER, name TEXT);")
+        self.assertEqual(migrate.status(self.db, self.migrations())[0][1], "changed")
+        with self.assertRaises(MigrationError):
+            migrate.migrate(self.db, migrations=self.migrations())
+
+    def test_failed_migration_is_rolled_back_and_not_recorded(self):
+        self.write("0001_a.sql", "CREATE TABLE a (id INTEGER);\nCREATE TABLE a (id INTEGER);")
+        with self.assertRaises(MigrationError):
+            migrate.migrate(self.db, migrations=self.migrations())
+        self.assertEqual(self.tables(), set())
+        self.assertEqual(migrate.status(self.db, self.migrations())[0][1], "pending")
+
+    def test_other_dialect_is_recorded_but_not_run(self):
+        self.write("0001_f.sql", "-- dialect: postgresql\nCREATE FUNCTION f() RETURNS int AS $$ SELECT 1 $$ LANGUAGE sql;")
+        self.assertEqual(migrate.migrate(self.db, migrations=self.migrations()), ["0001"])
+        self.assertEqual(migrate.status(self.db, self.migrations())[0][1], "applied")
+
+    def test_baseline_marks_without_running(self):
+        self.write("0001_a.sql", "CREATE TABLE a (id INTEGER);")
+        self.write("0002_b.sql", "CREATE TABLE b (id INTEGER);")
+        self.assertEqual(migrate.baseline(self.db, "0001", self.migrations()), ["0001"])
+        migrate.migrate(self.db, migrations=self.migrations())
+        self.assertEqual(self.tables(), {"b"})
+
+    def test_duplicate_versions_are_rejected(self):
+        self.write("0001_a.sql", "SELECT 1;")
+        self.write("0001_b.sql", "SELECT 1;")
+        with self.assertRaises(MigrationError):
+            self.migrations()
+
+
+class TestShippedMigrations(unittest.TestCase):
+
+    def test_hot_path_queries_use_an_index(self):
+        db = migrate.connect("sqlite:///:memory:")
+        self.addCleanup(db.close)
+        migrate.migrate(db)
+        failures = {name: problems for name, _, problems, _ in check_query_plans.check(db) if problems}
+        self.assertEqual(failures, {})
+
+    def test_hot_path_call_sites_are_marked(self):
+        self.assertEqual(check_query_plans.check_call_sites(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit tests for plant_state.py: wilt windows, the stored and lazy modes of
+effective(), and wilted_between().
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import plant_state
+from plant_state import compute_state, effective, wilted_between
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def habit(frequency="daily", hours_ago=None, stored="flourishing"):
+    last_watered = None if hours_ago is None else (NOW - timedelta(hours=hours_ago)).isoformat()
+    return {"frequency": frequency, "last_watered": last_watered, "plant_state": stored}
+
+
+class TestComputeState(unittest.TestCase):
+
+    def test_daily_habit_wilts_after_20_hours(self):
+        self.assertEqual(compute_state("daily", NOW - timedelta(hours=19), now=NOW), "flourishing")
+        self.assertEqual(compute_state("daily", NOW - timedelta(hours=21), now=NOW), "wilting")
+
+    def test_weekly_habit_wilts_after_140_hours(self):
+        self.assertEqual(compute_state("weekly", NOW - timedelta(hours=139), now=NOW), "flourishing")
+        self.assertEqual(compute_state("weekly", NOW - timedelta(hours=141), now=NOW), "wilting")
+
+    def test_never_watered_keeps_its_state(self):
+        self.assertEqual(compute_state("daily", None, "wilting", now=NOW), "wilting")
+        self.assertEqual(compute_state("daily", None, None, now=NOW), "flourishing")
+
+    def test_aware_timestamps_are_compared_in_utc(self):
+        # 21 hours ago in UTC, written with a +02:00 offset
+        watered = (NOW - timedelta(hours=21)).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=2)))
+        self.assertEqual(compute_state("daily", watered, now=NOW), "wilting")
+
+
+class TestEffective(unittest.TestCase):
+
+    def test_stored_mode_returns_the_column(self):
+        with patch.object(plant_state, "PLANT_STATE_MODE", "stored"):
+            self.assertEqual(effective(habit(hours_ago=30), now=NOW), "flourishing")
+            self.assertEqual(effective(habit(stored=None), now=NOW), "flourishing")
+
+    def test_lazy_mode_derives_from_last_watered(self):
+        with patch.object(plant_state, "PLANT_STATE_MODE", "lazy"):
+            self.assertEqual(effective(habit(hours_ago=30), now=NOW), "wilting")
+            self.assertEqual(effective(habit(hours_ago=1, stored="wilting"), now=NOW), "flourishing")
+
+    def test_lazy_mode_accepts_z_suffix_and_ignores_garbage(self):
+        with patch.object(plant_state, "PLANT_STATE_MODE", "lazy"):
+            row = {"frequency": "daily", "last_watered": (NOW - timedelta(hours=30)).isoformat() + "Z"}
+            self.assertEqual(effective(row, now=NOW), "wilting")
+            row = {"frequency": "daily", "last_watered": "yesterday", "plant_state": "wilting"}
+            self.assertEqual(effective(row, now=NOW), "wilting")
+
+
+class TestWiltedBetween(unittest.TestCase):
+
+    def test_wilt_moment_inside_the_window(self):
+        # Watered 22h ago: wilted 2h ago
+        self.assertTrue(wilted_between(habit(hours_ago=22), NOW - timedelta(hours=3), NOW))
+
+    def test_window_is_half_open(self):
+        row = habit(hours_ago=22)
+        wilts_at = NOW - timedelta(hours=2)
+        self.assertTrue(wilted_between(row, wilts_at, NOW))
+        self.assertFalse(wilted_between(row, NOW - timedelta(hours=3), wilts_at))
+
+    def test_uses_the_frequency_window(self):
+        self.assertFalse(wilted_between(habit("weekly", hours_ago=22), NOW - timedelta(hours=3), NOW))
+
+    def test_never_watered_never_wilts(self):
+        self.assertFalse(wilted_between(habit(), NOW - timedelta(days=30), NOW))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Unit tests for query_profiler.py: query shapes (values dropped, rpc calls
+labelled by function), aggregation and job attribution.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from postgrest import SyncPostgrestClient
+
+import query_profiler
+from query_profiler import describe_shape, query_shape
+
+
+class QueryProfilerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = SyncPostgrestClient("http://localhost/rest/v1")
+        query_profiler.reset()
+        self.addCleanup(query_profiler.reset)
+
+
+class TestQueryShape(QueryProfilerTestCase):
+
+    def test_lookups_of_different_users_share_a_shape(self):
+        first = query_shape(self.client.from_("habits").select("*").eq("user_id", 1))
+        second = query_shape(self.client.from_("habits").select("*").eq("user_id", 2))
+        self.assertEqual(first, second)
+        self.assertEqual(describe_shape(first)["filters"], ["user_id.eq"])
+
+    def test_or_filters_list_their_columns(self):
+        query = self.client.from_("users").select("user_id").or_("email.eq.a@b.c,full_name.eq.A")
+        self.assertEqual(describe_shape(query_shape(query))["filters"], ["or:email", "or:full_name"])
+
+    def test_operation_follows_the_method(self):
+        habits = self.client.from_("habits")
+        self.assertEqual(describe_shape(query_shape(habits.update({"x": 1}).eq("habit_id", 1)))["operation"], "update")
+        self.assertEqual(describe_shape(query_shape(habits.delete().eq("habit_id", 1)))["operation"], "delete")
+        self.assertEqual(describe_shape(query_shape(habits.insert({"x": 1})))["operation"], "insert")
+        upsert = habits.upsert({"x": 1}, on_conflict="habit_id")
+        self.assertEqual(describe_shape(query_shape(upsert))["operation"], "upsert")
+
+    def test_rpc_is_labelled_with_the_function_name(self):
+        query = self.client.rpc("apply_garden_summary_deltas", {"deltas": [{"user_id": 1}]})
+        info = describe_shape(query_shape(query))
+        self.assertEqual(info["operation"], "rpc:apply_garden_summary_deltas")
+        self.assertEqual(info["filters"], [])
+
+    def test_dict_params_are_not_read_as_filters(self):
+        class LocalRpc:
+            http_method = "POST"
+            path = "/rest/v1/rpc/compact"
+            params = {"user_id": 1, "before": "2026-01-01"}
+
+        info = describe_shape(query_shape(LocalRpc()))
+        self.assertEqual(info["operation"], "rpc:compact")
+        self.assertEqual(info["filters"], [])
+
+
+class TestRecord(QueryProfilerTestCase):
+
+    def test_stats_aggregate_per_shape(self):
+        for user_id, ms in ((1, 10), (2, 30)):
+            query_profiler.record(self.client.from_("habits").select("*").eq("user_id", user_id), ms)
+        query_profiler.record(self.client.from_("users").select("*").eq("user_id", 1), 5, error=ValueError("x"))
+
+        stats = {(s["table"], s["operation"]): s for s in query_profiler.top_shapes()}
+        habits = stats[("habits", "select")]
+        self.assertEqual(habits["count"], 2)
+        self.assertEqual(habits["max_ms"], 30)
+        self.assertEqual(stats[("users", "select")]["errors"], 1)
+
+    def test_queries_in_a_job_are_counted_and_attributed(self):
+        with query_profiler.job_context("nightly") as job:
+            query_profiler.record(self.client.from_("habits").select("*"), 1)
+        self.assertEqual(job.queries, 1)
+        shape = query_profiler.top_shapes()[0]
+        self.assertEqual(shape["callers"], {"job:nightly": 1})
+
+    def test_slow_queries_are_logged(self):
+        with patch.object(query_profiler, "SLOW_QUERY_MS", 100), patch.object(query_profiler, "SLOW_QUERY_SAMPLE_RATE", 1):
+            with self.assertLogs("SlowQueries", level="WARNING") as logs:
+                query_profiler.record(self.client.from_("habits").select("*").eq("user_id", 1), 150)
+        self.assertIn("select habits", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Unit tests for rate_limit.py: the in-memory token bucket, the rate_limit
+and concurrency_limit decorators and their 429/503 responses.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask, jsonify
+
+import rate_limit
+from rate_limit import InMemoryBucketStore, concurrency_limit, json_field
+
+
+class Clock:
+    """Replaces time.monotonic() in rate_limit."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInMemoryBucketStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch("rate_limit.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = InMemoryBucketStore()
+
+    def test_burst_up_to_the_limit_then_rejects(self):
+        results = [self.store.take("k", 3, 60)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_retry_after_is_the_time_to_the_next_token(self):
+        for _ in range(3):
+            self.store.take("k", 3, 60)
+        allowed, retry_after = self.store.take("k", 3, 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 20.0)
+
+    def test_tokens_refill_over_time_up_to_the_limit(self):
+        for _ in range(3):
+            self.store.take("k", 3, 60)
+        self.clock.now += 20
+        self.assertEqual(self.store.take("k", 3, 60), (True, 0.0))
+        self.assertFalse(self.store.take("k", 3, 60)[0])
+
+        self.clock.now += 3600
+        results = [self.store.take("k", 3, 60)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_keys_have_separate_buckets(self):
+        self.store.take("a", 1, 60)
+        self.assertFalse(self.store.take("a", 1, 60)[0])
+        self.assertTrue(self.store.take("b", 1, 60)[0])
+
+    def test_cost_larger_than_the_tokens_left_is_rejected(self):
+        self.assertTrue(self.store.take("k", 5, 5, cost=3)[0])
+        allowed, retry_after = self.store.take("k", 5, 5, cost=3)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+
+    def test_least_recently_used_bucket_is_evicted(self):
+        store = InMemoryBucketStore(max_keys=2)
+        store.take("a", 1, 60)
+        store.take("b", 1, 60)
+        store.take("a", 1, 60)   # touches a
+        store.take("c", 1, 60)   # evicts b
+        self.assertTrue(store.take("b", 1, 60)[0])
+        self.assertFalse(store.take("c", 1, 60)[0])
+
+
+def make_app():
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    @app.post("/login")
+    @rate_limit.rate_limit("login", 2, 60, key=json_field("email"))
+    def login():
+        return jsonify({"ok": True})
+
+    return app
+
+
+class TestDecorators(unittest.TestCase):
+
+    def setUp(self):
+        rate_limit.set_store(InMemoryBucketStore())
+        self.addCleanup(rate_limit.set_store, None)
+
+    def test_rate_limit_rejects_with_429_and_retry_after(self):
+        client = make_app().test_client()
+        statuses = [client.post("/login", json={"email": "A@example.com "}).status_code for _ in range(2)]
+        response = client.post("/login", json={"email": "a@example.com"})
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "30")
+
+    def test_requests_without_a_key_are_not_limited(self):
+        client = make_app().test_client()
+        statuses = {client.post("/login", json={}).status_code for _ in range(5)}
+        self.assertEqual(statuses, {200})
+
+    def test_limits_can_be_turned_off(self):
+        client = make_app().test_client()
+        with patch.dict(os.environ, {"RATELIMIT_ENABLED": "0"}):
+            statuses = {client.post("/login", json={"email": "a@example.com"}).status_code for _ in range(5)}
+        self.assertEqual(statuses, {200})
+
+    def test_concurrency_limit_sheds_excess_requests(self):
+        started, release = threading.Event(), threading.Event()
+
+        @concurrency_limit("test-shedding", 1, retry_after=2)
+        def slow():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        app = Flask(__name__)
+        results = []
+        worker = threading.Thread(target=lambda: results.append(slow()))
+        worker.start()
+        started.wait(5)
+        with app.test_request_context():
+            shed = slow()
+        release.set()
+        worker.join(5)
+
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual(shed.headers["Retry-After"], "2")
+        self.assertEqual(results, ["done"])
+        with app.test_request_context():
+            self.assertEqual(slow(), "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
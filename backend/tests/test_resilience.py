@@ -0,0 +1,245 @@
+"""
+Unit tests for resilience.py: circuit breaker, error classification,
+retries and hedging.
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from postgrest.exceptions import APIError
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, DatabaseUnavailable, QueryTimeout, is_transient
+
+
+class FakeQuery:
+    """Stands in for a postgrest builder: execute() runs the given outcomes in order."""
+
+    def __init__(self, *outcomes, method="GET", delay=0.0):
+        self.http_method = method
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def execute(self):
+        with self._lock:
+            self.calls += 1
+            outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if self.delay:
+            time.sleep(self.delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def api_error(code):
+    return APIError({"code": code, "message": "error"})
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half-open")
+        self.assertFalse(breaker.allow())
+
+    def test_successful_probe_closes(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.01)
+        for _ in range(5):
+            breaker.record_failure()
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_retry_after_counts_down_while_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        self.assertEqual(breaker.retry_after(), 1)
+        breaker.record_failure()
+        self.assertGreaterEqual(breaker.retry_after(), 29)
+
+
+class TestIsTransient(unittest.TestCase):
+
+    def test_transport_and_timeouts(self):
+        self.assertTrue(is_transient(QueryTimeout("slow")))
+        self.assertTrue(is_transient(ConnectionError()))
+        self.assertTrue(is_transient(TimeoutError()))
+        self.assertTrue(is_transient(httpx.ConnectError("refused")))
+
+    def test_http_status_errors(self):
+        request = httpx.Request("GET", "http://db")
+        for status, expected in ((500, True), (503, True), (404, False)):
+            error = httpx.HTTPStatusError("x", request=request, response=httpx.Response(status, request=request))
+            self.assertEqual(is_transient(error), expected, status)
+
+    def test_api_error_gateway_status(self):
+        # Non-JSON bodies (e.g. from the gateway) carry the HTTP status as code
+        self.assertTrue(is_transient(api_error(502)))
+        self.assertTrue(is_transient(api_error("504")))
+        self.assertFalse(is_transient(api_error(400)))
+
+    def test_api_error_connection_and_timeout_codes(self):
+        for code in ("PGRST000", "PGRST003", "57014", "08006", "53300", "40001"):
+            self.assertTrue(is_transient(api_error(code)), code)
+
+    def test_api_error_query_errors(self):
+        for code in ("23505", "42P01", "PGRST116", "22P02", None):
+            self.assertFalse(is_transient(api_error(code)), code)
+
+    def test_other_exceptions(self):
+        self.assertFalse(is_transient(ValueError("bad")))
+
+
+class TestExecute(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        patches = [
+            patch.object(resilience, "breaker", self.breaker),
+            patch.object(resilience, "backoff_delay", lambda attempt: 0),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_read_retried_until_success(self):
+        query = FakeQuery(api_error(503), httpx.ReadError("reset"), "ok")
+        self.assertEqual(resilience.execute(query, retries=2), "ok")
+        self.assertEqual(query.calls, 3)
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_retry_budget_is_respected(self):
+        query = FakeQuery(api_error(503))
+        with self.assertRaises(DatabaseUnavailable):
+            resilience.execute(query, retries=2)
+        self.assertEqual(query.calls, 3)
+
+    def test_failed_call_counts_once_against_the_breaker(self):
+        with self.assertRaises(DatabaseUnavailable):
+            resilience.execute(FakeQuery(api_error(503)), retries=2)
+        self.assertEqual(self.breaker.failures, 1)
+
+    def test_retries_stop_once_the_breaker_opens(self):
+        breaker = self.breaker
+
+        class OpensBreaker(FakeQuery):
+            def execute(self):
+                # Other calls fail meanwhile and open the breaker
+                for _ in range(breaker.failure_threshold):
+                    breaker.record_failure()
+                return super().execute()
+
+        query = OpensBreaker(api_error(503))
+        with self.assertRaises(DatabaseUnavailable):
+            resilience.execute(query, retries=3)
+        self.assertEqual(query.calls, 1)
+
+    def test_retries_stop_at_the_deadline(self):
+        query = FakeQuery(api_error(503))
+        with patch.object(resilience, "backoff_delay", lambda attempt: 0.2):
+            with self.assertRaises(DatabaseUnavailable):
+                resilience.execute(query, deadline=0.1, retries=5)
+        self.assertEqual(query.calls, 1)
+
+    def test_writes_are_never_retried(self):
+        query = FakeQuery(api_error(503), "ok", method="POST")
+        with self.assertRaises(DatabaseUnavailable):
+            resilience.execute(query)
+        self.assertEqual(query.calls, 1)
+
+    def test_query_errors_raised_unchanged_and_not_counted(self):
+        query = FakeQuery(api_error("23505"))
+        with self.assertRaises(APIError):
+            resilience.execute(query, retries=2)
+        self.assertEqual(query.calls, 1)
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_gateway_errors_open_the_breaker(self):
+        query = FakeQuery(api_error(502))
+        for _ in range(5):
+            with self.assertRaises(DatabaseUnavailable):
+                resilience.execute(query, retries=0)
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpen):
+            resilience.execute(query, retries=0)
+        self.assertEqual(query.calls, 5)
+
+    def test_deadline_raises_query_timeout(self):
+        query = FakeQuery("ok", delay=0.3)
+        with self.assertRaises(QueryTimeout):
+            resilience.execute(query, deadline=0.05, retries=0)
+
+    def test_queued_attempts_are_cancelled_at_the_deadline(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        query = FakeQuery("ok", delay=0.3)
+        with patch.object(resilience, "_executor", executor):
+            with self.assertRaises(QueryTimeout):
+                # The hedge queues behind the first attempt on the single worker
+                resilience.execute(query, deadline=0.1, retries=0, hedge_after=0.02)
+        executor.shutdown(wait=True)
+        self.assertEqual(query.calls, 1)
+
+    def test_hedge_returns_the_faster_attempt(self):
+        class SlowThenFast(FakeQuery):
+            def execute(self):
+                with self._lock:
+                    self.calls += 1
+                    first = self.calls == 1
+                time.sleep(0.5 if first else 0.01)
+                return "slow" if first else "fast"
+
+        query = SlowThenFast("unused")
+        self.assertEqual(resilience.execute(query, deadline=2, hedge_after=0.05), "fast")
+        self.assertEqual(query.calls, 2)
+
+    def test_no_hedge_for_writes(self):
+        query = FakeQuery("ok", method="PATCH", delay=0.1)
+        self.assertEqual(resilience.execute(query, hedge_after=0.01), "ok")
+        self.assertEqual(query.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
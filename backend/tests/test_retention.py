@@ -0,0 +1,116 @@
+"""
+Unit tests for retention.py: the compaction horizon, month bitmaps, the
+compaction job (merging into stored rollups) and the orphan purge.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import retention
+from local_db import LocalSupabase
+from retention import ROLLUP_TABLE, bitmap_days, compaction_cutoff, month_key
+
+
+class TestMonths(unittest.TestCase):
+
+    def test_cutoff_is_the_first_of_the_horizon_month(self):
+        with patch.object(retention, "RETENTION_DAYS", 365):
+            self.assertEqual(compaction_cutoff(date(2026, 10, 19)), date(2025, 10, 1))
+
+    def test_month_key(self):
+        self.assertEqual(month_key(date(2025, 3, 9)), "2025-03")
+
+    def test_bitmap_days_lists_the_set_bits(self):
+        bitmap = (1 << 0) | (1 << 14) | (1 << 30)
+        self.assertEqual(bitmap_days("2025-01", bitmap), [date(2025, 1, 1), date(2025, 1, 15), date(2025, 1, 31)])
+
+    def test_empty_bitmap_has_no_days(self):
+        self.assertEqual(bitmap_days("2025-02", 0), [])
+
+
+class RetentionJobTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = LocalSupabase()
+        patcher = patch("db.get_supabase_client", return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def completion(self, completion_id, habit_id, day):
+        return {"completion_id": completion_id, "habit_id": habit_id, "user_id": 1,
+                "completion_date": day, "period_key": day}
+
+    def rollups(self):
+        return {(r["habit_id"], r["month"]): r for r in self.db.rows(ROLLUP_TABLE)}
+
+
+class TestCompaction(RetentionJobTestCase):
+
+    def test_old_months_are_folded_into_rollups(self):
+        self.db.load("habit_completions", [
+            self.completion(1, 1, "2020-01-01"),
+            self.completion(2, 1, "2020-01-03"),
+            self.completion(3, 1, "2020-02-10"),
+            self.completion(4, 1, date.today().isoformat()),
+        ])
+        retention.compact_completions()
+
+        rollups = self.rollups()
+        self.assertEqual(rollups[(1, "2020-01")]["day_bitmap"], 0b101)
+        self.assertEqual(rollups[(1, "2020-01")]["completion_count"], 2)
+        self.assertEqual(rollups[(1, "2020-02")]["completion_count"], 1)
+        remaining = [r["completion_id"] for r in self.db.rows("habit_completions")]
+        self.assertEqual(remaining, [4])
+
+    def test_compaction_merges_with_a_stored_rollup(self):
+        self.db.load(ROLLUP_TABLE, [{"habit_id": 1, "user_id": 1, "month": "2020-01", "day_bitmap": 0b10, "completion_count": 1}])
+        self.db.load("habit_completions", [self.completion(1, 1, "2020-01-01")])
+        retention.compact_completions()
+
+        rollup = self.rollups()[(1, "2020-01")]
+        self.assertEqual(rollup["day_bitmap"], 0b11)
+        self.assertEqual(rollup["completion_count"], 2)
+        self.assertEqual(len(self.db.rows(ROLLUP_TABLE)), 1)
+
+    def test_rerun_after_an_interrupted_run_changes_nothing(self):
+        # Rollup written, raw rows not yet deleted
+        self.db.load("habit_completions", [self.completion(1, 1, "2020-01-01")])
+        retention._merge_rollups(self.db, self.db.rows("habit_completions"))
+        retention.compact_completions()
+
+        self.assertEqual(self.rollups()[(1, "2020-01")]["completion_count"], 1)
+        self.assertEqual(self.db.rows("habit_completions"), [])
+
+    def test_batches_are_processed_until_done(self):
+        self.db.load("habit_completions", [self.completion(i, 1, f"2020-01-{i:02d}") for i in range(1, 6)])
+        with patch.object(retention, "BATCH_SIZE", 2):
+            retention.compact_completions()
+        self.assertEqual(self.rollups()[(1, "2020-01")]["completion_count"], 5)
+        self.assertEqual(self.db.rows("habit_completions"), [])
+
+
+class TestOrphanPurge(RetentionJobTestCase):
+
+    def test_history_of_deleted_habits_is_purged(self):
+        self.db.load("habits", [{"habit_id": 1, "user_id": 1}])
+        self.db.load("habit_completions", [self.completion(i, 1 + i % 2, f"2026-01-{i:02d}") for i in range(1, 6)])
+        self.db.load(ROLLUP_TABLE, [
+            {"habit_id": habit_id, "user_id": 1, "month": month, "day_bitmap": 1, "completion_count": 1}
+            for habit_id in (1, 2) for month in ("2020-01", "2020-02")
+        ])
+        with patch.object(retention, "BATCH_SIZE", 2):
+            retention.purge_orphaned_completions()
+
+        self.assertEqual({r["habit_id"] for r in self.db.rows("habit_completions")}, {1})
+        self.assertEqual({habit_id for habit_id, _ in self.rollups()}, {1})
+
+
+if __name__ == "__main__":
+    unittest.main()
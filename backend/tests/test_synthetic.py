@@ -0,0 +1,127 @@
+"""
+Unit tests for benchmarks/synthetic.py and benchmarks/local_db.py: the
+seeded data mix, and the in-memory Supabase stand-in the benchmarks and
+tests run against (filters, NULL semantics, writes, round-trip counts).
+"""
+
+import os
+import sys
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import synthetic
+from local_db import LocalSupabase
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+class TestGenerate(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dataset = synthetic.generate(n_habits=2000, seed=1, now=NOW)
+
+    def test_same_seed_and_now_give_the_same_rows(self):
+        self.assertEqual(synthetic.generate(n_habits=200, seed=3, now=NOW), synthetic.generate(n_habits=200, seed=3, now=NOW))
+        self.assertNotEqual(synthetic.generate(n_habits=200, seed=3, now=NOW), synthetic.generate(n_habits=200, seed=4, now=NOW))
+
+    def test_exact_habit_count_with_valid_owners(self):
+        habits, users = self.dataset["habits"], self.dataset["users"]
+        self.assertEqual([h["habit_id"] for h in habits], list(range(1, 2001)))
+        per_user = Counter(h["user_id"] for h in habits)
+        self.assertEqual(set(per_user), {u["user_id"] for u in users})
+        self.assertLessEqual(max(per_user.values()), 8)
+
+    def test_frequency_and_watering_mix(self):
+        habits = self.dataset["habits"]
+        daily = sum(h["frequency"] == "daily" for h in habits) / len(habits)
+        never = sum(h["last_watered"] is None for h in habits) / len(habits)
+        self.assertAlmostEqual(daily, 0.7, delta=0.05)
+        self.assertAlmostEqual(never, 0.1, delta=0.03)
+
+    def test_only_overdue_plants_are_wilting(self):
+        for habit in self.dataset["habits"]:
+            if habit["plant_state"] == "wilting":
+                watered = datetime.fromisoformat(habit["last_watered"])
+                self.assertGreater(NOW - watered, timedelta(hours=synthetic.WILT_HOURS[habit["frequency"]]))
+
+    def test_completions_go_back_from_last_watered(self):
+        habits = {h["habit_id"]: h for h in self.dataset["habits"]}
+        completions = self.dataset["habit_completions"]
+        self.assertTrue(completions)
+        for completion in completions:
+            habit = habits[completion["habit_id"]]
+            self.assertEqual(completion["user_id"], habit["user_id"])
+            self.assertLessEqual(completion["completed_at"][:19], habit["last_watered"])
+        keys = [(c["habit_id"], c["period_key"]) for c in completions]
+        self.assertEqual(len(keys), len(set(keys)))
+
+    def test_history_can_be_skipped(self):
+        dataset = synthetic.generate(n_habits=50, seed=1, now=NOW, completions_per_habit=0)
+        self.assertEqual(dataset["habit_completions"], [])
+
+
+class TestLocalSupabase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = LocalSupabase()
+        self.db.load("habits", [
+            {"habit_id": 1, "user_id": 1, "frequency": "daily", "last_watered": "2026-10-18T08:00:00"},
+            {"habit_id": 2, "user_id": 1, "frequency": "weekly", "last_watered": None},
+            {"habit_id": 3, "user_id": 2, "frequency": "daily", "last_watered": "2026-10-01T08:00:00"},
+        ])
+
+    def ids(self, query):
+        return [row["habit_id"] for row in query.execute().data]
+
+    def test_load_fills_tables_from_a_generated_dataset(self):
+        db = synthetic.load(LocalSupabase(), synthetic.generate(n_habits=30, seed=1, now=NOW))
+        self.assertEqual(len(db.rows("habits")), 30)
+        self.assertEqual(db.query_count, 0)
+
+    def test_filters_and_null_semantics(self):
+        habits = lambda: self.db.table("habits").select("habit_id")
+        self.assertEqual(self.ids(habits().eq("user_id", "1")), [1, 2])
+        self.assertEqual(self.ids(habits().lt("last_watered", "2026-10-10")), [3])
+        self.assertEqual(self.ids(habits().neq("frequency", "daily")), [2])
+        self.assertEqual(self.ids(habits().is_("last_watered", "null")), [2])
+        self.assertEqual(self.ids(habits().in_("habit_id", [3, 1])), [1, 3])
+        self.assertEqual(self.ids(habits().or_("frequency.eq.weekly,user_id.eq.2")), [2, 3])
+
+    def test_order_and_range(self):
+        habits = self.db.table("habits").select("habit_id").order("user_id", desc=True).order("habit_id")
+        self.assertEqual(self.ids(habits.range(1, 2)), [1, 2])
+
+    def test_projection(self):
+        [row] = self.db.table("habits").select("habit_id, frequency").eq("habit_id", 1).execute().data
+        self.assertEqual(row, {"habit_id": 1, "frequency": "daily"})
+
+    def test_writes_keep_indexes_current(self):
+        self.db.table("habits").update({"user_id": 2}).eq("habit_id", 1).execute()
+        self.db.table("habits").delete().eq("habit_id", 3).execute()
+        [inserted] = self.db.table("habits").insert({"user_id": 2, "frequency": "daily"}).execute().data
+        self.assertEqual(inserted["habit_id"], 4)
+        self.assertEqual(self.ids(self.db.table("habits").select("habit_id").eq("user_id", 2)), [1, 4])
+
+    def test_upsert_updates_or_ignores_conflicts(self):
+        self.db.table("habits").upsert({"habit_id": 1, "frequency": "weekly"}).execute()
+        self.assertEqual(self.db.table("habits").upsert({"habit_id": 2, "frequency": "daily"}, ignore_duplicates=True).execute().data, [])
+        rows = {row["habit_id"]: row["frequency"] for row in self.db.rows("habits")}
+        self.assertEqual((rows[1], rows[2]), ("weekly", "weekly"))
+
+    def test_every_execute_is_one_round_trip(self):
+        self.db.table("habits").select("*").execute()
+        self.db.table("habits").update({"plant_state": "wilting"}).eq("habit_id", 1).execute()
+        self.db.rpc("apply_garden_summary_deltas", {"deltas": []}).execute()
+        self.assertEqual(self.db.queries, Counter({
+            ("habits", "GET"): 1, ("habits", "PATCH"): 1, ("rpc/apply_garden_summary_deltas", "POST"): 1,
+        }))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -54,10 +54,20 @@ export default function Dashboard() {
       return;
     }
 
-    const fetchHabits = async () => {
+    // One request for profile, habits and pending reminders
+    const fetchDashboard = async () => {
       try {
-        const res = await API.get("/habits");
+        const res = await API.get("/habits/dashboard");
         setHabits(padHabits(res.data.habits || []));
+        if (res.data.user) {
+          setUser(res.data.user);
+          localStorage.setItem("user", JSON.stringify(res.data.user));
+        }
+        if (res.data.reminders && res.data.reminders.length > 0) {
+          setPendingReminders(res.data.reminders);
+          setCurrentReminderIndex(0);
+          setShowReminderNotification(true);
+        }
       } catch (err) {
         console.error("Failed to load habits", err);
         if (err.response?.status === 401) {
@@ -70,7 +80,7 @@ export default function Dashboard() {
         }
       }
     };
-    fetchHabits();
+    fetchDashboard();
   }, [navigate]);
   
   // Separate effect for polling reminders
@@ -89,22 +99,8 @@ export default function Dashboard() {
         console.log("Could not fetch reminders:", err);
       }
     }, 30000); // Check every 30 seconds
-    
-    // Also check immediately
-    const checkReminders = async () => {
-      try {
-        const res = await API.get("/habits/reminders");
-        if (res.data.reminders && res.data.reminders.length > 0) {
-          setPendingReminders(res.data.reminders);
-          setCurrentReminderIndex(0);
-          setShowReminderNotification(true);
-        }
-      } catch (err) {
-        console.log("Could not fetch reminders:", err);
-      }
-    };
-    checkReminders();
-    
+    // The first check happens as part of the dashboard bootstrap request
+
     return () => clearInterval(reminderInterval);
   }, []);
 